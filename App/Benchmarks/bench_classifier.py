@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR.parent / "Workers"))
+
+from translate_text_classify import classification_table, classify_text
+
+
+SAMPLES = {
+    "english": "The quick brown fox jumps over the lazy dog, and the committee reviews the report. ",
+    "french": "Le comité examine le rapport trimestriel avec beaucoup d'intérêt et de précision. ",
+    "russian": "Комитет внимательно рассматривает квартальный отчёт и вносит поправки. ",
+    "chinese": "委员会正在审阅季度报告，并对其中的数字进行核对。",
+    "japanese": "委員会は四半期報告書を確認し、数字を丁寧に照合しています。",
+    "korean": "위원회는 분기 보고서를 검토하고 숫자를 꼼꼼히 확인합니다. ",
+    "mixed": "Release 2.4 ships today. 新版本今天发布。 Новая версия уже доступна. ",
+}
+
+
+def legacy_detect(text: str) -> str:
+    if any("\u3040" <= char <= "\u30ff" for char in text):
+        return "ja"
+    if any("\u4e00" <= char <= "\u9fff" for char in text):
+        return "zh"
+    if any("\uac00" <= char <= "\ud7a3" for char in text):
+        return "ko"
+    return "en"
+
+
+def legacy_style_scan(text: str) -> tuple:
+    clean_str = text.strip()
+    has_punctuation = any(char in "，。！？；：,.!?;:" for char in clean_str)
+    space_count = clean_str.count(" ")
+    cjk_count = sum(1 for char in clean_str if "\u4e00" <= char <= "\u9fff" or "\u3040" <= char <= "\u30ff")
+    dictionary_cjk = sum(1 for char in text if "\u4e00" <= char <= "\u9fff" or "\u3040" <= char <= "\u30ff")
+    words = len(text.split())
+    return has_punctuation, space_count, cjk_count, dictionary_cjk, words
+
+
+def legacy(text: str) -> str:
+    legacy_style_scan(text)
+    return legacy_detect(text)
+
+
+def single_pass(text: str) -> str:
+    return classify_text(text).language
+
+
+def best_of(function, text: str, repeat: int) -> tuple[float, str]:
+    timings = []
+    result = ""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(text)
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(min(timings), 2), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the single-pass text classifier with the previous character scans.")
+    parser.add_argument("--size-mb", type=float, default=1.0, help="input size per sample in megabytes of text")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement, the fastest is reported")
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    classification_table()
+    table_ms = round((time.perf_counter() - started) * 1000, 2)
+    results = {"size_mb": args.size_mb, "table_build_ms": table_ms, "samples": {}}
+    print(f"table build: {table_ms} ms")
+    print(f"{'sample':<10} {'legacy ms':>10} {'single ms':>10} {'speedup':>8}  legacy -> single")
+    for name, unit in SAMPLES.items():
+        text = unit * max(1, int(args.size_mb * 1_000_000 / len(unit.encode("utf-8"))))
+        legacy_ms, legacy_lang = best_of(legacy, text, args.repeat)
+        single_ms, single_lang = best_of(single_pass, text, args.repeat)
+        speedup = round(legacy_ms / single_ms, 1) if single_ms else None
+        results["samples"][name] = {
+            "chars": len(text),
+            "legacy_ms": legacy_ms,
+            "single_pass_ms": single_ms,
+            "speedup": speedup,
+            "legacy_language": legacy_lang,
+            "language": single_lang,
+        }
+        print(f"{name:<10} {legacy_ms:>10} {single_ms:>10} {speedup:>7}x  {legacy_lang} -> {single_lang}")
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR.parent / "Workers"))
+
+from translate_text_stopping import MarkerFilter
+
+
+STOP_MARKERS = ("<end_of_turn>", "<eos>", "<bos>")
+EOS_TOKEN_ID = 106
+SAMPLES = {
+    "prose": "The committee reviews the quarterly report and checks every figure before the meeting. ",
+    "markup": "Click <b>Save</b> to keep the <i>draft</i>, or press <kbd>Esc</kbd> to close. ",
+    "cjk": "委员会正在审阅季度报告，并在会议前核对每一个数字。",
+}
+
+
+def responses_for(unit: str, tokens: int, split_marker: bool) -> list[SimpleNamespace]:
+    pieces = []
+    text = unit * (tokens // max(len(unit) // 4, 1) + 1)
+    for index in range(0, len(text), 4):
+        pieces.append(SimpleNamespace(text=text[index : index + 4], token=1000 + index % 50, finish_reason=None))
+        if len(pieces) == tokens:
+            break
+    if split_marker:
+        pieces.append(SimpleNamespace(text="<end_of", token=1001, finish_reason=None))
+        pieces.append(SimpleNamespace(text="_turn>", token=1002, finish_reason=None))
+        pieces.append(SimpleNamespace(text=" trailing", token=1003, finish_reason=None))
+    else:
+        pieces.append(SimpleNamespace(text="<end_of_turn>", token=EOS_TOKEN_ID, finish_reason=None))
+    return pieces
+
+
+def bare_loop(responses: list[SimpleNamespace]) -> str:
+    output_parts = []
+    for response in responses:
+        text_chunk = response.text
+        if text_chunk:
+            output_parts.append(text_chunk)
+        if response.token == EOS_TOKEN_ID:
+            break
+    return "".join(output_parts)
+
+
+def legacy_loop(responses: list[SimpleNamespace]) -> str:
+    output_parts = []
+    for response in responses:
+        text_chunk = response.text
+        should_stop = False
+        for token in STOP_MARKERS:
+            if token in text_chunk:
+                should_stop = True
+                text_chunk = text_chunk.replace(token, "")
+        if text_chunk:
+            output_parts.append(text_chunk)
+        if should_stop:
+            break
+    return "".join(output_parts)
+
+
+def token_id_loop(
+    responses: list[SimpleNamespace],
+    stop_ids: frozenset[int] = frozenset({EOS_TOKEN_ID}),
+    stop_markers: tuple[str, ...] = (),
+) -> str:
+    output_parts = []
+    markers = MarkerFilter(stop_markers) if stop_markers else None
+    for response in responses:
+        text_chunk = response.text
+        finish_reason = response.finish_reason
+        if response.token in stop_ids:
+            finish_reason = "stop"
+            for marker in STOP_MARKERS:
+                text_chunk = text_chunk.replace(marker, "")
+        if markers is not None:
+            text_chunk = markers.feed(text_chunk)
+            if markers.found:
+                finish_reason = "stop"
+        if text_chunk:
+            output_parts.append(text_chunk)
+        if finish_reason == "stop":
+            break
+    tail = markers.finish() if markers is not None else ""
+    if tail:
+        output_parts.append(tail)
+    return "".join(output_parts)
+
+
+def holdback_loop(responses: list[SimpleNamespace]) -> str:
+    return token_id_loop(responses, frozenset(), STOP_MARKERS)
+
+
+def best_of(function, responses: list[SimpleNamespace], repeat: int) -> tuple[float, str]:
+    timings = []
+    result = ""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(responses)
+        timings.append(time.perf_counter() - started)
+    return round(min(timings) / len(responses) * 1_000_000_000, 1), result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare per-token stop detection by token id with the previous marker scans.")
+    parser.add_argument("--tokens", type=int, default=200_000, help="decoded tokens per sample")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement, the fastest is reported")
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    args = parser.parse_args()
+
+    results = {"tokens": args.tokens, "samples": {}}
+    print("stop detection overhead per token, bare loop subtracted")
+    print(f"{'sample':<8} {'bare ns':>8} {'legacy ns':>10} {'token id ns':>12} {'holdback ns':>12} {'speedup':>8}")
+    for name, unit in SAMPLES.items():
+        responses = responses_for(unit, args.tokens, split_marker=False)
+        bare_ns, _ = best_of(bare_loop, responses, args.repeat)
+        legacy_ns, legacy_text = best_of(legacy_loop, responses, args.repeat)
+        token_id_ns, token_id_text = best_of(token_id_loop, responses, args.repeat)
+        holdback_ns, holdback_text = best_of(holdback_loop, responses, args.repeat)
+        legacy_ns, token_id_ns, holdback_ns = (
+            round(max(value - bare_ns, 0.0), 1) for value in (legacy_ns, token_id_ns, holdback_ns)
+        )
+        speedup = round(legacy_ns / token_id_ns, 1) if token_id_ns else None
+        results["samples"][name] = {
+            "bare_ns_per_token": bare_ns,
+            "legacy_overhead_ns": legacy_ns,
+            "token_id_overhead_ns": token_id_ns,
+            "holdback_overhead_ns": holdback_ns,
+            "speedup": speedup,
+            "same_output": legacy_text == token_id_text == holdback_text,
+        }
+        print(f"{name:<8} {bare_ns:>8} {legacy_ns:>10} {token_id_ns:>12} {holdback_ns:>12} {speedup:>7}x")
+    split = responses_for(SAMPLES["prose"], 16, split_marker=True)
+    results["split_marker"] = {
+        "legacy_leaks_marker": "<end_of" in legacy_loop(split),
+        "holdback_leaks_marker": "<end_of" in holdback_loop(split),
+    }
+    print(
+        f"marker split across chunks: legacy leaks={results['split_marker']['legacy_leaks_marker']}, "
+        f"holdback leaks={results['split_marker']['holdback_leaks_marker']}"
+    )
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
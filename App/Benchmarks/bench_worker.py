@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import queue
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Thread
+
+from cloud_standin import start_standin
+
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+APP_ROOT = BENCHMARKS_DIR.parent
+PROJECT_ROOT = APP_ROOT.parent
+WORKER_PATH = APP_ROOT / "Workers" / "translate_text_worker.py"
+FAKE_MODEL_DIR = BENCHMARKS_DIR / "fake_model"
+RESULTS_DIR = BENCHMARKS_DIR / "results"
+TEXT_EVENTS = {"replace", "token"}
+DONE_EVENTS = {"complete", "error", "stopped"}
+LOREM = (
+    "The quick brown fox jumps over the lazy dog while the committee reviews the quarterly report. "
+    "Careful translation keeps names, numbers like 42 and 3.14, and punctuation intact. "
+    "Each paragraph in this benchmark is deterministic so runs can be compared across commits. "
+)
+
+
+def build_corpus(long_documents: int) -> dict[str, list[str]]:
+    words = ["hello", "translation", "benchmark", "keyboard", "window", "dictionary", "language", "river"]
+    sentences = [sentence.strip() + "." for sentence in LOREM.split(". ") if sentence.strip(". ")]
+    documents = []
+    for index in range(long_documents):
+        paragraphs = [f"Section {index}.{number}. " + LOREM * (2 + number % 3) for number in range(8)]
+        documents.append("\n\n".join(paragraphs))
+    return {"words": words, "sentences": sentences, "documents": documents}
+
+
+def percentile(values: list[float], fraction: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return round(ordered[index], 2)
+
+
+def summarize(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 2) if values else None,
+        "p50": percentile(values, 0.5),
+        "p90": percentile(values, 0.9),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "max": round(max(values), 2) if values else None,
+    }
+
+
+def process_rss_kb(pid: int) -> int | None:
+    status = Path(f"/proc/{pid}/status")
+    if status.exists():
+        for line in status.read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    try:
+        output = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True, timeout=5).stdout
+        return int(output.strip() or 0) or None
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+
+def git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+class WorkerProcess:
+    def __init__(self, backend: str, environment: dict[str, str]) -> None:
+        self.backend = backend
+        self.events: queue.Queue[tuple[float, dict]] = queue.Queue()
+        self.started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, str(WORKER_PATH)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            env=environment,
+        )
+        Thread(target=self._read, daemon=True).start()
+        self.peak_rss_kb = 0
+
+    def _read(self) -> None:
+        for line in self.process.stdout:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            self.events.put((time.perf_counter(), event))
+
+    def send(self, command: dict) -> float:
+        self.process.stdin.write(json.dumps(command, ensure_ascii=False) + "\n")
+        self.process.stdin.flush()
+        return time.perf_counter()
+
+    def wait_for(self, names: set[str], timeout: float, job_id: str | None = None) -> list[tuple[float, dict]]:
+        deadline = time.perf_counter() + timeout
+        received = []
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise TimeoutError(f"timed out waiting for {sorted(names)}")
+            received_at, event = self.events.get(timeout=remaining)
+            if job_id is not None and event.get("job_id") not in (None, job_id):
+                continue
+            received.append((received_at, event))
+            if event.get("event") in names:
+                return received
+
+    def request(self, command: dict, names: set[str], timeout: float) -> tuple[float, dict]:
+        sent = self.send(command)
+        received_at, event = self.wait_for(names, timeout)[-1]
+        return received_at - sent, event
+
+    def sample_rss(self) -> int | None:
+        rss = process_rss_kb(self.process.pid)
+        if rss:
+            self.peak_rss_kb = max(self.peak_rss_kb, rss)
+        return rss
+
+    def close(self) -> None:
+        try:
+            self.send({"action": "quit"})
+            self.process.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+def worker_environment(backend: str, standin_environment: dict[str, str], args: argparse.Namespace) -> dict[str, str]:
+    environment = dict(os.environ)
+    environment.update(standin_environment)
+    environment.update(
+        {
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(FAKE_MODEL_DIR), environment.get("PYTHONPATH", "")])),
+            "PYTHONUNBUFFERED": "1",
+            "TRANSLATE_TEXT_BACKEND": backend,
+            "TRANSLATE_TEXT_MODEL": "fake-translategemma",
+            "TRANSLATE_TEXT_CACHE": "0",
+            "TRANSLATE_TEXT_DICTIONARY": "0",
+            "TRANSLATE_TEXT_MEMORY": "0",
+            "TRANSLATE_TEXT_DAEMON": "0",
+            "TRANSLATE_TEXT_GOOGLE_RATE": "0",
+            "TRANSLATE_TEXT_BING_RATE": "0",
+            "FAKE_MLX_PREFILL_MS": str(args.prefill_ms),
+            "FAKE_MLX_DECODE_MS": str(args.decode_ms),
+        }
+    )
+    return environment
+
+
+def run_translation(worker: WorkerProcess, job_id: str, text: str, target: str, timeout: float) -> dict:
+    sent = worker.send({"action": "translate", "id": job_id, "text": text, "target": target, "backend": worker.backend})
+    events = worker.wait_for(DONE_EVENTS, timeout, job_id)
+    finished_at, final = events[-1]
+    if final.get("event") != "complete":
+        raise RuntimeError(f"{job_id} ended with {final}")
+    first_text_at = next(
+        (received_at for received_at, event in events if event.get("event") in TEXT_EVENTS and event.get("text")),
+        finished_at,
+    )
+    output = ""
+    frames = 0
+    for _, event in events:
+        if event.get("event") == "replace":
+            output = event.get("text", "")
+            frames += 1
+        elif event.get("event") == "token":
+            output += event.get("text", "")
+            frames += 1
+    return {
+        "ttft_ms": (first_text_at - sent) * 1000,
+        "latency_ms": (finished_at - sent) * 1000,
+        "decode_ms": (finished_at - first_text_at) * 1000,
+        "frames": frames,
+        "chunks": final.get("chunks"),
+        "output_chars": len(output),
+    }
+
+
+def output_tokens(worker: WorkerProcess, timeout: float) -> int:
+    _, event = worker.request({"action": "output_stats"}, {"output_stats"}, timeout)
+    return int(event.get("tokens", 0))
+
+
+def bench_backend(backend: str, corpus: dict[str, list[str]], standin, args: argparse.Namespace) -> dict:
+    worker = WorkerProcess(backend, worker_environment(backend, standin.worker_environment(), args))
+    try:
+        worker.wait_for({"ready"}, args.timeout)
+        startup_ms = (time.perf_counter() - worker.started) * 1000
+        worker.sample_rss()
+        categories = {}
+        request_index = 0
+        for category, texts in corpus.items():
+            samples = []
+            tokens_before = output_tokens(worker, args.timeout)
+            started = time.perf_counter()
+            for _ in range(args.runs):
+                for text in texts:
+                    request_index += 1
+                    samples.append(run_translation(worker, f"bench-{request_index}", text, args.target, args.timeout))
+                    worker.sample_rss()
+            wall_s = time.perf_counter() - started
+            tokens = output_tokens(worker, args.timeout) - tokens_before
+            decode_s = sum(sample["decode_ms"] for sample in samples) / 1000
+            chunks = sum(sample["chunks"] or 0 for sample in samples)
+            categories[category] = {
+                "requests": len(samples),
+                "ttft_ms": summarize([sample["ttft_ms"] for sample in samples]),
+                "latency_ms": summarize([sample["latency_ms"] for sample in samples]),
+                "tokens": tokens,
+                "tokens_per_s": round(tokens / decode_s, 2) if backend == "gemma" and tokens and decode_s else None,
+                "frames": sum(sample["frames"] for sample in samples),
+                "chunks": chunks,
+                "chunks_per_s": round(chunks / wall_s, 2) if chunks else None,
+                "output_chars": sum(sample["output_chars"] for sample in samples),
+                "wall_s": round(wall_s, 3),
+            }
+        return {
+            "startup_ms": round(startup_ms, 2),
+            "peak_rss_kb": worker.peak_rss_kb or None,
+            "categories": categories,
+        }
+    finally:
+        worker.close()
+
+
+def compare(results: dict, baseline: dict) -> list[str]:
+    lines = []
+    for backend, current in results["backends"].items():
+        previous = baseline.get("backends", {}).get(backend)
+        if not previous:
+            continue
+        for category, metrics in current["categories"].items():
+            old = previous.get("categories", {}).get(category)
+            if not old:
+                continue
+            for label, new_value, old_value in [
+                ("ttft p50", metrics["ttft_ms"]["p50"], old["ttft_ms"]["p50"]),
+                ("latency p95", metrics["latency_ms"]["p95"], old["latency_ms"]["p95"]),
+                ("tokens/s", metrics["tokens_per_s"], old["tokens_per_s"]),
+                ("chunks/s", metrics["chunks_per_s"], old["chunks_per_s"]),
+            ]:
+                if new_value is None or not old_value:
+                    continue
+                change = (new_value - old_value) / old_value * 100
+                lines.append(f"{backend:<7} {category:<10} {label:<12} {old_value:>10} -> {new_value:<10} {change:+.1f}%")
+    return lines
+
+
+def print_summary(results: dict) -> None:
+    for backend, result in results["backends"].items():
+        rss = result["peak_rss_kb"]
+        print(f"{backend}: startup {result['startup_ms']} ms, peak RSS {rss // 1024 if rss else '?'} MB")
+        for category, metrics in result["categories"].items():
+            print(
+                f"  {category:<10} n={metrics['requests']:<4} "
+                f"ttft p50={metrics['ttft_ms']['p50']} p95={metrics['ttft_ms']['p95']} ms  "
+                f"latency p50={metrics['latency_ms']['p50']} p95={metrics['latency_ms']['p95']} ms  "
+                f"tok/s={metrics['tokens_per_s']}  chunks/s={metrics['chunks_per_s']}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark translate_text_worker.py with a fake model and local cloud stand-ins.")
+    parser.add_argument("--backends", default="gemma,google,bing", help="comma separated list of backends")
+    parser.add_argument("--runs", type=int, default=3, help="passes over the corpus per backend")
+    parser.add_argument("--documents", type=int, default=2, help="number of long documents in the corpus")
+    parser.add_argument("--target", default="简体中文")
+    parser.add_argument("--prefill-ms", type=float, default=0.05, help="fake prefill time per prompt token")
+    parser.add_argument("--decode-ms", type=float, default=5.0, help="fake decode time per generated token")
+    parser.add_argument("--cloud-latency", type=float, default=0.05, help="stand-in response delay in seconds")
+    parser.add_argument("--cloud-throttle-rate", type=float, default=0.0, help="fraction of stand-in requests answered with 429")
+    parser.add_argument("--cloud-reset-rate", type=float, default=0.0, help="fraction of stand-in connections reset")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", type=Path, help="result file (default: Benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--baseline", type=Path, help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    standin = start_standin(
+        latency=args.cloud_latency,
+        throttle_rate=args.cloud_throttle_rate,
+        reset_rate=args.cloud_reset_rate,
+        retry_after=0.2,
+    )
+    corpus = build_corpus(args.documents)
+    commit = git_commit()
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {
+                "runs": args.runs,
+                "documents": args.documents,
+                "target": args.target,
+                "prefill_ms": args.prefill_ms,
+                "decode_ms": args.decode_ms,
+                "cloud_latency": args.cloud_latency,
+                "cloud_throttle_rate": args.cloud_throttle_rate,
+                "cloud_reset_rate": args.cloud_reset_rate,
+            },
+        },
+        "backends": {},
+    }
+    try:
+        for backend in [name.strip() for name in args.backends.split(",") if name.strip()]:
+            results["backends"][backend] = bench_backend(backend, corpus, standin, args)
+    finally:
+        standin.shutdown()
+    results["standin"] = standin.state.snapshot()
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = RESULTS_DIR / f"{stamp}-{commit or 'unknown'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    print_summary(results)
+    print(f"Saved {output}")
+    if args.baseline:
+        for line in compare(results, json.loads(args.baseline.read_text(encoding="utf-8"))):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import html
+import json
+import random
+import socket
+import struct
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlparse
+
+
+BING_PAGE = """<!DOCTYPE html>
+<html><head><script>var _G={"ig":"STANDINIG0123456789"};</script></head>
+<body><div id="rich_tta" data-iid="translator.5023"></div>
+<script>var params_AbusePreventionHelper = [1700000000000,"{token}",3600000];</script>
+</body></html>
+"""
+
+
+def fake_translation(text: str, target: str) -> str:
+    return f"[{target}] {text.upper()}"
+
+
+class StandinState:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        reset_rate: float = 0.0,
+        retry_after: float = 1.0,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.reset_rate = reset_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.token = "standin-token-0"
+        self.token_generation = 0
+        self.lock = Lock()
+        self.counts: dict[str, int] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def enter(self, route: str) -> None:
+        with self.lock:
+            self.counts[route] = self.counts.get(route, 0) + 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def fault(self) -> str | None:
+        with self.lock:
+            roll = self.random.random()
+            if roll < self.reset_rate:
+                fault = "reset"
+            elif roll < self.reset_rate + self.throttle_rate:
+                fault = "throttle"
+            else:
+                return None
+            self.counts[fault] = self.counts.get(fault, 0) + 1
+            return fault
+
+    def leave(self) -> None:
+        with self.lock:
+            self.in_flight -= 1
+
+    def rotate_token(self) -> None:
+        with self.lock:
+            self.token_generation += 1
+            self.token = f"standin-token-{self.token_generation}"
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {"counts": dict(self.counts), "max_in_flight": self.max_in_flight}
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server: "StandinServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args) -> None:
+        return
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path == "/m":
+            self._handle("google", lambda: self._google(parse_qs(url.query)))
+        elif url.path == "/translator":
+            self._handle("bing_page", self._bing_page)
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def do_POST(self) -> None:
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        if url.path == "/ttranslatev3":
+            self._handle("bing_translate", lambda: self._bing(form))
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def _handle(self, route: str, build) -> None:
+        state = self.server.state
+        state.enter(route)
+        try:
+            fault = state.fault()
+            if fault == "reset":
+                self.close_connection = True
+                self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                return
+            if state.latency:
+                time.sleep(state.latency)
+            if fault == "throttle":
+                self._send(429, "text/plain", b"too many requests", {"Retry-After": f"{state.retry_after:g}"})
+                return
+            status, content_type, body = build()
+            self._send(status, content_type, body)
+        finally:
+            state.leave()
+
+    def _google(self, query: dict[str, list[str]]) -> tuple[int, str, bytes]:
+        text = query.get("q", [""])[0]
+        target = query.get("tl", ["en"])[0]
+        page = f'<html><body><div class="result-container">{html.escape(fake_translation(text, target))}</div></body></html>'
+        return 200, "text/html; charset=utf-8", page.encode("utf-8")
+
+    def _bing_page(self) -> tuple[int, str, bytes]:
+        return 200, "text/html; charset=utf-8", BING_PAGE.replace("{token}", self.server.state.token).encode("utf-8")
+
+    def _bing(self, form: dict[str, list[str]]) -> tuple[int, str, bytes]:
+        if form.get("token", [""])[0] != self.server.state.token:
+            return 200, "application/json", json.dumps({"statusCode": 205}).encode("utf-8")
+        text = form.get("text", [""])[0]
+        target = form.get("to", ["en"])[0]
+        payload = [{"translations": [{"text": fake_translation(text, target), "to": target}]}]
+        return 200, "application/json", json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+    def _send(self, status: int, content_type: str, body: bytes, headers: dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.0, **faults) -> None:
+        super().__init__(("127.0.0.1", port), StandinHandler)
+        self.state = StandinState(latency, **faults)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def worker_environment(self) -> dict[str, str]:
+        return {
+            "TRANSLATE_TEXT_GOOGLE_ENDPOINT": f"{self.base_url}/m",
+            "TRANSLATE_TEXT_BING_ENDPOINT": f"{self.base_url}/translator",
+        }
+
+
+def start_standin(port: int = 0, latency: float = 0.0, **faults) -> StandinServer:
+    server = StandinServer(port, latency, **faults)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local stand-in for the Google and Bing web translators.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--reset-rate", type=float, default=0.0, help="fraction of connections reset without a response")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429 responses")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    server = StandinServer(
+        args.port,
+        args.latency,
+        throttle_rate=args.throttle_rate,
+        reset_rate=args.reset_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    for name, value in server.worker_environment().items():
+        print(f"export {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
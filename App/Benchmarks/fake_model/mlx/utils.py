@@ -0,0 +1,9 @@
+from __future__ import annotations
+
+
+def tree_flatten(tree, prefix: str = ""):
+    if isinstance(tree, dict):
+        return [item for key, value in tree.items() for item in tree_flatten(value, f"{prefix}{key}.")]
+    if isinstance(tree, (list, tuple)):
+        return [item for index, value in enumerate(tree) for item in tree_flatten(value, f"{prefix}{index}.")]
+    return [(prefix.rstrip("."), tree)]
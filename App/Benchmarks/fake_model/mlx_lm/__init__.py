@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import os
+import time
+from types import SimpleNamespace
+
+PREFILL_MS = float(os.environ.get("FAKE_MLX_PREFILL_MS", "0.05"))
+DECODE_MS = float(os.environ.get("FAKE_MLX_DECODE_MS", "5"))
+LOAD_MS = float(os.environ.get("FAKE_MLX_LOAD_MS", "0"))
+MODEL_MB = float(os.environ.get("FAKE_MLX_MODEL_MB", "0"))
+DRAFT_ACCEPT = float(os.environ.get("FAKE_MLX_DRAFT_ACCEPT", "0.7"))
+DRAFT_COST = float(os.environ.get("FAKE_MLX_DRAFT_COST", "0.25"))
+LOOP = os.environ.get("FAKE_MLX_LOOP") == "1"
+EOS_TOKEN_ID = 106
+END_OF_TURN = "<end_of_turn>"
+
+
+class FakeModel:
+    def __init__(self, path) -> None:
+        self.path = path
+
+    def parameters(self) -> dict:
+        return {"weights": SimpleNamespace(nbytes=int(MODEL_MB * 1048576))}
+
+
+class FakeDetokenizer:
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.text = ""
+        self.offset = 0
+
+    def add_token(self, token: int) -> None:
+        self.text += chr(token)
+
+    def finalize(self) -> None:
+        pass
+
+    @property
+    def last_segment(self) -> str:
+        segment = self.text[self.offset :]
+        self.offset = len(self.text)
+        return segment
+
+
+class FakeTokenizer:
+    bos_token = "<bos>"
+    eos_token_ids = [EOS_TOKEN_ID]
+
+    def __init__(self) -> None:
+        self.detokenizer = FakeDetokenizer()
+
+    def apply_chat_template(self, messages, tokenize=False, add_generation_prompt=True):
+        content = messages[0]["content"][0]
+        return (
+            f"<bos><start_of_turn>user\n[{content['source_lang_code']}->{content['target_lang_code']}] "
+            f"{content['text']}{END_OF_TURN}\n<start_of_turn>model\n"
+        )
+
+    def encode(self, text: str, add_special_tokens: bool = True) -> list[int]:
+        return [ord(char) for char in text]
+
+    def decode(self, tokens) -> str:
+        return "".join(chr(token) for token in tokens)
+
+
+def fake_translation(prompt_text: str) -> str:
+    body = prompt_text.rsplit(END_OF_TURN, 1)[0]
+    header, _, text = body.partition("] ")
+    target = header.rsplit("->", 1)[-1] if "->" in header else "en"
+    if "\nWORD: " in text:
+        word = text.rsplit("\nWORD: ", 1)[1].strip()
+        return f"/{word.lower()}/\nnoun\n[{target}] {word.upper()}\n{word.capitalize()} is here.\n[{target}] {word.upper()} IS HERE."
+    return f"[{target}] {text.upper()}"
+
+
+def output_pieces(text: str) -> list[str]:
+    words = text.split(" ")
+    return [word + " " for word in words[:-1]] + [words[-1]]
+
+
+def load(path, model_config=None):
+    time.sleep(LOAD_MS / 1000)
+    if str(path).startswith("missing"):
+        raise FileNotFoundError(f"No model found at {path}")
+    return FakeModel(path), FakeTokenizer()
+
+
+def stream_generate(
+    model,
+    tokenizer,
+    prompt,
+    max_tokens: int = 256,
+    prompt_cache=None,
+    draft_model=None,
+    num_draft_tokens: int = 3,
+    **kwargs,
+):
+    tokens = tokenizer.encode(prompt) if isinstance(prompt, str) else list(prompt)
+    time.sleep(PREFILL_MS * len(tokens) / 1000)
+    context = list(tokens)
+    if prompt_cache is not None:
+        context = prompt_cache[0].tokens + context
+        for layer in prompt_cache:
+            layer.tokens.extend(tokens)
+    pieces = output_pieces(fake_translation(tokenizer.decode(context)))
+    if LOOP:
+        pieces = [piece.rstrip() + " " for piece in pieces]
+        pieces = [pieces[index % len(pieces)] for index in range(max_tokens)]
+    finished = not LOOP and len(pieces) < max_tokens
+    pieces = pieces[:max_tokens]
+    for index, piece in enumerate(pieces):
+        from_draft = draft_model is not None and (index % 10) < DRAFT_ACCEPT * 10
+        time.sleep(DECODE_MS * (DRAFT_COST if from_draft else 1) / 1000)
+        if prompt_cache is not None:
+            for layer in prompt_cache:
+                layer.tokens.append(1)
+        yield SimpleNamespace(text=piece, token=1, from_draft=from_draft)
+    if finished:
+        yield SimpleNamespace(text=END_OF_TURN, token=EOS_TOKEN_ID, from_draft=False)
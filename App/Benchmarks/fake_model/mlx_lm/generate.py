@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import time
+from types import SimpleNamespace
+
+from mlx_lm import DECODE_MS, EOS_TOKEN_ID, LOOP, PREFILL_MS, fake_translation, output_pieces
+
+
+def generate_step(prompt, model, max_tokens: int = 256, prompt_cache=None, **kwargs):
+    time.sleep(PREFILL_MS * len(prompt) / 1000)
+    if prompt_cache is not None:
+        prompt_cache[0].tokens.extend(int(token) for token in prompt)
+    return
+    yield
+
+
+class BatchGenerator:
+    def __init__(self, model, max_tokens: int = 128, stop_tokens=None, **kwargs) -> None:
+        self.max_tokens = max_tokens
+        self.pending: dict[int, list[int]] = {}
+        self.truncated: set[int] = set()
+        self.next_uid = 0
+
+    def insert(self, prompts, max_tokens=None) -> list[int]:
+        if not isinstance(max_tokens, list):
+            max_tokens = [max_tokens or self.max_tokens] * len(prompts)
+        uids = []
+        for prompt, limit in zip(prompts, max_tokens):
+            time.sleep(PREFILL_MS * len(prompt) / 1000)
+            text = fake_translation("".join(chr(token) for token in prompt))
+            if LOOP:
+                pieces = [piece.rstrip() + " " for piece in output_pieces(text)]
+                text = "".join(pieces[index % len(pieces)] for index in range(limit))
+            tokens = [ord(char) for char in text]
+            self.pending[self.next_uid] = tokens[:limit]
+            if len(tokens) > limit:
+                self.truncated.add(self.next_uid)
+            uids.append(self.next_uid)
+            self.next_uid += 1
+        return uids
+
+    def next(self) -> list[SimpleNamespace]:
+        if not self.pending:
+            return []
+        time.sleep(DECODE_MS / 1000)
+        responses = []
+        for uid, tokens in list(self.pending.items()):
+            if len(tokens) == 1 and uid in self.truncated:
+                responses.append(SimpleNamespace(uid=uid, token=tokens.pop(0), finish_reason="length"))
+                del self.pending[uid]
+            elif tokens:
+                responses.append(SimpleNamespace(uid=uid, token=tokens.pop(0), finish_reason=None))
+            else:
+                responses.append(SimpleNamespace(uid=uid, token=EOS_TOKEN_ID, finish_reason="stop"))
+                del self.pending[uid]
+        return responses
+
+    def remove(self, uids) -> None:
+        for uid in uids:
+            self.pending.pop(uid, None)
+
+    def close(self) -> None:
+        self.pending.clear()
@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+
+class FakeKVCache:
+    def __init__(self) -> None:
+        self.tokens: list[int] = []
+
+    @property
+    def offset(self) -> int:
+        return len(self.tokens)
+
+
+def make_prompt_cache(model, max_kv_size=None) -> list[FakeKVCache]:
+    return [FakeKVCache()]
+
+
+def can_trim_prompt_cache(cache) -> bool:
+    return True
+
+
+def trim_prompt_cache(cache, num_tokens: int) -> int:
+    for layer in cache:
+        del layer.tokens[len(layer.tokens) - num_tokens :]
+    return num_tokens
@@ -527,6 +527,7 @@ final class TranslateTextApp: NSObject, NSApplicationDelegate, NSWindowDelegate,
     private var usesLightUI: Bool
     private var restoredTarget: String?
     private var restoredTranslation: String?
+    private var loadedDocumentFormat: String?
     private var lastForeignLanguage: String {
         get { settingString("primaryForeignLanguage", fallback: defaultPrimaryForeignLanguage) }
         set { UserDefaults.standard.set(newValue, forKey: "primaryForeignLanguage") }
@@ -1374,13 +1375,17 @@ final class TranslateTextApp: NSObject, NSApplicationDelegate, NSWindowDelegate,
         lightModel?.sourceText = text
         lightModel?.targetLanguage = target
         lightModel?.backendName = backendDisplayName()
-        sendCommand([
+        var command: [String: Any] = [
             "action": "translate",
             "text": text,
             "target": target,
             "style": stylePopup.titleOfSelectedItem ?? "Default",
             "backend": activeWorkerBackend,
-        ])
+        ]
+        if let loadedDocumentFormat {
+            command["format"] = loadedDocumentFormat
+        }
+        sendCommand(command)
     }
 
     @objc private func updateAndTranslate(_ sender: Any?) {
@@ -1437,6 +1442,7 @@ final class TranslateTextApp: NSObject, NSApplicationDelegate, NSWindowDelegate,
 
     func textDidChange(_ notification: Notification) {
         guard notification.object as AnyObject? === originalTextView else { return }
+        loadedDocumentFormat = nil
         updateTranslationHeader()
     }
 
@@ -1507,6 +1513,8 @@ final class TranslateTextApp: NSObject, NSApplicationDelegate, NSWindowDelegate,
             UTType(filenameExtension: "js")!,
             UTType(filenameExtension: "html")!,
             UTType(filenameExtension: "csv")!,
+            UTType(filenameExtension: "srt")!,
+            UTType(filenameExtension: "vtt")!,
         ]
         panel.allowsMultipleSelection = false
         panel.canChooseDirectories = false
@@ -1515,6 +1523,7 @@ final class TranslateTextApp: NSObject, NSApplicationDelegate, NSWindowDelegate,
             do {
                 let content = try String(contentsOf: url, encoding: .utf8)
                 originalTextView.string = content
+                loadedDocumentFormat = url.pathExtension.lowercased()
                 if !isOriginalExpanded {
                     toggleOriginal(nil)
                 }
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+APP_DIR = Path(__file__).resolve().parent.parent
+BENCHMARKS_DIR = APP_DIR / "Benchmarks"
+FAKE_MODEL_DIR = BENCHMARKS_DIR / "fake_model"
+sys.path.insert(0, str(APP_DIR / "Workers"))
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from bench_worker import WorkerProcess
+from cloud_standin import start_standin
+
+
+DONE_EVENTS = {"complete", "error", "stopped"}
+TIMEOUT = 30.0
+
+
+class Worker(WorkerProcess):
+    def translate(self, job_id: str, text: str, **options) -> list[dict]:
+        command = {"action": "translate", "id": job_id, "text": text, "target": "Deutsch", **options}
+        self.send(command)
+        return [event for _, event in self.wait_for(DONE_EVENTS, TIMEOUT, job_id)]
+
+    def call(self, command: dict, name: str) -> dict:
+        self.send(command)
+        return self.wait_for({name}, TIMEOUT)[-1][1]
+
+
+def final_text(events: list[dict]) -> str:
+    output = ""
+    for event in events:
+        if event["event"] == "replace":
+            output = event["text"]
+        elif event["event"] == "token":
+            output += event["text"]
+    return output
+
+
+@pytest.fixture(scope="session")
+def standin():
+    server = start_standin()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def worker_factory(tmp_path, standin):
+    workers: list[Worker] = []
+
+    def start(backend: str = "gemma", **settings: str) -> Worker:
+        environment = dict(os.environ)
+        environment.update(standin.worker_environment())
+        environment.update(
+            {
+                "PYTHONPATH": os.pathsep.join(filter(None, [str(FAKE_MODEL_DIR), environment.get("PYTHONPATH", "")])),
+                "PYTHONUNBUFFERED": "1",
+                "TRANSLATE_TEXT_BACKEND": backend,
+                "TRANSLATE_TEXT_MODEL": "fake-translategemma",
+                "TRANSLATE_TEXT_CACHE_PATH": str(tmp_path / "cache.sqlite3"),
+                "TRANSLATE_TEXT_MEMORY_PATH": str(tmp_path / "memory.sqlite3"),
+                "TRANSLATE_TEXT_DICTIONARY": "0",
+                "TRANSLATE_TEXT_DAEMON": "0",
+                "TRANSLATE_TEXT_WARMUP": "0",
+                "TRANSLATE_TEXT_GOOGLE_RATE": "0",
+                "TRANSLATE_TEXT_BING_RATE": "0",
+                "FAKE_MLX_DECODE_MS": "0",
+                **settings,
+            }
+        )
+        worker = Worker(backend, environment)
+        workers.append(worker)
+        return worker
+
+    yield start
+    for worker in workers:
+        worker.close()
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import pytest
+
+from conftest import TIMEOUT, final_text
+
+
+TEXTS = ["Open https://example.com/Docs for {count} items.", "Close the door.", "Turn on the light in the hall."]
+
+
+def run_batch(worker, batch_id: str, texts: list[str]) -> dict[int, dict]:
+    worker.send({"action": "translate_batch", "id": batch_id, "items": texts, "target": "Deutsch", "cache": False})
+    events = [event for _, event in worker.wait_for({"batch_complete"}, TIMEOUT, batch_id)]
+    return {event["id"]: event for event in events if event["event"] == "item_complete"}
+
+
+def test_batch_matches_single_translations(worker_factory):
+    worker = worker_factory(TRANSLATE_TEXT_CACHE="0", TRANSLATE_TEXT_MEMORY="0")
+    batch = run_batch(worker, "batch", TEXTS)
+
+    for index, text in enumerate(TEXTS):
+        assert batch[index]["text"] == final_text(worker.translate(f"single{index}", text, cache=False))
+    assert batch[0]["text"] == "[de] OPEN https://example.com/Docs FOR {count} ITEMS."
+
+
+@pytest.mark.parametrize("texts", [TEXTS, TEXTS[1:2]])
+def test_batch_stops_repetition_like_single(worker_factory, texts):
+    worker = worker_factory(
+        TRANSLATE_TEXT_CACHE="0", TRANSLATE_TEXT_MEMORY="0", FAKE_MLX_LOOP="1", TRANSLATE_TEXT_TOKEN_SAFETY="4"
+    )
+    batch = run_batch(worker, "batch", texts)
+    single = worker.translate("single", texts[0], cache=False)
+
+    assert {event["stop_reason"] for event in batch.values()} == {"repetition"}
+    assert single[-1]["stop_reason"] == "repetition"
+    assert batch[0]["text"] == final_text(single)
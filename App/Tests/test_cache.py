@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from conftest import final_text
+
+
+TEXT = "Turn on the light in the hall."
+
+
+def test_cache_hit_replays_replace_and_complete(worker_factory):
+    worker = worker_factory(TRANSLATE_TEXT_MEMORY="0")
+    first = worker.translate("first", TEXT)
+    second = worker.translate("second", TEXT)
+
+    assert first[-1]["event"] == "complete"
+    assert [event["event"] for event in second] == ["queued", "replace", "complete"]
+    assert second[1]["text"] == final_text(first)
+    assert second[-1]["cached"] is True
+
+
+def test_cache_key_includes_style(worker_factory):
+    worker = worker_factory(TRANSLATE_TEXT_MEMORY="0")
+    worker.translate("default", TEXT, style="Default")
+    academic = worker.translate("academic", TEXT, style="Academic")
+
+    assert "cached" not in academic[-1]
+
+
+def test_cache_false_bypasses_cache(worker_factory):
+    worker = worker_factory(TRANSLATE_TEXT_MEMORY="0")
+    worker.translate("first", TEXT)
+    bypass = worker.translate("bypass", TEXT, cache=False)
+
+    assert "cached" not in bypass[-1]
+    assert final_text(bypass) == "[de] TURN ON THE LIGHT IN THE HALL."
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from translate_text_dedup import DedupIndex, Deduplicator
+
+
+def test_groups_adapt_numbers_and_case():
+    dedup = Deduplicator(["Save 3 files", "Save 12 files", "SAVE 3 FILES", "Open"])
+
+    assert dedup.unit_texts == ["Save 3 files", "Open"]
+    assert dedup.expand(["Speichere 3 Dateien", "Öffnen"]) == [
+        "Speichere 3 Dateien",
+        "Speichere 12 Dateien",
+        "SPEICHERE 3 DATEIEN",
+        "Öffnen",
+    ]
+
+
+def test_index_evicts_least_recently_used():
+    dedup = DedupIndex(2)
+    dedup.put("Open the door", "Öffne die Tür")
+    dedup.put("Close the door", "Schließe die Tür")
+    assert dedup.get("OPEN THE DOOR") == "ÖFFNE DIE TÜR"
+    dedup.put("Lock the door", "Sperre die Tür")
+
+    assert len(dedup.entries) == 2
+    assert dedup.get("Close the door") is None
+    assert dedup.get("Open the door") == "Öffne die Tür"
+    assert set(dedup.folds) == {"open the door", "lock the door"}
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import sqlite3
+
+from translate_text_dictionary import DictionaryStore, case_folded_key
+
+
+ENTRY = "/ˈrʌnɪŋ/\nverb\n跑步\nShe is running.\n她在跑步。"
+
+
+def test_key_is_case_folded_not_stemmed():
+    assert case_folded_key(" «Running»! ") == case_folded_key("RUNNING") == "running"
+    assert case_folded_key("ran") != case_folded_key("running")
+
+
+def test_entries_are_shared_across_case_only(tmp_path):
+    store = DictionaryStore(tmp_path / "dictionary.sqlite3")
+    assert store.put("Running", "en", "zh", ENTRY, "q8")
+
+    assert store.get("running", "en", "zh") == ENTRY
+    assert store.get("runs", "en", "zh") is None
+    assert not store.put("walk", "en", "zh", "not an entry", "q8")
+
+
+def test_older_files_are_migrated(tmp_path):
+    path = tmp_path / "dictionary.sqlite3"
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE entries (source TEXT NOT NULL, lemma TEXT NOT NULL, target TEXT NOT NULL, entry TEXT NOT NULL, "
+        "model TEXT NOT NULL, origin TEXT NOT NULL, created REAL NOT NULL, "
+        "PRIMARY KEY (source, lemma, target)) WITHOUT ROWID"
+    )
+    connection.execute("INSERT INTO entries VALUES ('en', 'running', 'zh', ?, 'q8', 'generated', 0)", (ENTRY,))
+    connection.commit()
+    connection.close()
+
+    assert DictionaryStore(path).get("Running", "en", "zh") == ENTRY
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import re
+
+import pytest
+
+from translate_text_formats import extract, is_translatable
+
+
+SAMPLES = {
+    "srt": (
+        "1\r\n00:00:01,000 --> 00:00:02,500\r\nHello there.\r\n\r\n"
+        "2\r\n00:00:03,000 --> 00:00:04,000\r\nHow are you?\r\nFine, thanks.\r\n"
+    ),
+    "vtt": "WEBVTT\n\nNOTE keep this\n\n00:00.000 --> 00:01.000\nHello there.\n\n00:01.500 --> 00:02.000\nGoodbye.\n",
+    "markdown": (
+        "---\ntitle: Guide\n---\n\n# Getting started\n\nInstall the app, then open it.\n\n"
+        "```bash\nmake build\n```\n\n- First item\n- `code_only`\n\n| Name | Notes |\n| --- | --- |\n| Alpha | Works well |\n"
+    ),
+    "json": '{\n  "title": "Save file",\n  "count": 3,\n  "items": ["Open", "Close"],\n  "nested": {"hint": "Press OK"}\n}\n',
+    "csv": 'id,text,notes\n1,"Hello, world",first\n2,Goodbye,"said ""bye"""\n',
+    "html": (
+        "<html><head><style>p { color: red; }</style></head><body>\n"
+        "<h1>Welcome</h1>\n<p>Read the <b>guide</b> first.</p>\n<pre>keep this</pre>\n"
+        "<script>var x = 'skip';</script>\n</body></html>\n"
+    ),
+}
+
+
+def outside_segments(document) -> str:
+    pieces = []
+    position = 0
+    for segment in document.segments:
+        pieces.append(document.text[position : segment.start])
+        position = segment.end
+    pieces.append(document.text[position:])
+    return "".join(pieces)
+
+
+@pytest.mark.parametrize("kind", sorted(SAMPLES))
+def test_render_without_translations_is_identity(kind):
+    document = extract(kind, SAMPLES[kind])
+
+    assert document.segments
+    assert document.render([None] * len(document.segments)) == SAMPLES[kind]
+
+
+@pytest.mark.parametrize("kind", sorted(SAMPLES))
+def test_render_keeps_bytes_outside_segments(kind):
+    document = extract(kind, SAMPLES[kind])
+    rendered = document.render([f"@@{index}@@" for index in range(len(document.segments))])
+
+    marker = r'"?@@\d+@@"?' if kind == "csv" else r"@@\d+@@"
+
+    assert re.sub(marker, "", rendered) == outside_segments(document)
+
+
+def test_srt_segments_are_cue_text_only():
+    document = extract("srt", SAMPLES["srt"])
+
+    assert [segment.text for segment in document.segments] == ["Hello there.", "How are you?\r\nFine, thanks."]
+    assert document.render(["Hallo.", "Wie geht's?\nGut, danke.\n"]).endswith("Wie geht's?\r\nGut, danke.\r\n")
+
+
+@pytest.mark.parametrize("text", ["Hi.", "Yes.", "Done.", "Loading...", "e.g.", "Next/Previous", "R&D", "Wait…"])
+def test_short_text_with_punctuation_is_translatable(text):
+    assert is_translatable(text)
+
+
+@pytest.mark.parametrize(
+    "text", ["https://example.com", "/usr/bin", "src/main.py", "snake_case", "os.path", "config.json", "a=1&b=2", "$HOME"]
+)
+def test_code_tokens_are_skipped(text):
+    assert not is_translatable(text)
+
+
+def test_short_cues_and_values_are_extracted():
+    subtitles = extract("srt", "1\n00:00:01,000 --> 00:00:02,000\nHi.\n\n2\n00:00:03,000 --> 00:00:04,000\nLoading...\n")
+    values = extract("json", '{"a": "Loading...", "b": "Cancel", "c": "src/main.py"}')
+
+    assert [segment.text for segment in subtitles.segments] == ["Hi.", "Loading..."]
+    assert [segment.text for segment in values.segments] == ["Loading...", "Cancel"]
+
+
+def test_markdown_skips_code_and_front_matter():
+    texts = [segment.text for segment in extract("markdown", SAMPLES["markdown"]).segments]
+
+    assert "make build" not in texts and "title: Guide" not in texts and "`code_only`" not in texts
+    assert {"Getting started", "Install the app, then open it.", "First item", "Works well"} <= set(texts)
+
+
+def test_html_skips_script_style_and_pre():
+    texts = [segment.text for segment in extract("html", SAMPLES["html"]).segments]
+
+    assert "keep this" not in texts and not any("skip" in text or "color" in text for text in texts)
+    assert "Welcome" in texts
+
+
+def test_json_translations_are_escaped():
+    document = extract("json", SAMPLES["json"])
+    rendered = json.loads(document.render(['Say "hi"\\now'] * len(document.segments)))
+
+    assert rendered["title"] == 'Say "hi"\\now'
+    assert rendered["count"] == 3
+    assert rendered["nested"]["hint"] == 'Say "hi"\\now'
+
+
+def test_csv_columns_and_quoting():
+    document = extract("csv", SAMPLES["csv"], ["text"])
+    rendered = document.render(['Hallo, "Welt"'] * len(document.segments))
+    rows = list(csv.reader(io.StringIO(rendered)))
+
+    assert [segment.text for segment in document.segments] == ["Hello, world", "Goodbye"]
+    assert rows == [["id", "text", "notes"], ["1", 'Hallo, "Welt"', "first"], ["2", 'Hallo, "Welt"', 'said "bye"']]
+    with pytest.raises(ValueError):
+        extract("csv", SAMPLES["csv"], ["missing"])
+
+
+def test_translate_file_keeps_structure(worker_factory, tmp_path):
+    source = tmp_path / "movie.srt"
+    output = tmp_path / "movie.de.srt"
+    source.write_bytes(b"\xef\xbb\xbf" + SAMPLES["srt"].encode("utf-8"))
+    worker = worker_factory(TRANSLATE_TEXT_CACHE="0", TRANSLATE_TEXT_MEMORY="0")
+    event = worker.call(
+        {"action": "translate_file", "id": "file", "input": str(source), "output": str(output), "target": "Deutsch"},
+        "file_complete",
+    )
+
+    assert event["segments"] == 2
+    assert output.read_bytes() == b"\xef\xbb\xbf" + (
+        "1\r\n00:00:01,000 --> 00:00:02,500\r\n[de] HELLO THERE.\r\n\r\n"
+        "2\r\n00:00:03,000 --> 00:00:04,000\r\n[de] HOW ARE YOU?\r\nFINE, THANKS.\r\n"
+    ).encode("utf-8")
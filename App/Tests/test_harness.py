@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from bench_worker import percentile, summarize
+from cloud_standin import fake_translation
+from conftest import final_text
+
+
+TEXT = "Turn on the light in the hall."
+
+
+def test_fake_model_streams_deterministic_tokens(worker_factory):
+    worker = worker_factory(TRANSLATE_TEXT_CACHE="0", TRANSLATE_TEXT_MEMORY="0")
+    events = worker.translate("fake", TEXT)
+
+    assert events[-1]["event"] == "complete"
+    assert any(event["event"] == "token" for event in events)
+    assert final_text(events) == "[de] TURN ON THE LIGHT IN THE HALL."
+
+
+def test_standin_serves_both_cloud_backends(worker_factory, standin):
+    for backend, route in (("google", "google"), ("bing", "bing_translate")):
+        before = standin.state.snapshot()["counts"].get(route, 0)
+        worker = worker_factory(backend, TRANSLATE_TEXT_CACHE="0", TRANSLATE_TEXT_MEMORY="0")
+        events = worker.translate(backend, TEXT, backend=backend)
+
+        assert final_text(events) == fake_translation(TEXT, "de")
+        assert standin.state.snapshot()["counts"][route] > before
+
+
+def test_summary_percentiles():
+    values = [float(value) for value in range(1, 101)]
+
+    assert percentile([], 0.5) is None
+    assert percentile(values, 0.5) == 51.0
+    assert summarize(values)["p99"] == 99.0
+    assert summarize([])["mean"] is None
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from conftest import final_text
+from translate_text_masking import MaskedText, SentinelStream
+
+
+TEXT = "See https://example.com/Docs for {count} items, run `make build` and mail ops@example.com."
+
+
+def test_mask_round_trip():
+    masked = MaskedText(TEXT)
+
+    assert masked.spans == ["https://example.com/Docs", "{count}", "`make build`", "ops@example.com"]
+    assert "example.com" not in masked.text
+    assert masked.restore(masked.text) == TEXT
+    assert masked.restore(masked.text.upper()) == (
+        "SEE https://example.com/Docs FOR {count} ITEMS, RUN `make build` AND MAIL ops@example.com."
+    )
+
+
+def test_restore_rejects_missing_or_repeated_markers():
+    masked = MaskedText("Open {path} now")
+
+    assert masked.restore("Öffne jetzt") is None
+    assert masked.restore("Öffne ⟦0⟧ ⟦0⟧ jetzt") is None
+    assert masked.restore("Öffne ⟦ 0 ⟧ jetzt") == "Öffne {path} jetzt"
+
+
+def test_text_with_sentinels_is_left_unmasked():
+    masked = MaskedText("Keep ⟦0⟧ and {name}")
+
+    assert masked.spans == []
+    assert masked.text == "Keep ⟦0⟧ and {name}"
+
+
+def test_sentinel_stream_holds_back_split_markers():
+    masked = MaskedText("Open {path} now")
+    stream = SentinelStream(masked)
+    chunks = ["Öffne ", "⟦", "0", "⟧ jetzt"]
+
+    assert "".join(stream.feed(chunk) for chunk in chunks) + stream.finish() == "Öffne {path} jetzt"
+    assert SentinelStream(masked).feed("Öffne ⟦") == "Öffne "
+
+
+def test_cloud_translation_keeps_masked_spans(worker_factory):
+    worker = worker_factory("google", TRANSLATE_TEXT_CACHE="0", TRANSLATE_TEXT_MEMORY="0")
+    events = worker.translate("masked", TEXT, backend="google")
+
+    assert events[-1]["event"] == "complete"
+    assert final_text(events) == (
+        "[de] SEE https://example.com/Docs FOR {count} ITEMS, RUN `make build` AND MAIL ops@example.com."
+    )
+
+
+def test_local_translation_keeps_masked_spans(worker_factory):
+    worker = worker_factory(TRANSLATE_TEXT_CACHE="0", TRANSLATE_TEXT_MEMORY="0")
+    events = worker.translate("masked", TEXT)
+
+    assert events[-1]["event"] == "complete"
+    assert "https://example.com/Docs" in final_text(events)
+    assert "{count}" in final_text(events)
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import sqlite3
+
+from conftest import final_text
+from translate_text_memory import TranslationMemory
+
+
+TEXT = "Turn on the light in the hall."
+
+
+def test_cache_false_bypasses_memory(worker_factory):
+    worker = worker_factory(TRANSLATE_TEXT_CACHE="0")
+    worker.translate("first", TEXT)
+    bypass = worker.translate("bypass", TEXT, cache=False)
+
+    assert "memory" not in bypass[-1]
+    assert not any(event["event"] == "memory_match" for event in bypass)
+    assert final_text(bypass) == "[de] TURN ON THE LIGHT IN THE HALL."
+
+
+def test_cache_false_does_not_store(worker_factory):
+    worker = worker_factory(TRANSLATE_TEXT_CACHE="0")
+    worker.translate("bypass", TEXT, cache=False)
+    stats = worker.call({"action": "memory_stats"}, "memory_stats")
+
+    assert stats["segments"] == 0
+
+
+def test_memory_exact_hit_needs_same_style(worker_factory):
+    worker = worker_factory(TRANSLATE_TEXT_CACHE="0")
+    default = worker.translate("default", TEXT, style="Default")
+    academic = worker.translate("academic", TEXT, style="Academic")
+    again = worker.translate("again", TEXT, style="Default")
+
+    assert "memory" not in academic[-1]
+    assert final_text(academic) != final_text(default)
+    assert [event["event"] for event in again] == ["queued", "replace", "complete"]
+    assert again[-1]["memory"] == "exact"
+    assert again[1]["text"] == final_text(default)
+
+
+def test_memory_exact_hit_keeps_case(worker_factory):
+    worker = worker_factory(TRANSLATE_TEXT_CACHE="0")
+    worker.translate("mixed", "Turn on the Light in the hall.")
+    shouted = worker.translate("shouted", "TURN   ON the light IN the hall.")
+
+    assert "memory" not in shouted[-1]
+    assert final_text(shouted) == "[de] TURN   ON THE LIGHT IN THE HALL."
+
+
+def test_cloud_memory_hit_replays_replace_and_complete(worker_factory):
+    worker = worker_factory("google", TRANSLATE_TEXT_CACHE="0")
+    first = worker.translate("first", TEXT, backend="google")
+    second = worker.translate("second", TEXT, backend="google")
+
+    assert final_text(first) == "[de] TURN ON THE LIGHT IN THE HALL."
+    assert [event["event"] for event in second] == ["queued", "replace", "complete"]
+    assert second[-1]["memory"] == "exact"
+
+
+def test_tmx_round_trip_keeps_scope(tmp_path):
+    memory = TranslationMemory(tmp_path / "memory.sqlite3")
+    memory.add(TEXT, "Mach das Licht an.", "en", "de", "gemma", "gemma:q8", "Default")
+    memory.add(TEXT, "Licht an!", "en", "de", "google", "google", "")
+    memory.export_tmx(tmp_path / "memory.tmx")
+    imported = TranslationMemory(tmp_path / "imported.sqlite3")
+
+    assert imported.import_tmx(tmp_path / "memory.tmx")["segments"] == 2
+    assert imported.exact(TEXT, "en", "de", "gemma:q8", "Default") == "Mach das Licht an."
+    assert imported.exact(TEXT, "en", "de", "google", "") == "Licht an!"
+    assert imported.exact(TEXT, "en", "de", "gemma:q8", "Academic") is None
+
+
+def test_unscoped_tmx_units_match_any_scope(tmp_path):
+    path = tmp_path / "vendor.tmx"
+    path.write_text(
+        '<tmx version="1.4"><header srclang="en"/><body><tu>'
+        f'<tuv xml:lang="en"><seg>{TEXT}</seg></tuv><tuv xml:lang="de"><seg>Licht an.</seg></tuv>'
+        "</tu></body></tmx>",
+        encoding="utf-8",
+    )
+    memory = TranslationMemory(tmp_path / "memory.sqlite3")
+    memory.import_tmx(path)
+
+    assert memory.exact(TEXT, "en", "de", "google", "") == "Licht an."
+    assert memory.exact(TEXT, "en", "de", "gemma:q8", "Default") == "Licht an."
+
+
+def test_older_memory_files_gain_scope_columns(tmp_path):
+    path = tmp_path / "memory.sqlite3"
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE segments (id INTEGER PRIMARY KEY, digest TEXT NOT NULL UNIQUE, source_lang TEXT NOT NULL, "
+        "target_lang TEXT NOT NULL, source TEXT NOT NULL, target TEXT NOT NULL, origin TEXT NOT NULL, "
+        "created REAL NOT NULL, used REAL NOT NULL)"
+    )
+    connection.close()
+    memory = TranslationMemory(path)
+
+    assert memory.add(TEXT, "Licht an.", "en", "de", "google", "google", "")
+    assert memory.exact(TEXT, "en", "de", "google", "") == "Licht an."
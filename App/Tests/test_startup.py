@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from conftest import TIMEOUT
+
+
+def startup_events(worker) -> list[dict]:
+    return [event for _, event in worker.wait_for({"startup_timing"}, TIMEOUT)]
+
+
+def test_ready_is_sent_after_warm_up(worker_factory):
+    worker = worker_factory(TRANSLATE_TEXT_WARMUP="1", FAKE_MLX_DECODE_MS="5")
+    events = startup_events(worker)
+    timing = events[-1]
+
+    assert [event["event"] for event in events].count("ready") == 1
+    assert timing["warmup_ms"] > 0
+    assert timing["ready_at_ms"] >= timing["model_load_ms"] + timing["warmup_ms"]
+
+
+def test_ready_without_warm_up(worker_factory):
+    worker = worker_factory()
+    events = startup_events(worker)
+
+    assert "ready" in [event["event"] for event in events]
+    assert "warmup_ms" not in events[-1]
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+
+
+DEFAULT_CACHE_PATH = Path.home() / "Library" / "Caches" / "TranslateText" / "translations.sqlite3"
+
+
+def normalize_cache_text(text: str) -> str:
+    normalized = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(line.rstrip() for line in normalized.strip().split("\n"))
+
+
+def cache_key(*parts: str) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+class TranslationCache:
+    def __init__(
+        self,
+        path: str | os.PathLike | None = None,
+        memory_entries: int = 512,
+        disk_entries: int = 50000,
+        max_age_days: float = 30.0,
+    ) -> None:
+        self.path = Path(path).expanduser() if path else None
+        self.memory_entries = max(memory_entries, 0)
+        self.disk_entries = max(disk_entries, 0)
+        self.max_age_seconds = max(max_age_days, 0) * 86400
+        self.memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.lock = Lock()
+        self.connection: sqlite3.Connection | None = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.writes_since_prune = 0
+        if self.path is not None and self.disk_entries:
+            self._open()
+
+    def _open(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "key TEXT PRIMARY KEY, output TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS translations_accessed ON translations(accessed)")
+            self.connection = connection
+            self._prune()
+        except sqlite3.Error:
+            self.connection = None
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                output, created = entry
+                if not self.max_age_seconds or now - created <= self.max_age_seconds:
+                    self.memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return output
+                del self.memory[key]
+            if self.connection is not None:
+                try:
+                    row = self.connection.execute(
+                        "SELECT output, created FROM translations WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        output, created = row
+                        if not self.max_age_seconds or now - created <= self.max_age_seconds:
+                            self.connection.execute("UPDATE translations SET accessed = ? WHERE key = ?", (now, key))
+                            self._remember(key, output, created)
+                            self.disk_hits += 1
+                            return output
+                        self.connection.execute("DELETE FROM translations WHERE key = ?", (key,))
+                        self.evictions += 1
+                except sqlite3.Error:
+                    pass
+            self.misses += 1
+            return None
+
+    def put(self, key: str, output: str) -> None:
+        now = time.time()
+        with self.lock:
+            self._remember(key, output, now)
+            self.stores += 1
+            if self.connection is None:
+                return
+            try:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO translations (key, output, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, output, now, now),
+                )
+                self.writes_since_prune += 1
+                if self.writes_since_prune >= max(self.disk_entries // 20, 1):
+                    self._prune()
+            except sqlite3.Error:
+                pass
+
+    def _remember(self, key: str, output: str, created: float) -> None:
+        if not self.memory_entries:
+            return
+        self.memory[key] = (output, created)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _prune(self) -> None:
+        self.writes_since_prune = 0
+        if self.connection is None:
+            return
+        if self.max_age_seconds:
+            cursor = self.connection.execute(
+                "DELETE FROM translations WHERE created < ?", (time.time() - self.max_age_seconds,)
+            )
+            self.evictions += max(cursor.rowcount, 0)
+        count = self.connection.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        if count > self.disk_entries:
+            cursor = self.connection.execute(
+                "DELETE FROM translations WHERE key IN "
+                "(SELECT key FROM translations ORDER BY accessed ASC LIMIT ?)",
+                (count - self.disk_entries,),
+            )
+            self.evictions += max(cursor.rowcount, 0)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.memory.clear()
+            if self.connection is not None:
+                try:
+                    self.connection.execute("DELETE FROM translations")
+                except sqlite3.Error:
+                    pass
+
+    def stats(self) -> dict:
+        with self.lock:
+            disk_count = 0
+            if self.connection is not None:
+                try:
+                    disk_count = self.connection.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": len(self.memory),
+                "disk_entries": disk_count,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "path": str(self.path) if self.connection is not None else None,
+            }
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import re
+
+
+SCRIPT_RANGES = {
+    "han": ((0x3400, 0x4DBF), (0x4E00, 0x9FFF), (0xF900, 0xFAFF)),
+    "kana": ((0x3040, 0x30FF), (0x31F0, 0x31FF), (0xFF66, 0xFF9F)),
+    "hangul": ((0x1100, 0x11FF), (0x3130, 0x318F), (0xAC00, 0xD7A3)),
+    "cyrillic": ((0x0400, 0x04FF),),
+    "arabic": ((0x0600, 0x06FF), (0x0750, 0x077F)),
+    "devanagari": ((0x0900, 0x097F),),
+    "latin": ((0x41, 0x5A), (0x61, 0x7A), (0xC0, 0xD6), (0xD8, 0xF6), (0xF8, 0x24F)),
+    "digit": ((0x30, 0x39),),
+}
+PUNCTUATION = "，。！？；：,.!?;:"
+TRADITIONAL_HINTS = "這們個來說時為會對與後過還麼國學經裡開關頭東車長門問間現點體實發當電話語讀書愛見聽覺買賣寫區華歡樂邊錢難題應灣臺網頁實驗證據選擇認識"
+SIMPLIFIED_HINTS = "这们个来说时为会对与后过还么国学经里开关头东车长门问间现点体实发当电话语读书爱见听觉买卖写区华欢乐边钱难题应湾台网页实验证据选择认识"
+LATIN_HINTS = {
+    "de": "äöüßÄÖÜ",
+    "es": "ñÑ¿¡",
+    "pt": "ãõÃÕ",
+    "fr": "êëîïœûÿçÊËÎÏŒÛŸÇ",
+    "it": "ìòÌÒ",
+    "mt": "ċġħżĊĠĦŻ",
+}
+STOPWORDS = {
+    "en": {"the", "and", "is", "are", "of", "to", "with", "this", "that", "you", "it", "for"},
+    "fr": {"le", "la", "les", "et", "est", "des", "une", "dans", "pour", "avec", "pas", "que", "je", "vous"},
+    "de": {"der", "die", "das", "und", "ist", "nicht", "ein", "eine", "mit", "ich", "sie", "zu", "den"},
+    "it": {"il", "lo", "gli", "e", "di", "che", "non", "per", "una", "sono", "con", "come", "ciao"},
+    "es": {"el", "los", "las", "y", "es", "de", "que", "una", "para", "con", "por", "como", "hola"},
+    "pt": {"o", "os", "as", "e", "de", "que", "uma", "para", "com", "não", "um", "você", "olá"},
+    "mt": {"il", "u", "ta", "li", "huwa", "hija", "għal", "minn", "jien", "dan"},
+}
+STOPWORD_SCAN_CHARS = 2000
+WORD_PATTERN = re.compile(r"[^\W\d_]+")
+CLASSES = (
+    "han",
+    "kana",
+    "hangul",
+    "cyrillic",
+    "arabic",
+    "devanagari",
+    "latin",
+    "digit",
+    "space",
+    "whitespace",
+    "punctuation",
+    "traditional",
+    "simplified",
+    *(f"latin_{language}" for language in LATIN_HINTS),
+    "control",
+)
+MARKERS = {name: chr(index + 1) for index, name in enumerate(CLASSES)}
+TABLE_SIZE = 0x10000
+_TABLE: list[str | None] | None = None
+
+
+def classification_table() -> list[str | None]:
+    global _TABLE
+    if _TABLE is None:
+        table: list[str | None] = [None] * TABLE_SIZE
+        for name, ranges in SCRIPT_RANGES.items():
+            for start, end in ranges:
+                table[start : end + 1] = [MARKERS[name]] * (end + 1 - start)
+        table[:0x20] = [MARKERS["control"]] * 0x20
+        for code in range(0x3001):
+            if chr(code).isspace():
+                table[code] = MARKERS["whitespace"]
+        table[0x20] = MARKERS["space"]
+        for name, chars in (("punctuation", PUNCTUATION), ("traditional", TRADITIONAL_HINTS), ("simplified", SIMPLIFIED_HINTS)):
+            for char in chars:
+                table[ord(char)] = MARKERS[name]
+        for language, hints in LATIN_HINTS.items():
+            for char in hints:
+                table[ord(char)] = MARKERS[f"latin_{language}"]
+        _TABLE = table
+    return _TABLE
+
+
+class TextProfile:
+    def __init__(self, text: str, counts: dict[str, int]) -> None:
+        self.text = text
+        self.length = len(text)
+        self.counts = counts
+        self.han = counts["han"] + counts["traditional"] + counts["simplified"]
+        self.kana = counts["kana"]
+        self.cjk = self.han + self.kana
+        self.latin_hints = {language: counts[f"latin_{language}"] for language in LATIN_HINTS}
+        self.latin = counts["latin"] + sum(self.latin_hints.values())
+        self.spaces = counts["space"]
+        self.whitespace = counts["space"] + counts["whitespace"]
+        self.punctuation = counts["punctuation"]
+        self._language: str | None = None
+
+    @property
+    def has_punctuation(self) -> bool:
+        return self.punctuation > 0
+
+    @property
+    def scripts(self) -> dict[str, int]:
+        return {
+            "han": self.han,
+            "kana": self.kana,
+            "hangul": self.counts["hangul"],
+            "cyrillic": self.counts["cyrillic"],
+            "arabic": self.counts["arabic"],
+            "devanagari": self.counts["devanagari"],
+            "latin": self.latin,
+            "digit": self.counts["digit"],
+        }
+
+    @property
+    def language(self) -> str:
+        if self._language is None:
+            self._language = self._detect_language()
+        return self._language
+
+    def _detect_language(self) -> str:
+        weights = {
+            "cjk": self.cjk * 2,
+            "hangul": self.counts["hangul"] * 2,
+            "cyrillic": self.counts["cyrillic"],
+            "arabic": self.counts["arabic"],
+            "devanagari": self.counts["devanagari"],
+            "latin": self.latin,
+        }
+        script, weight = max(weights.items(), key=lambda item: item[1])
+        if not weight:
+            return "en"
+        if script == "cjk":
+            if self.kana and self.kana * 10 >= self.cjk:
+                return "ja"
+            return "zh-Hant" if self.counts["traditional"] > self.counts["simplified"] else "zh"
+        if script == "hangul":
+            return "ko"
+        if script == "cyrillic":
+            return "ru"
+        if script == "arabic":
+            return "ar"
+        if script == "devanagari":
+            return "hi"
+        return self._latin_language()
+
+    def _latin_language(self) -> str:
+        scores = {language: count * 3 for language, count in self.latin_hints.items()}
+        scores["en"] = 0
+        for word in WORD_PATTERN.findall(self.text[:STOPWORD_SCAN_CHARS].lower()):
+            for language, words in STOPWORDS.items():
+                if word in words:
+                    scores[language] += 1
+        language, score = max(scores.items(), key=lambda item: item[1])
+        return language if score else "en"
+
+
+def classify_text(text: str) -> TextProfile:
+    marked = text.translate(classification_table())
+    return TextProfile(text, {name: marked.count(marker) for name, marker in MARKERS.items()})
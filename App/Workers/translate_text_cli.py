@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import signal
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Event, Lock, Thread
+
+from translate_text_daemon import client_context, connect, spawn_daemon
+from translate_text_files import checkpoint_path
+from translate_text_formats import FORMATS, format_for
+from translate_text_worker import DAEMON_ENABLED, DAEMON_SOCKET, LANG_MAP, STYLES, TranslateWorker, normalized_backend
+
+
+PROGRESS_SECONDS = 0.2
+CANCEL_WAIT_SECONDS = 5.0
+
+
+def resolve_target(value: str) -> str:
+    lowered = value.strip().lower()
+    for name, code in LANG_MAP.items():
+        if value == name or lowered in {name.lower(), code.lower()}:
+            return name
+    choices = ", ".join(f"{name} ({code})" for name, code in LANG_MAP.items())
+    raise argparse.ArgumentTypeError(f"unknown target language {value!r}, choose one of: {choices}")
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class Request:
+    def __init__(self, command: dict, on_event=None) -> None:
+        self.command = command
+        self.id = command["id"]
+        self.on_event = on_event
+        self.done = Event()
+        self.errors: list[str] = []
+        self.metrics: dict = {}
+
+    def handle(self, event: dict) -> None:
+        name = event.get("event")
+        if name == "error":
+            self.errors.append(event.get("message") or event.get("title") or "error")
+        if self.on_event is not None:
+            self.on_event(event)
+        if name == "metrics":
+            self.metrics = event
+            self.done.set()
+        elif name == "error" and event.get("busy"):
+            self.done.set()
+
+    def fail(self, message: str) -> None:
+        self.errors.append(message)
+        self.done.set()
+
+
+class LocalEngine:
+    def __init__(self) -> None:
+        self.id = "cli"
+        self.output = self
+        self.rejected = 0
+        self.worker = TranslateWorker()
+        self.lock = Lock()
+        self.requests: dict[str, Request] = {}
+
+    def submit(self, request: Request) -> None:
+        with self.lock:
+            self.requests[request.id] = request
+        with client_context(self):
+            self.worker.handle(request.command)
+
+    def cancel(self, request: Request) -> None:
+        with client_context(self):
+            self.worker.handle({"action": "cancel", "id": request.id})
+
+    def forget(self, request: Request) -> None:
+        with self.lock:
+            self.requests.pop(request.id, None)
+
+    def write(self, job, event: str, payload: dict) -> None:
+        if job is None:
+            if event == "error":
+                print(f"{payload.get('title', 'Error')}: {payload.get('message', '')}", file=sys.stderr)
+            return
+        with self.lock:
+            request = self.requests.get(job.id)
+        if request is not None:
+            request.handle({"event": event, "job_id": job.id, **payload})
+
+    def flush(self) -> None:
+        return
+
+    def stats(self) -> dict:
+        return {}
+
+    def close(self) -> None:
+        self.worker.scheduler.shutdown()
+
+
+class SocketEngine:
+    def __init__(self, connection) -> None:
+        self.connection = connection
+        self.lock = Lock()
+        self.requests: dict[str, Request] = {}
+        self.reader = Thread(target=self._read_events, name="cli-reader", daemon=True)
+        self.reader.start()
+
+    def submit(self, request: Request) -> None:
+        with self.lock:
+            self.requests[request.id] = request
+        self._send(request.command)
+
+    def cancel(self, request: Request) -> None:
+        self._send({"action": "cancel", "id": request.id})
+
+    def forget(self, request: Request) -> None:
+        with self.lock:
+            self.requests.pop(request.id, None)
+
+    def close(self) -> None:
+        try:
+            self.connection.close()
+        except OSError:
+            pass
+
+    def _send(self, command: dict) -> None:
+        data = (json.dumps(command, ensure_ascii=False) + "\n").encode("utf-8")
+        with self.lock:
+            self.connection.sendall(data)
+
+    def _read_events(self) -> None:
+        try:
+            for line in self.connection.makefile("r", encoding="utf-8", errors="replace"):
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                with self.lock:
+                    request = self.requests.get(str(event.get("job_id")))
+                if request is not None:
+                    request.handle(event)
+                elif event.get("event") == "error":
+                    print(f"{event.get('title', 'Error')}: {event.get('message', '')}", file=sys.stderr)
+        except OSError:
+            pass
+        with self.lock:
+            pending = list(self.requests.values())
+        for request in pending:
+            request.fail("worker daemon disconnected")
+
+
+class Progress:
+    def __init__(self, weights: dict[str, int], enabled: bool, stream=None) -> None:
+        self.weights = {key: max(weight, 1) for key, weight in weights.items()}
+        self.total = sum(self.weights.values()) or 1
+        self.enabled = enabled
+        self.stream = stream or sys.stderr
+        self.fractions: dict[str, float] = {}
+        self.finished = 0
+        self.lock = Lock()
+        self.started = time.monotonic()
+        self.last_render = 0.0
+
+    def update(self, key: str, fraction: float) -> None:
+        with self.lock:
+            self.fractions[key] = min(max(fraction, 0.0), 1.0)
+            self._render()
+
+    def complete(self, key: str) -> None:
+        with self.lock:
+            self.fractions[key] = 1.0
+            self.finished += 1
+            self._render(force=True)
+
+    def close(self) -> None:
+        if self.enabled:
+            with self.lock:
+                self._render(force=True)
+                self.stream.write("\n")
+                self.stream.flush()
+
+    def _render(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not self.enabled or (not force and now - self.last_render < PROGRESS_SECONDS):
+            return
+        self.last_render = now
+        done = sum(self.weights[key] * fraction for key, fraction in self.fractions.items())
+        ratio = done / self.total
+        elapsed = now - self.started
+        eta = f"{elapsed / ratio * (1 - ratio):.0f}s" if 0 < ratio < 1 else "-"
+        filled = int(ratio * 30)
+        self.stream.write(
+            f"\r[{'#' * filled}{'.' * (30 - filled)}] {ratio * 100:5.1f}%  "
+            f"{self.finished}/{len(self.weights)} files  {format_bytes(done / elapsed if elapsed else 0)}/s  eta {eta} "
+        )
+        self.stream.flush()
+
+
+class FileTask:
+    def __init__(self, input_path: Path, output_path: Path, kind: str) -> None:
+        self.input = input_path
+        self.output = output_path
+        self.kind = kind
+        self.key = str(input_path)
+        self.size = input_path.stat().st_size
+
+    def up_to_date(self) -> bool:
+        if not self.output.exists() or checkpoint_path(self.output).exists():
+            return False
+        return self.output.stat().st_mtime_ns >= self.input.stat().st_mtime_ns
+
+
+def default_output(path: Path, code: str) -> Path:
+    return path.with_name(f"{path.stem}.{code}{path.suffix}")
+
+
+def plan_tasks(inputs: list[str], output: str | None, code: str) -> list[FileTask]:
+    single_file = len(inputs) == 1 and Path(inputs[0]).is_file()
+    output_root = Path(output).expanduser() if output else None
+    to_directory = output_root is not None and not (single_file and not output_root.is_dir() and not output.endswith(os.sep))
+    tasks: list[FileTask] = []
+    for value in inputs:
+        source = Path(value).expanduser()
+        if source.is_dir():
+            files = sorted(
+                path
+                for path in source.rglob("*")
+                if path.is_file()
+                and path.suffix.lower() in FORMATS
+                and not any(part.startswith(".") for part in path.relative_to(source).parts)
+                and not (output_root is None and path.stem.endswith(f".{code}"))
+            )
+            pairs = [(path, path.relative_to(source)) for path in files]
+        elif source.is_file():
+            pairs = [(source, Path(source.name))]
+        else:
+            raise FileNotFoundError(f"input not found: {value}")
+        for path, relative in pairs:
+            kind = format_for(path) or "text"
+            if output_root is None:
+                destination = default_output(path, code)
+            elif to_directory:
+                destination = output_root / relative
+            else:
+                destination = output_root
+            tasks.append(FileTask(path, destination, kind))
+    return tasks
+
+
+class Runner:
+    def __init__(self, engine, args, target: str, backend: str) -> None:
+        self.engine = engine
+        self.args = args
+        self.target = target
+        self.backend = backend
+        self.ids = itertools.count(1)
+        self.lock = Lock()
+        self.active: set[Request] = set()
+        self.tokens = 0
+        self.interrupted = Event()
+
+    def request(self, command: dict, on_event=None) -> Request:
+        command = {
+            "id": f"cli-{next(self.ids)}",
+            "target": self.target,
+            "style": self.args.style,
+            "backend": self.backend,
+            "model": self.args.model,
+            **command,
+        }
+        request = Request(command, on_event)
+        with self.lock:
+            self.active.add(request)
+        try:
+            if not self.interrupted.is_set():
+                self.engine.submit(request)
+                request.done.wait()
+            else:
+                request.fail("interrupted")
+        finally:
+            with self.lock:
+                self.active.discard(request)
+                self.tokens += int(request.metrics.get("tokens") or 0)
+            self.engine.forget(request)
+        return request
+
+    def cancel_all(self) -> None:
+        self.interrupted.set()
+        with self.lock:
+            active = list(self.active)
+        for request in active:
+            self.engine.cancel(request)
+        deadline = time.monotonic() + CANCEL_WAIT_SECONDS
+        for request in active:
+            request.done.wait(max(deadline - time.monotonic(), 0))
+
+    def translate_text(self, text: str) -> tuple[str, Request]:
+        state = {"text": ""}
+
+        def on_event(event: dict) -> None:
+            if event["event"] == "replace":
+                state["text"] = event.get("text", "")
+            elif event["event"] == "token":
+                state["text"] += event.get("text", "")
+
+        request = self.request(
+            {"action": "translate", "text": text, "cache": not self.args.no_cache, "supersede": False, "priority": "normal"},
+            on_event,
+        )
+        return state["text"], request
+
+    def translate_file(self, task: FileTask, progress: Progress) -> dict:
+        started = time.monotonic()
+        result = {"input": str(task.input), "output": str(task.output), "format": task.kind, "bytes_in": task.size}
+        if not self.args.overwrite and task.up_to_date():
+            progress.complete(task.key)
+            return {**result, "status": "skipped"}
+        try:
+            errors, extra = self._translate_document(task, progress)
+        except Exception as exc:
+            traceback.print_exc(file=sys.stderr)
+            errors, extra = [str(exc)], {}
+        progress.complete(task.key)
+        if self.interrupted.is_set() and not extra.get("finished"):
+            status = "stopped"
+        elif errors and not extra.get("finished"):
+            status = "failed"
+        else:
+            status = "partial" if errors else "translated"
+        chars_out = 0
+        if status in {"translated", "partial"} and task.output.exists():
+            chars_out = len(task.output.read_text(encoding="utf-8", errors="replace"))
+        return {
+            **result,
+            "status": status,
+            "chars_in": extra.get("chars_in", 0),
+            "chars_out": chars_out,
+            "elapsed_s": round(time.monotonic() - started, 2),
+            "errors": errors[:5],
+            **{key: value for key, value in extra.items() if key not in {"chars_in", "finished"}},
+        }
+
+    def _translate_document(self, task: FileTask, progress: Progress) -> tuple[list[str], dict]:
+        state = {"finished": False, "resumed_from": 0}
+        document_stats: dict = {}
+
+        def on_event(event: dict) -> None:
+            name = event["event"]
+            if name == "file_started":
+                state["resumed_from"] = event.get("resumed_from", 0)
+            elif name == "progress" and event.get("bytes_total"):
+                progress.update(task.key, event["bytes_done"] / event["bytes_total"])
+            elif name == "file_complete":
+                state["finished"] = True
+                document_stats.update(
+                    {key: event[key] for key in ("segments", "unique", "dedup_ratio", "translatable_chars") if key in event}
+                )
+
+        command = {
+            "action": "translate_file",
+            "input": str(task.input),
+            "output": str(task.output),
+            "format": task.kind,
+            "resume": not self.args.overwrite,
+            "priority": "bulk",
+        }
+        if self.args.columns:
+            command["columns"] = self.args.columns
+        request = self.request(command, on_event)
+        chars_in = document_stats.pop("translatable_chars", None)
+        if chars_in is None:
+            chars_in = len(task.input.read_text(encoding="utf-8", errors="replace"))
+        return request.errors, {"chars_in": chars_in, **state, **document_stats}
+
+
+def open_engine(use_daemon: bool, socket_path: str):
+    if use_daemon:
+        connection = connect(socket_path) or spawn_daemon(
+            socket_path,
+            [sys.executable, str(Path(__file__).resolve().with_name("translate_text_worker.py")), "--daemon", "--socket", socket_path],
+        )
+        if connection is not None:
+            return SocketEngine(connection)
+        print(f"worker daemon unavailable at {socket_path}, running in process", file=sys.stderr)
+    return LocalEngine()
+
+
+def print_summary(summary: dict, stream) -> None:
+    counts = summary["files"]
+    line = (
+        f"{counts['translated']} translated, {counts['partial']} partial, {counts['skipped']} skipped, "
+        f"{counts['failed']} failed, {counts['stopped']} stopped"
+    )
+    stream.write(f"{summary['backend']} -> {summary['target']}: {line} in {summary['elapsed_s']} s\n")
+    stream.write(
+        f"  input {format_bytes(summary['bytes_in'])}, {summary['chars_in']} chars, "
+        f"{summary['chars_per_s']} chars/s, {summary['files_per_s']} files/s\n"
+    )
+    if summary["tokens"]:
+        stream.write(f"  generated {summary['tokens']} tokens, {summary['tokens_per_s']} tokens/s\n")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Translate stdin, files, or directories with the Translate Text worker.",
+        epilog=f"Formats: {', '.join(sorted(FORMATS))}. Without inputs, stdin is translated to stdout.",
+    )
+    parser.add_argument("inputs", nargs="*", help="files or directories, '-' for stdin")
+    parser.add_argument("-t", "--target", type=resolve_target, default="English", help="target language name or code")
+    parser.add_argument("-b", "--backend", choices=("gemma", "google", "bing"), help="default: TRANSLATE_TEXT_BACKEND or gemma")
+    parser.add_argument("-s", "--style", choices=STYLES, default="Default")
+    parser.add_argument("-o", "--output", help="output file, or directory for several inputs (default: name.<code>.ext)")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="files translated in parallel")
+    parser.add_argument("--model", help="model variant from TRANSLATE_TEXT_MODELS")
+    parser.add_argument("--columns", type=lambda value: [part.strip() for part in value.split(",") if part.strip()], help="CSV columns to translate, by name or index")
+    parser.add_argument("--overwrite", action="store_true", help="translate again even when the output is up to date")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the translation result cache")
+    parser.add_argument("--daemon", action="store_true", default=DAEMON_ENABLED, help="use the shared worker daemon")
+    parser.add_argument("--socket", default=DAEMON_SOCKET)
+    parser.add_argument("--progress", action=argparse.BooleanOptionalAction, default=None, help="default: on when stderr is a terminal")
+    parser.add_argument("--summary-json", type=Path, help="write the throughput summary as JSON")
+    args = parser.parse_args()
+
+    target = args.target
+    backend = normalized_backend(args.backend)
+    inputs = [value for value in args.inputs if value != "-"]
+    read_stdin = not args.inputs or "-" in args.inputs
+    try:
+        tasks = plan_tasks(inputs, args.output if not read_stdin else None, LANG_MAP[target]) if inputs else []
+    except (FileNotFoundError, ValueError) as exc:
+        parser.error(str(exc))
+
+    engine = open_engine(args.daemon, args.socket)
+    runner = Runner(engine, args, target, backend)
+    previous_handler = signal.getsignal(signal.SIGINT)
+    signal.signal(signal.SIGINT, lambda *_: Thread(target=runner.cancel_all, daemon=True).start())
+    started = time.monotonic()
+    results: list[dict] = []
+    exit_code = 0
+    try:
+        if read_stdin:
+            text = sys.stdin.read()
+            translated, request = runner.translate_text(text)
+            destination = Path(args.output).expanduser() if args.output and not inputs else None
+            if destination is not None:
+                destination.write_text(translated, encoding="utf-8")
+            else:
+                sys.stdout.write(translated if translated.endswith("\n") or not text.endswith("\n") else translated + "\n")
+                sys.stdout.flush()
+            failed = bool(request.errors) or runner.interrupted.is_set()
+            results.append(
+                {
+                    "input": "-",
+                    "status": "failed" if failed else "translated",
+                    "bytes_in": len(text.encode("utf-8")),
+                    "chars_in": len(text),
+                    "chars_out": len(translated),
+                    "errors": request.errors[:5],
+                }
+            )
+            for message in request.errors:
+                print(f"error: {message}", file=sys.stderr)
+        if tasks:
+            show_progress = args.progress if args.progress is not None else sys.stderr.isatty()
+            progress = Progress({task.key: task.size for task in tasks}, show_progress)
+            with ThreadPoolExecutor(max_workers=max(args.jobs, 1), thread_name_prefix="cli-file") as pool:
+                results.extend(pool.map(lambda task: runner.translate_file(task, progress), tasks))
+            progress.close()
+            for result in results:
+                if result["status"] in {"failed", "partial"}:
+                    print(f"{result['status']}: {result['input']}: {'; '.join(result['errors'])}", file=sys.stderr)
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+        engine.close()
+
+    elapsed = max(time.monotonic() - started, 1e-9)
+    chars_in = sum(result.get("chars_in", 0) for result in results if result["status"] != "skipped")
+    summary = {
+        "backend": backend,
+        "target": target,
+        "style": args.style,
+        "elapsed_s": round(elapsed, 2),
+        "files": {status: sum(1 for result in results if result["status"] == status) for status in ("translated", "partial", "skipped", "failed", "stopped")},
+        "bytes_in": sum(result.get("bytes_in", 0) for result in results if result["status"] != "skipped"),
+        "chars_in": chars_in,
+        "chars_out": sum(result.get("chars_out", 0) for result in results),
+        "chars_per_s": round(chars_in / elapsed, 1),
+        "files_per_s": round(len([result for result in results if result["status"] != "skipped"]) / elapsed, 3),
+        "tokens": runner.tokens,
+        "tokens_per_s": round(runner.tokens / elapsed, 1),
+        "results": results,
+    }
+    if tasks or args.summary_json:
+        print_summary(summary, sys.stderr)
+    if args.summary_json:
+        args.summary_json.write_text(json.dumps(summary, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    if runner.interrupted.is_set():
+        exit_code = 130
+    elif any(result["status"] in {"failed", "partial", "stopped"} for result in results):
+        exit_code = 1
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Condition, Lock, Thread, local
+
+from translate_text_output import OutputWriter
+
+
+DEFAULT_SOCKET_PATH = Path.home() / "Library" / "Caches" / "TranslateText" / "worker.sock"
+CONNECT_TIMEOUT = 0.5
+_CONTEXT = local()
+
+
+def current_client():
+    return getattr(_CONTEXT, "client", None)
+
+
+@contextmanager
+def client_context(client):
+    previous = current_client()
+    _CONTEXT.client = client
+    try:
+        yield
+    finally:
+        _CONTEXT.client = previous
+
+
+class ClientStream:
+    def __init__(self, connection: socket.socket, limit: int, send_timeout: float) -> None:
+        self.connection = connection
+        self.limit = max(limit, 1)
+        self.send_timeout = send_timeout
+        self.condition = Condition()
+        self.lines: deque[str] = deque()
+        self.closed = False
+        self.overflowed = False
+        self.blocked_s = 0.0
+        self.high_water = 0
+        self.thread = Thread(target=self._send_loop, name="daemon-send", daemon=True)
+        self.thread.start()
+
+    def write(self, line: str) -> None:
+        with self.condition:
+            if len(self.lines) >= self.limit and not self.closed:
+                started = time.monotonic()
+                deadline = started + self.send_timeout
+                while len(self.lines) >= self.limit and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.overflowed = True
+                        self._close_locked()
+                        break
+                    self.condition.wait(remaining)
+                self.blocked_s += time.monotonic() - started
+            if self.closed:
+                return
+            self.lines.append(line)
+            self.high_water = max(self.high_water, len(self.lines))
+            self.condition.notify_all()
+
+    def flush(self) -> None:
+        return
+
+    def close(self) -> None:
+        with self.condition:
+            self._close_locked()
+
+    def _close_locked(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.condition.notify_all()
+            try:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def buffered(self) -> int:
+        with self.condition:
+            return len(self.lines)
+
+    def _send_loop(self) -> None:
+        while True:
+            with self.condition:
+                while not self.lines and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                batch = "".join(self.lines)
+                self.lines.clear()
+                self.condition.notify_all()
+            try:
+                self.connection.sendall(batch.encode("utf-8"))
+            except OSError:
+                self.close()
+                return
+
+
+class DaemonClient:
+    def __init__(self, client_id: str, connection: socket.socket, server: "DaemonServer") -> None:
+        self.id = client_id
+        self.connection = connection
+        self.stream = ClientStream(connection, server.buffer_lines, server.send_timeout)
+        self.output = OutputWriter(self.stream, *server.output_settings)
+        self.connected_at = time.monotonic()
+        self.requests = 0
+        self.rejected = 0
+
+    def stats(self) -> dict:
+        return {
+            "client_id": self.id,
+            "connected_s": round(time.monotonic() - self.connected_at, 1),
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "buffered_lines": self.stream.buffered(),
+            "buffer_high_water": self.stream.high_water,
+            "blocked_s": round(self.stream.blocked_s, 3),
+            "overflowed": self.stream.overflowed,
+        }
+
+
+class DaemonServer:
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        handle,
+        on_connect=None,
+        on_disconnect=None,
+        output_settings: tuple = ("coalesce", 16.0, 512),
+        buffer_lines: int = 1024,
+        send_timeout: float = 5.0,
+        max_pending: int = 32,
+    ) -> None:
+        self.path = Path(path).expanduser()
+        self.handle = handle
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.output_settings = output_settings
+        self.buffer_lines = buffer_lines
+        self.send_timeout = send_timeout
+        self.max_pending = max(max_pending, 1)
+        self.lock = Lock()
+        self.clients: dict[str, DaemonClient] = {}
+        self.client_ids = itertools.count(1)
+        self.connections = 0
+        self.disconnects = 0
+        self.overflows = 0
+        self.started_at = time.monotonic()
+        self.listener: socket.socket | None = None
+        self.closed = False
+
+    def bind(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            if connect(self.path) is not None:
+                raise RuntimeError(f"another worker daemon is listening on {self.path}")
+            self.path.unlink()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        previous = os.umask(0o077)
+        try:
+            listener.bind(str(self.path))
+        finally:
+            os.umask(previous)
+        listener.listen(16)
+        self.listener = listener
+
+    def serve_forever(self) -> None:
+        if self.listener is None:
+            self.bind()
+        try:
+            while not self.closed:
+                connection, _ = self.listener.accept()
+                if self.closed:
+                    connection.close()
+                    break
+                client = DaemonClient(f"client-{next(self.client_ids)}", connection, self)
+                with self.lock:
+                    self.clients[client.id] = client
+                    self.connections += 1
+                Thread(target=self._serve_client, args=(client,), name=f"daemon-{client.id}", daemon=True).start()
+        finally:
+            self.listener.close()
+            self._remove_socket()
+
+    def close(self) -> None:
+        self.closed = True
+        waker = connect(self.path)
+        if waker is not None:
+            waker.close()
+        with self.lock:
+            clients = list(self.clients.values())
+        for client in clients:
+            client.output.close()
+            client.stream.close()
+
+    def broadcast(self, job, event: str, payload: dict) -> None:
+        with self.lock:
+            clients = list(self.clients.values())
+        for client in clients:
+            client.output.write(job, event, payload)
+
+    def flush(self) -> None:
+        with self.lock:
+            clients = list(self.clients.values())
+        for client in clients:
+            client.output.flush()
+
+    def stats(self) -> dict:
+        with self.lock:
+            clients = [client.stats() for client in self.clients.values()]
+            return {
+                "socket": str(self.path),
+                "uptime_s": round(time.monotonic() - self.started_at, 1),
+                "connections": self.connections,
+                "disconnects": self.disconnects,
+                "overflows": self.overflows,
+                "max_pending": self.max_pending,
+                "buffer_lines": self.buffer_lines,
+                "clients": clients,
+            }
+
+    def _serve_client(self, client: DaemonClient) -> None:
+        try:
+            with client_context(client):
+                if self.on_connect is not None:
+                    self.on_connect(client)
+                reader = client.connection.makefile("r", encoding="utf-8", errors="replace")
+                for line in reader:
+                    if client.stream.closed:
+                        break
+                    try:
+                        command = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    client.requests += 1
+                    if not self.handle(command):
+                        break
+        except OSError:
+            pass
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+        finally:
+            self._disconnect(client)
+
+    def _disconnect(self, client: DaemonClient) -> None:
+        with self.lock:
+            if self.clients.pop(client.id, None) is None:
+                return
+            self.disconnects += 1
+            if client.stream.overflowed:
+                self.overflows += 1
+        if self.on_disconnect is not None:
+            try:
+                self.on_disconnect(client)
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+        client.output.close()
+        client.stream.close()
+        try:
+            client.connection.close()
+        except OSError:
+            pass
+
+    def _remove_socket(self) -> None:
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+
+def connect(path: str | os.PathLike, timeout: float = CONNECT_TIMEOUT) -> socket.socket | None:
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(timeout)
+    try:
+        connection.connect(str(Path(path).expanduser()))
+    except OSError:
+        connection.close()
+        return None
+    connection.settimeout(None)
+    return connection
+
+
+def spawn_daemon(path: str | os.PathLike, command: list[str], wait_s: float = 10.0) -> socket.socket | None:
+    path = Path(path).expanduser()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_suffix(".log"), "ab") as log:
+        subprocess.Popen(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=log,
+            start_new_session=True,
+            close_fds=True,
+        )
+    deadline = time.monotonic() + wait_s
+    while time.monotonic() < deadline:
+        connection = connect(path)
+        if connection is not None:
+            return connection
+        time.sleep(0.05)
+    return None
+
+
+def proxy(connection: socket.socket, stdin=None, stdout=None) -> None:
+    stdin = stdin or sys.stdin.buffer
+    stdout = stdout or sys.stdout.buffer
+
+    def pump_output() -> None:
+        try:
+            while True:
+                data = connection.recv(65536)
+                if not data:
+                    break
+                stdout.write(data)
+                stdout.flush()
+        except OSError:
+            pass
+
+    reader = Thread(target=pump_output, name="daemon-proxy", daemon=True)
+    reader.start()
+    try:
+        for line in stdin:
+            connection.sendall(line)
+    except OSError:
+        pass
+    try:
+        connection.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+    reader.join()
+    connection.close()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import re
+from collections import OrderedDict
+from threading import Lock
+
+
+VARIABLE = re.compile(
+    r"\{\{[^{}]*\}\}|\$\{[^{}]+\}|\{[^{}\s]*\}|%(?:\d+\$)?[-+ #0]*\d*(?:\.\d+)?[sdifuxXeEgGc@]"
+    r"|(?<![\w.])[-+]?\d+(?:[.,:]\d+)*(?![\w])"
+)
+VARIABLE_MASK = "\ue010"
+SHAPE_ORDER = {"plain": 0, "capital": 1, "upper": 2}
+
+
+def first_cased(text: str) -> int | None:
+    return next((index for index, char in enumerate(text) if char.lower() != char.upper()), None)
+
+
+def change_first(text: str, upper: bool) -> str:
+    index = first_cased(text)
+    if index is None:
+        return text
+    return text[:index] + (text[index].upper() if upper else text[index].lower()) + text[index + 1 :]
+
+
+def substitute(text: str, old: tuple[str, ...], new: tuple[str, ...]) -> str | None:
+    if len(set(old)) != len(old):
+        return None
+    mapping = dict(zip(old, new))
+    pattern = re.compile(
+        r"(?<![\w.])(?:" + "|".join(re.escape(value) for value in sorted(old, key=len, reverse=True)) + r")(?![\w])"
+    )
+    found = pattern.findall(text)
+    if sorted(found) != sorted(old):
+        return None
+    return pattern.sub(lambda match: mapping[match.group(0)], text)
+
+
+class Signature:
+    __slots__ = ("text", "lead", "trail", "variables", "shape", "form", "fold")
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        core = text.strip()
+        start = text.find(core) if core else len(text)
+        self.lead = text[:start]
+        self.trail = text[start + len(core) :]
+        collapsed = " ".join(core.split())
+        self.variables = tuple(VARIABLE.findall(collapsed))
+        masked = VARIABLE.sub(VARIABLE_MASK, collapsed)
+        foldable = " " in masked and first_cased(masked) is not None
+        if foldable and masked == masked.upper():
+            self.shape = "upper"
+        elif foldable and masked[first_cased(masked)].isupper():
+            self.shape = "capital"
+        else:
+            self.shape = "plain"
+        self.form = change_first(masked, False) if self.shape == "capital" else masked
+        self.fold = masked.casefold() if foldable else None
+
+    def candidates(self, folds: dict[str, str]):
+        yield self.form, self.shape
+        if self.shape != "plain":
+            yield self.form, "plain"
+        if self.shape == "upper" and self.fold in folds:
+            yield folds[self.fold], "plain"
+            yield folds[self.fold], "capital"
+
+    def adapt(self, translation: str, source: "Signature") -> str | None:
+        if self.text == source.text:
+            return translation
+        text = translation.strip()
+        if self.variables != source.variables:
+            text = substitute(text, source.variables, self.variables)
+            if text is None:
+                return None
+        if self.shape != source.shape:
+            if self.shape == "upper":
+                text = text.upper()
+            elif self.shape == "capital" and source.shape == "plain":
+                text = change_first(text, True)
+            else:
+                return None
+        return self.lead + text + self.trail
+
+
+class Deduplicator:
+    def __init__(self, texts: list[str]) -> None:
+        self.texts = list(texts)
+        self.signatures = [Signature(text) for text in self.texts]
+        self.group_of = [0] * len(self.texts)
+        self.units: list[int] = []
+        self.members: list[list[int]] = []
+        keys: dict[tuple[str, str], int] = {}
+        folds: dict[str, str] = {}
+        for index in sorted(range(len(self.texts)), key=lambda index: SHAPE_ORDER[self.signatures[index].shape]):
+            signature = self.signatures[index]
+            unit = next((keys[key] for key in signature.candidates(folds) if key in keys), None)
+            if unit is None:
+                unit = keys[(signature.form, signature.shape)] = len(self.units)
+                self.units.append(index)
+                self.members.append([])
+                if signature.fold is not None and signature.shape != "upper":
+                    folds.setdefault(signature.fold, signature.form)
+            self.group_of[index] = unit
+            self.members[unit].append(index)
+        order = sorted(range(len(self.units)), key=self.units.__getitem__)
+        renumber = {unit: position for position, unit in enumerate(order)}
+        self.units = [self.units[unit] for unit in order]
+        self.members = [sorted(self.members[unit]) for unit in order]
+        self.group_of = [renumber[unit] for unit in self.group_of]
+
+    @property
+    def unit_texts(self) -> list[str]:
+        return [self.texts[index] for index in self.units]
+
+    @property
+    def dedup_ratio(self) -> float:
+        return round(1 - len(self.units) / len(self.texts), 4) if self.texts else 0.0
+
+    def is_unit(self, index: int) -> bool:
+        return self.units[self.group_of[index]] == index
+
+    def adapt(self, index: int, translation: str) -> str | None:
+        source = self.signatures[self.units[self.group_of[index]]]
+        return self.signatures[index].adapt(translation, source)
+
+    def expand(self, translations: list[str | None]) -> list[str | None]:
+        return [
+            None if translations[unit] is None else self.adapt(index, translations[unit])
+            for index, unit in enumerate(self.group_of)
+        ]
+
+
+class DedupIndex:
+    def __init__(self, max_entries: int = 0) -> None:
+        self.lock = Lock()
+        self.max_entries = max(max_entries, 0)
+        self.entries: OrderedDict[tuple[str, str], tuple[Signature, str]] = OrderedDict()
+        self.folds: dict[str, str] = {}
+
+    def get(self, text: str) -> str | None:
+        signature = Signature(text)
+        with self.lock:
+            keys = [key for key in signature.candidates(self.folds) if key in self.entries]
+            entries = [self.entries[key] for key in keys]
+            for key in keys:
+                self.entries.move_to_end(key)
+        for source, translation in entries:
+            adapted = signature.adapt(translation, source)
+            if adapted is not None:
+                return adapted
+        return None
+
+    def put(self, text: str, translation: str) -> None:
+        signature = Signature(text)
+        key = (signature.form, signature.shape)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return
+            self.entries[key] = (signature, translation)
+            if signature.fold is not None and signature.shape != "upper":
+                self.folds.setdefault(signature.fold, signature.form)
+            while self.max_entries and len(self.entries) > self.max_entries:
+                (form, _), (evicted, _) = self.entries.popitem(last=False)
+                if self.folds.get(evicted.fold) == form and not any(
+                    (form, shape) in self.entries for shape in ("plain", "capital")
+                ):
+                    del self.folds[evicted.fold]
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+import unicodedata
+from pathlib import Path
+from threading import Lock
+
+
+DEFAULT_DICTIONARY_PATH = Path.home() / "Library" / "Caches" / "TranslateText" / "dictionary.sqlite3"
+ENTRY_LINES = 5
+EDGE_CHARACTERS = " \t\r\n\"'“”‘’«»「」『』()[]{}<>.,;:!?¿¡。，、；：！？"
+
+
+def case_folded_key(word: str) -> str:
+    return unicodedata.normalize("NFKC", word).strip(EDGE_CHARACTERS).casefold()
+
+
+def dictionary_entry(output: str) -> str | None:
+    lines = [line.strip() for line in output.strip().splitlines() if line.strip()]
+    if len(lines) != ENTRY_LINES or not lines[0].startswith("/"):
+        return None
+    return "\n".join(lines)
+
+
+class DictionaryStore:
+    def __init__(self, path: str | os.PathLike | None = None, mmap_mb: int = 64) -> None:
+        self.path = Path(path).expanduser() if path else DEFAULT_DICTIONARY_PATH
+        self.mmap_bytes = max(mmap_mb, 0) * 1048576
+        self.lock = Lock()
+        self.connection: sqlite3.Connection | None = None
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.rejected = 0
+        self._open()
+
+    def _open(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA mmap_size={self.mmap_bytes}")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "source TEXT NOT NULL, word_key TEXT NOT NULL, target TEXT NOT NULL, entry TEXT NOT NULL, "
+                "model TEXT NOT NULL, origin TEXT NOT NULL, created REAL NOT NULL, "
+                "PRIMARY KEY (source, word_key, target)) WITHOUT ROWID"
+            )
+            if "lemma" in {row[1] for row in connection.execute("PRAGMA table_info(entries)")}:
+                connection.execute("ALTER TABLE entries RENAME COLUMN lemma TO word_key")
+            self.connection = connection
+        except sqlite3.Error:
+            self.connection = None
+
+    def get(self, word: str, source: str, target: str) -> str | None:
+        key = case_folded_key(word)
+        with self.lock:
+            row = None
+            if self.connection is not None and key:
+                try:
+                    row = self.connection.execute(
+                        "SELECT entry FROM entries WHERE source = ? AND word_key = ? AND target = ?",
+                        (source, key, target),
+                    ).fetchone()
+                except sqlite3.Error:
+                    row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def contains(self, word: str, source: str, target: str) -> bool:
+        key = case_folded_key(word)
+        with self.lock:
+            if self.connection is None or not key:
+                return False
+            try:
+                return (
+                    self.connection.execute(
+                        "SELECT 1 FROM entries WHERE source = ? AND word_key = ? AND target = ?", (source, key, target)
+                    ).fetchone()
+                    is not None
+                )
+            except sqlite3.Error:
+                return False
+
+    def put(self, word: str, source: str, target: str, output: str, model: str, origin: str = "generated") -> bool:
+        key = case_folded_key(word)
+        entry = dictionary_entry(output)
+        with self.lock:
+            if entry is None or not key:
+                self.rejected += 1
+                return False
+            if self.connection is None:
+                return False
+            try:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO entries (source, word_key, target, entry, model, origin, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (source, key, target, entry, model, origin, time.time()),
+                )
+            except sqlite3.Error:
+                return False
+            self.stores += 1
+            return True
+
+    def stats(self) -> dict:
+        with self.lock:
+            entries = 0
+            origins: dict[str, int] = {}
+            if self.connection is not None:
+                try:
+                    for origin, count in self.connection.execute("SELECT origin, COUNT(*) FROM entries GROUP BY origin"):
+                        origins[origin] = count
+                        entries += count
+                except sqlite3.Error:
+                    pass
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "origins": origins,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "rejected": self.rejected,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "mmap_mb": self.mmap_bytes // 1048576,
+                "path": str(self.path) if self.connection is not None else None,
+            }
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import codecs
+import json
+import os
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+
+def checkpoint_path(output_path: str | os.PathLike) -> Path:
+    output = Path(output_path)
+    return output.with_name(output.name + ".checkpoint")
+
+
+def iter_file_segments(handle: BinaryIO, max_chars: int) -> Iterator[tuple[str, str, int]]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    read_limit = max(max_chars, 1) * 4
+    lines: list[str] = []
+    size = 0
+    separator = ""
+    offset = handle.tell()
+    while True:
+        raw = handle.readline(read_limit)
+        text = decoder.decode(raw, final=not raw)
+        line_start = offset
+        offset = handle.tell() - len(decoder.getstate()[0])
+        if not raw:
+            break
+        if not text.strip():
+            if lines:
+                separator += text
+            else:
+                yield "", text, offset
+            continue
+        if separator:
+            body = "".join(lines)
+            translatable = body.rstrip()
+            yield translatable, body[len(translatable) :] + separator, line_start
+            lines, size, separator = [], 0, ""
+        lines.append(text)
+        size += len(text)
+        if size >= max_chars:
+            body = "".join(lines)
+            translatable = body.rstrip()
+            yield translatable, body[len(translatable) :], offset
+            lines, size = [], 0
+    if lines or separator:
+        body = "".join(lines)
+        translatable = body.rstrip()
+        yield translatable, body[len(translatable) :] + separator, offset
+
+
+class FileCheckpoint:
+    def __init__(self, output_path: str | os.PathLike, signature: dict) -> None:
+        self.path = checkpoint_path(output_path)
+        self.signature = signature
+        self.input_offset = 0
+        self.output_offset = 0
+        self.segments_done = 0
+
+    def load(self) -> bool:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        if data.get("signature") != self.signature:
+            return False
+        self.input_offset = int(data.get("input_offset", 0))
+        self.output_offset = int(data.get("output_offset", 0))
+        self.segments_done = int(data.get("segments_done", 0))
+        return True
+
+    def save(self, input_offset: int, output_offset: int, segments_done: int) -> None:
+        self.input_offset = input_offset
+        self.output_offset = output_offset
+        self.segments_done = segments_done
+        data = {
+            "signature": self.signature,
+            "input_offset": input_offset,
+            "output_offset": output_offset,
+            "segments_done": segments_done,
+        }
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        temporary.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(temporary, self.path)
+
+    def remove(self) -> None:
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def file_signature(input_path: Path, **options) -> dict:
+    stat = input_path.stat()
+    return {
+        "input": str(input_path.resolve()),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        **options,
+    }
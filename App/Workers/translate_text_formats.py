@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import csv
+import html
+import json
+import os
+import re
+from pathlib import Path
+
+from translate_text_dedup import Deduplicator
+
+
+FORMATS = {
+    ".txt": "text",
+    ".md": "markdown",
+    ".markdown": "markdown",
+    ".srt": "srt",
+    ".vtt": "vtt",
+    ".csv": "csv",
+    ".tsv": "csv",
+    ".json": "json",
+    ".html": "html",
+    ".htm": "html",
+}
+FORMAT_ALIASES = {"md": "markdown", "htm": "html", "tsv": "csv", "txt": "text", "webvtt": "vtt"}
+STRUCTURED_FORMATS = {"markdown", "srt", "vtt", "csv", "json", "html"}
+SRT_TIMING = re.compile(r"\s*\d{1,2}:\d{2}:\d{2}[,.]\d{1,3}\s*-->\s*\d{1,2}:\d{2}:\d{2}[,.]\d{1,3}")
+VTT_TIMING = re.compile(r"\s*(?:\d+:)?\d{2}:\d{2}\.\d{3}\s*-->\s*(?:\d+:)?\d{2}:\d{2}\.\d{3}")
+VTT_SKIP_BLOCKS = ("WEBVTT", "NOTE", "STYLE", "REGION")
+CODE_TOKEN = re.compile(r"[A-Za-z0-9_.\-/:#@%?=&+~$]+")
+CODE_STRUCTURE = re.compile(
+    r"[A-Za-z][A-Za-z0-9+.\-]*://|^(?:~|\.{1,2})?/\w|\w/[\w.\-]+/\w|\w/[\w\-]+\.\w|\w_\w|\w{2,}\.\w{2,}|\w=|^\$\w"
+)
+INLINE_CODE = re.compile(r"(`+)[^`]*\1")
+MARKDOWN_FENCE = re.compile(r" {0,3}(`{3,}|~{3,})")
+MARKDOWN_PREFIX = re.compile(r" {0,3}(?:#{1,6}[ \t]+|>[ \t]?|[-*+][ \t]+(?:\[[ xX]\][ \t]+)?|\d{1,9}[.)][ \t]+)")
+MARKDOWN_SKIP = re.compile(r" {0,3}(?:[-*_][ \t]*){3,}$| {0,3}\[[^\]]+\]:\s|\s*\|?\s*:?-{3,}:?\s*(?:\|\s*:?-{3,}:?\s*)*\|?\s*$|\s*<")
+HTML_TOKEN = re.compile(r"<!--.*?-->|<![^>]*>|<\?.*?\?>|<(/?)([A-Za-z][A-Za-z0-9-]*)[^>]*>", re.S)
+HTML_RAW_ELEMENTS = {"script", "style", "pre", "code", "textarea", "template", "svg", "math"}
+
+
+def format_for(path: str | os.PathLike) -> str | None:
+    return FORMATS.get(Path(path).suffix.lower())
+
+
+def normalize_format(value: str | None) -> str | None:
+    if not value:
+        return None
+    name = str(value).strip().lower().lstrip(".")
+    name = FORMAT_ALIASES.get(name, name)
+    return name if name in STRUCTURED_FORMATS or name == "text" else None
+
+
+def is_translatable(text: str) -> bool:
+    if not any(char.isalpha() for char in text) or INLINE_CODE.fullmatch(text):
+        return False
+    return not (CODE_TOKEN.fullmatch(text) and CODE_STRUCTURE.search(text))
+
+
+def newline_of(text: str) -> str:
+    return "\r\n" if "\r\n" in text else "\n"
+
+
+def split_edges(text: str) -> tuple[str, str, str]:
+    core = text.strip()
+    if not core:
+        return text, "", ""
+    start = text.index(core)
+    return text[:start], core, text[start + len(core) :]
+
+
+def iter_lines(text: str):
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        body = line.rstrip("\r\n")
+        yield offset, body
+        offset += len(line)
+
+
+def join_lines(newline: str):
+    def encode(translated: str) -> str:
+        return newline.join(line.rstrip() for line in translated.strip().splitlines() if line.strip())
+
+    return encode
+
+
+class Segment:
+    def __init__(self, start: int, end: int, text: str, encode=None) -> None:
+        self.start = start
+        self.end = end
+        self.text = text
+        self.encode = encode
+
+
+def trimmed_segment(text: str, start: int, end: int, encode=None) -> Segment | None:
+    lead, core, _ = split_edges(text[start:end])
+    if not core or not is_translatable(core):
+        return None
+    start += len(lead)
+    return Segment(start, start + len(core), core, encode)
+
+
+class Document:
+    def __init__(self, kind: str, text: str, segments: list[Segment]) -> None:
+        self.kind = kind
+        self.text = text
+        self.segments = sorted(segments, key=lambda segment: segment.start)
+        self.dedup = Deduplicator([segment.text for segment in self.segments])
+        self.units = self.dedup.unit_texts
+
+    @property
+    def dedup_ratio(self) -> float:
+        return self.dedup.dedup_ratio
+
+    def stats(self) -> dict:
+        return {
+            "format": self.kind,
+            "segments": len(self.segments),
+            "unique": len(self.units),
+            "dedup_ratio": self.dedup_ratio,
+            "source_chars": len(self.text),
+            "translatable_chars": sum(len(unit) for unit in self.units),
+        }
+
+    def render(self, translations: list[str | None]) -> str:
+        pieces: list[str] = []
+        position = 0
+        for segment, translated in zip(self.segments, translations):
+            pieces.append(self.text[position : segment.start])
+            if translated is None or not translated.strip():
+                pieces.append(self.text[segment.start : segment.end])
+            else:
+                pieces.append(segment.encode(translated) if segment.encode is not None else translated.strip())
+            position = segment.end
+        pieces.append(self.text[position:])
+        return "".join(pieces)
+
+
+def extract_text(text: str) -> list[Segment]:
+    segments = []
+    for match in re.finditer(r"\S(?:.*?\S)?(?=\s*(?:\r?\n\s*\r?\n|\Z))", text, re.S):
+        segment = trimmed_segment(text, match.start(), match.end())
+        if segment is not None:
+            segments.append(segment)
+    return segments
+
+
+def subtitle_blocks(text: str):
+    block: list[tuple[int, str]] = []
+    for offset, line in iter_lines(text):
+        if line.strip():
+            block.append((offset, line))
+        elif block:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def extract_subtitles(text: str, timing: re.Pattern, skip: tuple[str, ...] = ()) -> list[Segment]:
+    encode = join_lines(newline_of(text))
+    segments = []
+    for block in subtitle_blocks(text):
+        first = block[0][1].lstrip("﻿")
+        if skip and first.split(" ", 1)[0].split("\t", 1)[0] in skip:
+            continue
+        cue = next((index for index, (_, line) in enumerate(block[:2]) if timing.match(line)), None)
+        if cue is None or cue + 1 >= len(block):
+            continue
+        start = block[cue + 1][0]
+        end = block[-1][0] + len(block[-1][1])
+        segment = trimmed_segment(text, start, end, encode)
+        if segment is not None:
+            segments.append(segment)
+    return segments
+
+
+def extract_srt(text: str) -> list[Segment]:
+    return extract_subtitles(text, SRT_TIMING)
+
+
+def extract_vtt(text: str) -> list[Segment]:
+    return extract_subtitles(text, VTT_TIMING, VTT_SKIP_BLOCKS)
+
+
+def markdown_cells(text: str, offset: int, line: str) -> list[Segment]:
+    segments = []
+    position = 0
+    for cell in re.finditer(r"(?:\\\||`[^`]*`|[^|])+", line):
+        segment = trimmed_segment(text, offset + cell.start(), offset + cell.end())
+        if segment is not None:
+            segments.append(segment)
+        position = cell.end()
+    return segments if position else []
+
+
+def extract_markdown(text: str) -> list[Segment]:
+    encode = join_lines(newline_of(text))
+    segments: list[Segment] = []
+    lines = list(iter_lines(text))
+    paragraph: list[tuple[int, str]] = []
+    fence: str | None = None
+    previous_blank = True
+
+    def close_paragraph() -> None:
+        if paragraph:
+            start = paragraph[0][0]
+            end = paragraph[-1][0] + len(paragraph[-1][1])
+            segment = trimmed_segment(text, start, end, encode)
+            if segment is not None:
+                segments.append(segment)
+            paragraph.clear()
+
+    index = 0
+    if lines and lines[0][1].strip() == "---":
+        for closing in range(1, len(lines)):
+            if lines[closing][1].strip() in {"---", "..."}:
+                index = closing + 1
+                break
+    for offset, line in lines[index:]:
+        fence_match = MARKDOWN_FENCE.match(line)
+        if fence is not None:
+            if fence_match and fence_match.group(1)[0] == fence[0] and len(fence_match.group(1)) >= len(fence):
+                fence = None
+            previous_blank = False
+            continue
+        if fence_match:
+            close_paragraph()
+            fence = fence_match.group(1)
+            continue
+        if not line.strip():
+            close_paragraph()
+            previous_blank = True
+            continue
+        if (line.startswith("    ") or line.startswith("\t")) and previous_blank and not paragraph:
+            continue
+        previous_blank = False
+        if MARKDOWN_SKIP.match(line):
+            close_paragraph()
+            continue
+        if line.lstrip().startswith("|") or (line.count("|") >= 2 and not paragraph):
+            close_paragraph()
+            segments.extend(markdown_cells(text, offset, line))
+            continue
+        prefix = MARKDOWN_PREFIX.match(line)
+        if prefix:
+            close_paragraph()
+            heading = line.lstrip().startswith("#")
+            body_end = len(line.rstrip().rstrip("#")) if heading else len(line)
+            body_start = prefix.end()
+            if heading or line.lstrip().startswith(">"):
+                segment = trimmed_segment(text, offset + body_start, offset + max(body_end, body_start))
+                if segment is not None:
+                    segments.append(segment)
+                continue
+            paragraph.append((offset + body_start, line[body_start:]))
+            continue
+        paragraph.append((offset, line))
+    close_paragraph()
+    return segments
+
+
+def json_string_end(text: str, start: int) -> int:
+    position = start + 1
+    while True:
+        quote = text.index('"', position)
+        backslashes = 0
+        cursor = quote - 1
+        while text[cursor] == "\\":
+            backslashes += 1
+            cursor -= 1
+        if backslashes % 2 == 0:
+            return quote
+        position = quote + 1
+
+
+def extract_json(text: str) -> list[Segment]:
+    json.loads(text)
+    segments = []
+    stack: list[str] = []
+    expecting_key = False
+    position = 0
+    length = len(text)
+    while position < length:
+        char = text[position]
+        if char == '"':
+            end = json_string_end(text, position)
+            if not (stack and stack[-1] == "{" and expecting_key):
+                value = json.loads(text[position : end + 1])
+                lead, core, trail = split_edges(value)
+                if core and is_translatable(core):
+                    segments.append(
+                        Segment(
+                            position + 1,
+                            end,
+                            core,
+                            lambda translated, lead=lead, trail=trail: json.dumps(
+                                lead + translated.strip() + trail, ensure_ascii=False
+                            )[1:-1],
+                        )
+                    )
+            position = end + 1
+            continue
+        if char in "{[":
+            stack.append(char)
+            expecting_key = char == "{"
+        elif char in "}]":
+            stack.pop()
+            expecting_key = False
+        elif char == ",":
+            expecting_key = bool(stack) and stack[-1] == "{"
+        elif char == ":":
+            expecting_key = False
+        position += 1
+    return segments
+
+
+def csv_fields(text: str, delimiter: str):
+    position = 0
+    length = len(text)
+    row: list[tuple[int, int, bool]] = []
+    while position <= length:
+        quoted = position < length and text[position] == '"'
+        if quoted:
+            cursor = position + 1
+            while True:
+                cursor = text.find('"', cursor)
+                if cursor == -1:
+                    cursor = length
+                    break
+                if cursor + 1 < length and text[cursor + 1] == '"':
+                    cursor += 2
+                    continue
+                break
+            end = min(cursor + 1, length)
+            next_position = end
+            while next_position < length and text[next_position] not in delimiter + "\r\n":
+                next_position += 1
+        else:
+            next_position = position
+            while next_position < length and text[next_position] not in delimiter + "\r\n":
+                next_position += 1
+            end = next_position
+        row.append((position, end, quoted))
+        if next_position >= length:
+            if any(start != stop for start, stop, _ in row) or len(row) > 1:
+                yield row
+            return
+        if text[next_position] == delimiter:
+            position = next_position + 1
+            continue
+        yield row
+        row = []
+        position = next_position + 2 if text.startswith("\r\n", next_position) else next_position + 1
+        if position >= length:
+            return
+
+
+def csv_encoder(delimiter: str, quoted: bool, lead: str, trail: str):
+    def encode(translated: str) -> str:
+        value = lead + translated.strip() + trail
+        if quoted or any(char in value for char in (delimiter, '"', "\n", "\r")):
+            return '"' + value.replace('"', '""') + '"'
+        return value
+
+    return encode
+
+
+def extract_csv(text: str, columns: list[str] | None = None) -> list[Segment]:
+    try:
+        delimiter = csv.Sniffer().sniff(text[:65536], delimiters=",;\t|").delimiter
+    except csv.Error:
+        delimiter = ","
+    rows = list(csv_fields(text, delimiter))
+    if not rows:
+        return []
+
+    def decode(start: int, end: int, quoted: bool) -> str:
+        raw = text[start:end]
+        return raw[1:-1].replace('""', '"') if quoted and len(raw) >= 2 else raw
+
+    header = [decode(*field) for field in rows[0]]
+    if columns:
+        selected = set()
+        for column in columns:
+            if column in header:
+                selected.add(header.index(column))
+            elif str(column).isdigit() and int(column) < len(header):
+                selected.add(int(column))
+            else:
+                raise ValueError(f"CSV column not found: {column}")
+    else:
+        selected = set(range(len(header)))
+    segments = []
+    for row in rows[1:]:
+        for column, (start, end, quoted) in enumerate(row):
+            if column not in selected:
+                continue
+            lead, core, trail = split_edges(decode(start, end, quoted))
+            if core and is_translatable(core):
+                segments.append(Segment(start, end, core, csv_encoder(delimiter, quoted, lead, trail)))
+    return segments
+
+
+def extract_html(text: str) -> list[Segment]:
+    segments = []
+    position = 0
+    raw_until: str | None = None
+
+    def add_text(start: int, end: int) -> None:
+        lead, core, trail = split_edges(html.unescape(text[start:end]))
+        if core and is_translatable(core):
+            raw_lead, _, raw_trail = split_edges(text[start:end])
+            segments.append(
+                Segment(
+                    start + len(raw_lead),
+                    end - len(raw_trail),
+                    core,
+                    lambda translated: html.escape(translated.strip(), quote=False),
+                )
+            )
+
+    for match in HTML_TOKEN.finditer(text):
+        closing, name = match.group(1), (match.group(2) or "").lower()
+        if raw_until is not None:
+            if closing and name == raw_until:
+                raw_until = None
+                position = match.end()
+            continue
+        if match.start() > position:
+            add_text(position, match.start())
+        position = match.end()
+        if name in HTML_RAW_ELEMENTS and not closing and not match.group(0).endswith("/>"):
+            raw_until = name
+    if raw_until is None and position < len(text):
+        add_text(position, len(text))
+    return segments
+
+
+def extract(kind: str, text: str, columns: list[str] | None = None) -> Document:
+    extractors = {
+        "text": extract_text,
+        "markdown": extract_markdown,
+        "srt": extract_srt,
+        "vtt": extract_vtt,
+        "json": extract_json,
+        "html": extract_html,
+    }
+    if kind == "csv":
+        return Document(kind, text, extract_csv(text, columns))
+    if kind not in extractors:
+        raise ValueError(f"unsupported format: {kind}")
+    return Document(kind, text, extractors[kind](text))
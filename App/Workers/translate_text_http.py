@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import importlib.util
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from threading import Lock
+
+from translate_text_metrics import percentile
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRY_AFTER = 30.0
+
+
+class HttpStatusError(RuntimeError):
+    def __init__(self, status: int, url: str, retry_after: float | None = None) -> None:
+        super().__init__(f"HTTP {status} from {url}")
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status in RETRY_STATUSES
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None, base: float = 0.5, cap: float = 8.0) -> float:
+    jitter = random.uniform(0, min(cap, base * 2**attempt))
+    if retry_after is not None:
+        return retry_after + jitter * 0.1
+    return jitter
+
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, HttpStatusError):
+        return exc.retryable
+    return True
+
+
+class HttpTransport:
+    def __init__(
+        self,
+        name: str,
+        pool_size: int = 16,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        http2: bool = False,
+        window: int = 500,
+    ) -> None:
+        self.name = name
+        self.pool_size = max(pool_size, 1)
+        self.timeout = (connect_timeout, read_timeout)
+        self.lock = Lock()
+        self.latencies: deque[float] = deque(maxlen=max(window, 1))
+        self.requests = 0
+        self.errors = 0
+        self.resets = 0
+        self.timeouts = 0
+        self.bytes_in = 0
+        self.statuses: dict[str, int] = {}
+        self.versions: dict[str, int] = {}
+        self.retries = 0
+        self.throttled = 0
+        self.backoff_s = 0.0
+        self.client_name = "requests"
+        self.client = None
+        if http2:
+            self.client = self._httpx_client()
+        if self.client is None:
+            self.client = self._requests_session()
+
+    def _httpx_client(self):
+        if importlib.util.find_spec("h2") is None:
+            return None
+        try:
+            import httpx
+        except ImportError:
+            return None
+        self.client_name = "httpx"
+        return httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+        )
+
+    def _requests_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def request(self, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            if self.client_name == "httpx":
+                response = self.client.request(method, url, **kwargs)
+            else:
+                response = self.client.request(method, url, timeout=self.timeout, **kwargs)
+        except Exception as exc:
+            self._record_failure(exc)
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        version = getattr(response, "http_version", None) or f"HTTP/{getattr(response.raw, 'version', 11) / 10:.1f}"
+        with self.lock:
+            self.requests += 1
+            self.latencies.append(elapsed_ms)
+            self.bytes_in += len(response.content)
+            self.statuses[str(response.status_code)] = self.statuses.get(str(response.status_code), 0) + 1
+            self.versions[version] = self.versions.get(version, 0) + 1
+        return response
+
+    def check(self, response) -> None:
+        if response.status_code >= 400:
+            if response.status_code == 429:
+                with self.lock:
+                    self.throttled += 1
+            raise HttpStatusError(
+                response.status_code, str(response.url), parse_retry_after(response.headers.get("Retry-After"))
+            )
+
+    def _record_failure(self, exc: Exception) -> None:
+        name = type(exc).__name__
+        with self.lock:
+            self.requests += 1
+            self.errors += 1
+            if "Timeout" in name:
+                self.timeouts += 1
+            elif "Connection" in name or "RemoteProtocol" in name or "ReadError" in name:
+                self.resets += 1
+
+    def record_backoff(self, seconds: float) -> None:
+        with self.lock:
+            self.retries += 1
+            self.backoff_s += seconds
+
+    def stats(self) -> dict:
+        with self.lock:
+            latencies = list(self.latencies)
+            return {
+                "client": self.client_name,
+                "pool_size": self.pool_size,
+                "connect_timeout_s": self.timeout[0],
+                "read_timeout_s": self.timeout[1],
+                "requests": self.requests,
+                "errors": self.errors,
+                "resets": self.resets,
+                "timeouts": self.timeouts,
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "backoff_s": round(self.backoff_s, 3),
+                "statuses": dict(self.statuses),
+                "http_versions": dict(self.versions),
+                "bytes_in": self.bytes_in,
+                "mean_response_bytes": round(self.bytes_in / max(self.requests - self.errors, 1), 1),
+                "latency_ms": {"p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95)},
+            }
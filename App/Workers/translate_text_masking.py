@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import re
+from collections import Counter
+
+
+SENTINEL_OPEN = "⟦"
+SENTINEL_CLOSE = "⟧"
+SENTINEL = re.compile(r"⟦\s*(\d+)\s*⟧")
+MAX_PENDING_SENTINEL = 8
+PROTECTED = re.compile(
+    r"(?:https?|ftp)://[^\s<>\"'`]*[^\s<>\"'`.,;:!?)\]}]"
+    r"|\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b"
+    r"|`[^`\n]+`"
+    r"|<[A-Za-z/!][^<>\n]*>"
+    r"|&(?:#\d+|#x[0-9A-Fa-f]+|[A-Za-z]+);"
+    r"|\{\{[^{}]*\}\}|\$\{[^{}]+\}|\{[^{}\s]*\}"
+    r"|%(?:\(\w+\))?(?:\d+\$)?[-+#0]*\d*(?:\.\d+)?[sdifuxXeEgGc@]"
+    r"|(?<![\w.])[-+]?\d+(?:[.,:]\d+)+(?![\w])"
+    r"|(?<![\w.])\d{4,}(?![\w])"
+)
+
+
+def sentinel(index: int) -> str:
+    return f"{SENTINEL_OPEN}{index}{SENTINEL_CLOSE}"
+
+
+class MaskedText:
+    def __init__(self, text: str) -> None:
+        self.source = text
+        self.spans: list[str] = []
+        self.expected: Counter = Counter()
+        if SENTINEL_OPEN in text or SENTINEL_CLOSE in text:
+            self.text = text
+            return
+        self.text = PROTECTED.sub(self._mask, text)
+
+    def _mask(self, match: re.Match) -> str:
+        value = match.group(0)
+        if value in self.spans:
+            index = self.spans.index(value)
+        else:
+            index = len(self.spans)
+            self.spans.append(value)
+        self.expected[index] += 1
+        return sentinel(index)
+
+    @property
+    def saved_chars(self) -> int:
+        return len(self.source) - len(self.text)
+
+    def substitute(self, text: str) -> str:
+        return SENTINEL.sub(
+            lambda match: self.spans[int(match.group(1))] if int(match.group(1)) < len(self.spans) else match.group(0),
+            text,
+        )
+
+    def restore(self, translated: str) -> str | None:
+        found = Counter(int(match.group(1)) for match in SENTINEL.finditer(translated))
+        if found != self.expected:
+            return None
+        return self.substitute(translated)
+
+
+class SentinelStream:
+    def __init__(self, masked: MaskedText) -> None:
+        self.masked = masked
+        self.pending = ""
+
+    def feed(self, chunk: str) -> str:
+        self.pending += chunk
+        cut = self.pending.rfind(SENTINEL_OPEN)
+        if cut == -1 or SENTINEL_CLOSE in self.pending[cut:] or len(self.pending) - cut > MAX_PENDING_SENTINEL:
+            ready, self.pending = self.pending, ""
+        else:
+            ready, self.pending = self.pending[:cut], self.pending[cut:]
+        return self.masked.substitute(ready)
+
+    def finish(self) -> str:
+        ready, self.pending = self.pending, ""
+        return self.masked.substitute(ready)
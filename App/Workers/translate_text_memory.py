@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from threading import Lock
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape, quoteattr
+
+from translate_text_cache import cache_key, normalize_cache_text
+
+
+DEFAULT_MEMORY_PATH = Path.home() / "Library" / "Caches" / "TranslateText" / "memory.sqlite3"
+SIGNATURE_BINS = 32
+BAND_ROWS = 4
+SHINGLE_CHARS = 3
+MIN_FUZZY_CHARS = 8
+MAX_CANDIDATES = 16
+XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+WHITESPACE = re.compile(r"\s+")
+
+
+def memory_text(text: str) -> str:
+    return WHITESPACE.sub(" ", normalize_cache_text(text)).casefold()
+
+
+def shingles(text: str) -> set[str]:
+    if len(text) <= SHINGLE_CHARS:
+        return {text}
+    return {text[index : index + SHINGLE_CHARS] for index in range(len(text) - SHINGLE_CHARS + 1)}
+
+
+def signature(features: set[str]) -> list[int]:
+    empty = 1 << 32
+    bins = [empty] * SIGNATURE_BINS
+    for feature in features:
+        value = zlib.crc32(feature.encode("utf-8"))
+        index = value % SIGNATURE_BINS
+        if value < bins[index]:
+            bins[index] = value
+    filled = [index for index, value in enumerate(bins) if value != empty]
+    if not filled:
+        return bins
+    for index in range(SIGNATURE_BINS):
+        if bins[index] == empty:
+            distance = next(
+                step for step in range(1, SIGNATURE_BINS) if bins[(index + step) % SIGNATURE_BINS] != empty
+            )
+            bins[index] = bins[(index + distance) % SIGNATURE_BINS] + (distance << 32)
+    return bins
+
+
+def band_keys(bins: list[int], source_lang: str, target_lang: str) -> list[int]:
+    keys = []
+    for start in range(0, SIGNATURE_BINS, BAND_ROWS):
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(f"{source_lang}>{target_lang}:{start}:".encode("utf-8"))
+        digest.update(",".join(map(str, bins[start : start + BAND_ROWS])).encode("ascii"))
+        keys.append(int.from_bytes(digest.digest(), "big", signed=True))
+    return keys
+
+
+def jaccard(left: set[str], right: set[str]) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def tmx_language(code: str) -> str:
+    normalized = (code or "").strip().replace("_", "-").lower()
+    if normalized in {"zh-hant", "zh-tw", "zh-hk", "zh-mo"} or normalized.startswith("zh-hant-"):
+        return "zh-Hant"
+    return normalized.split("-", 1)[0]
+
+
+class TranslationMemory:
+    def __init__(
+        self,
+        path: str | os.PathLike | None = None,
+        max_segments: int = 200000,
+        threshold: float = 0.7,
+    ) -> None:
+        self.path = Path(path).expanduser() if path else DEFAULT_MEMORY_PATH
+        self.max_segments = max(max_segments, 1)
+        self.threshold = min(max(threshold, 0.0), 1.0)
+        self.lock = Lock()
+        self.connection: sqlite3.Connection | None = None
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.writes_since_prune = 0
+        self._open()
+
+    def _open(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                "id INTEGER PRIMARY KEY, digest TEXT NOT NULL UNIQUE, source_lang TEXT NOT NULL, "
+                "target_lang TEXT NOT NULL, source TEXT NOT NULL, target TEXT NOT NULL, origin TEXT NOT NULL, "
+                "created REAL NOT NULL, used REAL NOT NULL, backend TEXT NOT NULL DEFAULT '', "
+                "style TEXT NOT NULL DEFAULT '')"
+            )
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(segments)")}
+            for column in ("backend", "style"):
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE segments ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+            connection.execute("CREATE INDEX IF NOT EXISTS segments_used ON segments(used)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS bands (key INTEGER NOT NULL, segment INTEGER NOT NULL, "
+                "PRIMARY KEY (key, segment)) WITHOUT ROWID"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS bands_segment ON bands(segment)")
+            self.connection = connection
+            with self.lock:
+                self._prune()
+        except sqlite3.Error:
+            self.connection = None
+
+    def digest(self, source: str, source_lang: str, target_lang: str, backend: str = "", style: str = "") -> str:
+        return cache_key("memory", backend, style, source_lang, target_lang, normalize_cache_text(source))
+
+    def exact(self, source: str, source_lang: str, target_lang: str, backend: str = "", style: str = "") -> str | None:
+        digests = [self.digest(source, source_lang, target_lang, backend, style)]
+        if backend or style:
+            digests.append(self.digest(source, source_lang, target_lang))
+        with self.lock:
+            if self.connection is None:
+                return None
+            try:
+                row = None
+                for digest in digests:
+                    query = "SELECT id, target FROM segments WHERE digest = ?"
+                    row = self.connection.execute(query, (digest,)).fetchone()
+                    if row is not None:
+                        break
+                if row is not None:
+                    self.connection.execute("UPDATE segments SET used = ? WHERE id = ?", (time.time(), row[0]))
+            except sqlite3.Error:
+                row = None
+            if row is None:
+                return None
+            self.exact_hits += 1
+            return row[1]
+
+    def fuzzy(
+        self,
+        source: str,
+        source_lang: str,
+        target_lang: str,
+        threshold: float | None = None,
+        limit: int = 1,
+    ) -> list[dict]:
+        text = memory_text(source)
+        minimum = self.threshold if threshold is None else threshold
+        if len(text) < MIN_FUZZY_CHARS:
+            return []
+        features = shingles(text)
+        keys = band_keys(signature(features), source_lang, target_lang)
+        with self.lock:
+            if self.connection is None:
+                return []
+            try:
+                rows = self.connection.execute(
+                    f"SELECT segments.id, segments.source, segments.target, segments.origin FROM segments JOIN ("
+                    f"SELECT segment, COUNT(*) AS shared FROM bands WHERE key IN ({','.join('?' * len(keys))}) "
+                    f"GROUP BY segment ORDER BY shared DESC LIMIT ?) AS candidates ON candidates.segment = segments.id",
+                    (*keys, MAX_CANDIDATES),
+                ).fetchall()
+            except sqlite3.Error:
+                rows = []
+        matches = []
+        for segment_id, candidate, target, origin in rows:
+            score = jaccard(features, shingles(memory_text(candidate)))
+            if score >= minimum:
+                matches.append(
+                    {"id": segment_id, "source": candidate, "target": target, "origin": origin, "score": round(score, 4)}
+                )
+        matches.sort(key=lambda match: match["score"], reverse=True)
+        with self.lock:
+            if matches:
+                self.fuzzy_hits += 1
+            else:
+                self.misses += 1
+        return matches[:limit]
+
+    def add(
+        self,
+        source: str,
+        target: str,
+        source_lang: str,
+        target_lang: str,
+        origin: str = "",
+        backend: str = "",
+        style: str = "",
+    ) -> bool:
+        if not source.strip() or not target.strip():
+            return False
+        with self.lock:
+            if self.connection is None:
+                return False
+            try:
+                self._insert(source, target, source_lang, target_lang, origin, backend, style)
+                self.writes_since_prune += 1
+                if self.writes_since_prune >= max(self.max_segments // 20, 1):
+                    self._prune()
+            except sqlite3.Error:
+                return False
+            return True
+
+    def _insert(
+        self,
+        source: str,
+        target: str,
+        source_lang: str,
+        target_lang: str,
+        origin: str,
+        backend: str = "",
+        style: str = "",
+    ) -> None:
+        text = memory_text(source)
+        digest = self.digest(source, source_lang, target_lang, backend, style)
+        now = time.time()
+        row = self.connection.execute("SELECT id FROM segments WHERE digest = ?", (digest,)).fetchone()
+        if row is not None:
+            self.connection.execute(
+                "UPDATE segments SET target = ?, origin = ?, used = ? WHERE id = ?", (target, origin, now, row[0])
+            )
+            return
+        cursor = self.connection.execute(
+            "INSERT INTO segments (digest, source_lang, target_lang, source, target, origin, created, used, "
+            "backend, style) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (digest, source_lang, target_lang, source, target, origin, now, now, backend, style),
+        )
+        if len(text) >= MIN_FUZZY_CHARS:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO bands (key, segment) VALUES (?, ?)",
+                [(key, cursor.lastrowid) for key in band_keys(signature(shingles(text)), source_lang, target_lang)],
+            )
+        self.stores += 1
+
+    def _prune(self) -> None:
+        self.writes_since_prune = 0
+        if self.connection is None:
+            return
+        count = self.connection.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        if count <= self.max_segments:
+            return
+        stale = [
+            row[0]
+            for row in self.connection.execute(
+                "SELECT id FROM segments ORDER BY used ASC LIMIT ?", (count - self.max_segments,)
+            )
+        ]
+        for start in range(0, len(stale), 500):
+            batch = stale[start : start + 500]
+            placeholders = ",".join("?" * len(batch))
+            self.connection.execute(f"DELETE FROM bands WHERE segment IN ({placeholders})", batch)
+            self.connection.execute(f"DELETE FROM segments WHERE id IN ({placeholders})", batch)
+        self.evictions += len(stale)
+
+    def import_tmx(self, path: str | os.PathLike, origin: str = "tmx") -> dict:
+        counts = {"units": 0, "segments": 0, "skipped": 0}
+        source_lang = ""
+        with self.lock:
+            if self.connection is None:
+                raise RuntimeError("The translation memory is not available.")
+            self.connection.execute("BEGIN")
+            try:
+                for _, element in ElementTree.iterparse(str(Path(path).expanduser()), events=("end",)):
+                    if element.tag == "header":
+                        source_lang = element.get("srclang", "")
+                    elif element.tag == "tu":
+                        counts["units"] += 1
+                        variants = []
+                        for tuv in element.iter("tuv"):
+                            segment = tuv.find("seg")
+                            language = tuv.get(XML_LANG) or tuv.get("lang") or ""
+                            if segment is not None and language:
+                                variants.append((language, "".join(segment.itertext())))
+                        props = {prop.get("type"): prop.text or "" for prop in element.iter("prop")}
+                        unit_source = element.get("srclang") or source_lang
+                        sources = [item for item in variants if unit_source and item[0].lower() == unit_source.lower()]
+                        source = sources[0] if sources else (variants[0] if variants else None)
+                        targets = [item for item in variants if item is not source]
+                        if source is None or not targets:
+                            counts["skipped"] += 1
+                        for language, text in targets:
+                            if source[1].strip() and text.strip():
+                                self._insert(
+                                    source[1],
+                                    text,
+                                    tmx_language(source[0]),
+                                    tmx_language(language),
+                                    origin,
+                                    props.get("x-backend", ""),
+                                    props.get("x-style", ""),
+                                )
+                                counts["segments"] += 1
+                        element.clear()
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+            self._prune()
+        return counts
+
+    def export_tmx(
+        self,
+        path: str | os.PathLike,
+        source_lang: str | None = None,
+        target_lang: str | None = None,
+    ) -> int:
+        output = Path(path).expanduser()
+        output.parent.mkdir(parents=True, exist_ok=True)
+        query = "SELECT source_lang, target_lang, source, target, origin, created, backend, style FROM segments"
+        conditions, values = [], []
+        if source_lang:
+            conditions.append("source_lang = ?")
+            values.append(source_lang)
+        if target_lang:
+            conditions.append("target_lang = ?")
+            values.append(target_lang)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        count = 0
+        with self.lock:
+            if self.connection is None:
+                raise RuntimeError("The translation memory is not available.")
+            rows = self.connection.execute(query + " ORDER BY id", values)
+            temporary = output.with_name(output.name + ".tmp")
+            with temporary.open("w", encoding="utf-8") as handle:
+                handle.write('<?xml version="1.0" encoding="UTF-8"?>\n<tmx version="1.4">\n')
+                handle.write(
+                    f'<header creationtool="TranslateText" creationtoolversion="1" segtype="sentence" '
+                    f'o-tmf="sqlite" adminlang="en" srclang={quoteattr(source_lang or "*all*")} datatype="plaintext"/>\n'
+                    "<body>\n"
+                )
+                for row_source_lang, row_target_lang, source, target, origin, created, backend, style in rows:
+                    stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(created))
+                    scope = "".join(
+                        f'<prop type="x-{name}">{escape(value)}</prop>'
+                        for name, value in (("backend", backend), ("style", style))
+                        if value
+                    )
+                    handle.write(
+                        f"<tu srclang={quoteattr(row_source_lang)} creationdate={quoteattr(stamp)}>"
+                        f"<prop type=\"x-origin\">{escape(origin)}</prop>{scope}"
+                        f"<tuv xml:lang={quoteattr(row_source_lang)}><seg>{escape(source)}</seg></tuv>"
+                        f"<tuv xml:lang={quoteattr(row_target_lang)}><seg>{escape(target)}</seg></tuv></tu>\n"
+                    )
+                    count += 1
+                handle.write("</body>\n</tmx>\n")
+            temporary.replace(output)
+        return count
+
+    def stats(self) -> dict:
+        with self.lock:
+            segments = 0
+            if self.connection is not None:
+                try:
+                    segments = self.connection.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            lookups = self.exact_hits + self.fuzzy_hits + self.misses
+            return {
+                "segments": segments,
+                "max_segments": self.max_segments,
+                "threshold": self.threshold,
+                "exact_hits": self.exact_hits,
+                "fuzzy_hits": self.fuzzy_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "hit_rate": round((self.exact_hits + self.fuzzy_hits) / lookups, 4) if lookups else 0.0,
+                "path": str(self.path) if self.connection is not None else None,
+            }
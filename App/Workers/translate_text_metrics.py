@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+
+
+def percentile(values: list[float], fraction: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return round(ordered[index], 2)
+
+
+class TraceWriter:
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = Path(path).expanduser()
+        self.lock = Lock()
+        self.pid = os.getpid()
+        self.origin = time.perf_counter()
+        self.wall_origin = time.time()
+        self.named_threads: set[int] = set()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fresh = not self.path.exists() or self.path.stat().st_size == 0
+        self.handle = self.path.open("a", encoding="utf-8")
+        if fresh:
+            self.handle.write("[\n")
+            self.handle.flush()
+
+    def timestamp_us(self, moment: float) -> int:
+        return int((self.wall_origin + moment - self.origin) * 1_000_000)
+
+    def complete(self, name: str, category: str, start: float, end: float, args: dict | None = None) -> None:
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": self.timestamp_us(start),
+            "dur": max(int((end - start) * 1_000_000), 0),
+            "pid": self.pid,
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = args
+        with self.lock:
+            if thread.ident not in self.named_threads:
+                self.named_threads.add(thread.ident)
+                self._write(
+                    {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": thread.ident, "args": {"name": thread.name}}
+                )
+            self._write(event)
+            self.handle.flush()
+
+    def _write(self, event: dict) -> None:
+        self.handle.write(json.dumps(event, ensure_ascii=False) + ",\n")
+
+
+class JobMetrics:
+    def __init__(self, job_id: str, kind: str, backend: str, trace: TraceWriter | None = None) -> None:
+        self.job_id = job_id
+        self.kind = kind
+        self.backend = backend
+        self.trace = trace
+        self.lock = Lock()
+        self.created = time.perf_counter()
+        self.spans: dict[str, list[float]] = {}
+        self.counters: dict[str, float] = {}
+        self.marks: dict[str, float] = {}
+        self.status = "complete"
+
+    @contextmanager
+    def span(self, name: str, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter(), **args)
+
+    def record(self, name: str, start: float, end: float, **args) -> None:
+        with self.lock:
+            total = self.spans.setdefault(name, [0.0, 0])
+            total[0] += (end - start) * 1000
+            total[1] += 1
+        if self.trace is not None:
+            self.trace.complete(name, self.kind, start, end, {"job_id": self.job_id, **args})
+
+    def mark(self, name: str) -> None:
+        with self.lock:
+            if name not in self.marks:
+                self.marks[name] = round((time.perf_counter() - self.created) * 1000, 2)
+
+    def add(self, name: str, value: float = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> dict:
+        total_ms = (time.perf_counter() - self.created) * 1000
+        with self.lock:
+            spans = {name: {"ms": round(value[0], 2), "count": value[1]} for name, value in self.spans.items()}
+            counters = {name: round(value, 2) if isinstance(value, float) else value for name, value in self.counters.items()}
+            marks = dict(self.marks)
+        summary = {
+            "kind": self.kind,
+            "backend": self.backend,
+            "status": self.status,
+            "total_ms": round(total_ms, 2),
+            "spans": spans,
+            "marks": marks,
+            **counters,
+        }
+        decode_ms = spans.get("decode", {}).get("ms")
+        if counters.get("tokens") and decode_ms:
+            summary["tokens_per_s"] = round(counters["tokens"] / decode_ms * 1000, 2)
+        if counters.get("tokens") and "draft_accepted" in counters:
+            summary["draft_acceptance"] = round(counters["draft_accepted"] / counters["tokens"], 4)
+        if counters.get("dedup_segments"):
+            summary["dedup_ratio"] = round(counters.get("dedup_hits", 0) / counters["dedup_segments"], 4)
+        return summary
+
+    def finish(self) -> None:
+        if self.trace is not None:
+            self.trace.complete(
+                f"{self.kind} {self.job_id}",
+                "job",
+                self.created,
+                time.perf_counter(),
+                {"job_id": self.job_id, "backend": self.backend, "status": self.status},
+            )
+
+
+class MetricsRegistry:
+    def __init__(self, window: int = 500) -> None:
+        self.lock = Lock()
+        self.window = max(window, 1)
+        self.jobs: deque[dict] = deque(maxlen=self.window)
+        self.total_jobs = 0
+
+    def record(self, summary: dict) -> None:
+        with self.lock:
+            self.jobs.append(summary)
+            self.total_jobs += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            jobs = list(self.jobs)
+            total_jobs = self.total_jobs
+        groups: dict[str, list[dict]] = {}
+        for summary in jobs:
+            groups.setdefault(f"{summary['kind']}/{summary['backend']}", []).append(summary)
+        return {
+            "window": self.window,
+            "jobs": total_jobs,
+            "groups": {name: self._aggregate(items) for name, items in sorted(groups.items())},
+        }
+
+    def _aggregate(self, items: list[dict]) -> dict:
+        finished = [item for item in items if item["status"] == "complete"]
+        latencies = [item["total_ms"] for item in finished]
+        first_text = [item["marks"]["first_text"] for item in finished if "first_text" in item["marks"]]
+        queue_waits = [item["queue_wait_ms"] for item in items if "queue_wait_ms" in item]
+        rates = [item["tokens_per_s"] for item in finished if "tokens_per_s" in item]
+        statuses: dict[str, int] = {}
+        for item in items:
+            statuses[item["status"]] = statuses.get(item["status"], 0) + 1
+        cache_hits = sum(item.get("cache_hits", 0) for item in items)
+        cache_misses = sum(item.get("cache_misses", 0) for item in items)
+        dedup_segments = sum(item.get("dedup_segments", 0) for item in items)
+        dedup_hits = sum(item.get("dedup_hits", 0) for item in items)
+        return {
+            "count": len(items),
+            "statuses": statuses,
+            "latency_ms": {"p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95)},
+            "first_text_ms": {"p50": percentile(first_text, 0.5), "p95": percentile(first_text, 0.95)},
+            "queue_wait_ms": {"p50": percentile(queue_waits, 0.5), "p95": percentile(queue_waits, 0.95)},
+            "tokens_per_s": {"p50": percentile(rates, 0.5), "p95": percentile(rates, 0.95)},
+            "tokens": sum(item.get("tokens", 0) for item in items),
+            "cache_hits": cache_hits,
+            "cache_misses": cache_misses,
+            "cache_hit_rate": round(cache_hits / (cache_hits + cache_misses), 4) if cache_hits + cache_misses else 0.0,
+            "dedup_ratio": round(dedup_hits / dedup_segments, 4) if dedup_segments else 0.0,
+            "http_requests": sum(item["spans"].get("http", {}).get("count", 0) for item in items),
+            "retries": sum(item.get("retries", 0) for item in items),
+            "backoff_ms": round(sum(item["spans"].get("backoff", {}).get("ms", 0) for item in items), 2),
+        }
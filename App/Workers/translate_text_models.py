@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import json
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+DEFAULT_VARIANT = "default"
+
+
+class ModelVariant:
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        styles: list[str] | None = None,
+        min_chars: int = 0,
+        max_chars: int = 0,
+    ) -> None:
+        self.name = name
+        self.path = path
+        self.styles = set(styles or [])
+        self.min_chars = max(int(min_chars or 0), 0)
+        self.max_chars = max(int(max_chars or 0), 0)
+
+    def matches(self, length: int, style: str) -> bool:
+        if self.styles and style not in self.styles:
+            return False
+        if length < self.min_chars:
+            return False
+        if self.max_chars and length > self.max_chars:
+            return False
+        return True
+
+    def describe(self) -> dict:
+        return {
+            "path": self.path,
+            "styles": sorted(self.styles),
+            "min_chars": self.min_chars,
+            "max_chars": self.max_chars,
+        }
+
+
+class LoadedModel:
+    def __init__(self, variant: ModelVariant, model, tokenizer, load_ms: float, memory_bytes: int) -> None:
+        self.variant = variant
+        self.model = model
+        self.tokenizer = tokenizer
+        self.load_ms = load_ms
+        self.memory_bytes = memory_bytes
+        self.loaded_at = time.time()
+        self.last_used = time.monotonic()
+        self.uses = 0
+        self.stop_ids: frozenset[int] = frozenset()
+        self.stop_markers: tuple[str, ...] = ()
+        self.prefix_caches: OrderedDict = OrderedDict()
+
+
+def parse_model_variants(config: str, default_path: str) -> tuple[dict[str, ModelVariant], str]:
+    config = (config or "").strip()
+    if not config:
+        return {DEFAULT_VARIANT: ModelVariant(DEFAULT_VARIANT, default_path)}, DEFAULT_VARIANT
+    if not config.startswith("{"):
+        config = Path(config).expanduser().read_text(encoding="utf-8")
+    data = json.loads(config)
+    variants: dict[str, ModelVariant] = {}
+    for entry in data.get("variants", []):
+        name = str(entry["name"])
+        variants[name] = ModelVariant(
+            name,
+            str(entry["path"]),
+            entry.get("styles"),
+            entry.get("min_chars", 0),
+            entry.get("max_chars", 0),
+        )
+    if default_path and DEFAULT_VARIANT not in variants and not any(v.path == default_path for v in variants.values()):
+        variants[DEFAULT_VARIANT] = ModelVariant(DEFAULT_VARIANT, default_path)
+    if not variants:
+        raise ValueError("model registry does not define any variants")
+    default = str(data.get("default") or "")
+    if default not in variants:
+        default = next((v.name for v in variants.values() if v.path == default_path), next(iter(variants)))
+    return variants, default
+
+
+def path_size_bytes(path: str) -> int:
+    root = Path(path).expanduser()
+    try:
+        if root.is_file():
+            return root.stat().st_size
+        if root.is_dir():
+            return sum(item.stat().st_size for item in root.glob("*.safetensors"))
+    except OSError:
+        pass
+    return 0
+
+
+def model_memory_bytes(model, path: str) -> int:
+    try:
+        from mlx.utils import tree_flatten
+
+        return int(sum(value.nbytes for _, value in tree_flatten(model.parameters())))
+    except Exception:
+        return path_size_bytes(path)
+
+
+class ModelRegistry:
+    def __init__(self, variants: dict[str, ModelVariant], default: str, memory_budget_bytes: int = 0) -> None:
+        self.variants = variants
+        self.default = default
+        self.memory_budget_bytes = max(int(memory_budget_bytes), 0)
+        self.loaded: OrderedDict[str, LoadedModel] = OrderedDict()
+        self.measured_bytes: dict[str, int] = {}
+        self.evictions = 0
+
+    def variant(self, name: str | None) -> ModelVariant:
+        if name is None or name == "":
+            return self.variants[self.default]
+        if name not in self.variants:
+            raise KeyError(f"Unknown model variant: {name}")
+        return self.variants[name]
+
+    def select(self, length: int, style: str, requested: str | None = None) -> ModelVariant:
+        if requested:
+            return self.variant(requested)
+        for variant in self.variants.values():
+            if variant.name != self.default and (variant.styles or variant.min_chars or variant.max_chars):
+                if variant.matches(length, style):
+                    return variant
+        return self.variants[self.default]
+
+    def get(self, name: str) -> LoadedModel | None:
+        loaded = self.loaded.get(name)
+        if loaded is not None:
+            self.loaded.move_to_end(name)
+            loaded.last_used = time.monotonic()
+            loaded.uses += 1
+        return loaded
+
+    def add(self, loaded: LoadedModel) -> None:
+        self.loaded[loaded.variant.name] = loaded
+        self.loaded.move_to_end(loaded.variant.name)
+        self.measured_bytes[loaded.variant.name] = loaded.memory_bytes
+
+    def remove(self, name: str) -> LoadedModel | None:
+        return self.loaded.pop(name, None)
+
+    def estimate_bytes(self, variant: ModelVariant) -> int:
+        return (
+            self.measured_bytes.get(variant.name)
+            or path_size_bytes(variant.path)
+            or max(self.measured_bytes.values(), default=0)
+        )
+
+    def loaded_bytes(self) -> int:
+        return sum(loaded.memory_bytes for loaded in self.loaded.values())
+
+    def eviction_candidates(self, incoming: ModelVariant) -> list[str]:
+        if not self.memory_budget_bytes:
+            return []
+        needed = self.loaded_bytes() + self.estimate_bytes(incoming) - self.memory_budget_bytes
+        names = []
+        for name, loaded in self.loaded.items():
+            if needed <= 0:
+                break
+            if name == incoming.name:
+                continue
+            names.append(name)
+            needed -= loaded.memory_bytes
+        return names
+
+    def snapshot(self) -> dict:
+        return {
+            "default": self.default,
+            "memory_budget_mb": round(self.memory_budget_bytes / 1048576, 1) if self.memory_budget_bytes else None,
+            "loaded_mb": round(self.loaded_bytes() / 1048576, 1),
+            "evictions": self.evictions,
+            "variants": {
+                name: {
+                    **variant.describe(),
+                    "loaded": name in self.loaded,
+                    "memory_mb": round(self.loaded[name].memory_bytes / 1048576, 1) if name in self.loaded else None,
+                    "load_ms": self.loaded[name].load_ms if name in self.loaded else None,
+                    "uses": self.loaded[name].uses if name in self.loaded else 0,
+                }
+                for name, variant in self.variants.items()
+            },
+        }
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import json
+import time
+from collections import OrderedDict
+from threading import Condition, Lock, Thread
+from typing import TextIO
+
+
+COALESCE_EVENTS = {
+    "token": (),
+    "item_token": ("batch_id", "id"),
+}
+OUTPUT_MODES = {"coalesce", "token"}
+
+
+class OutputWriter:
+    def __init__(
+        self,
+        stream: TextIO,
+        mode: str = "coalesce",
+        interval_ms: float = 16.0,
+        max_bytes: int = 512,
+    ) -> None:
+        self.stream = stream
+        self.mode = mode if mode in OUTPUT_MODES else "coalesce"
+        self.interval = max(interval_ms, 0) / 1000
+        self.max_bytes = max(max_bytes, 1)
+        self.lock = Lock()
+        self.condition = Condition(self.lock)
+        self.pending: OrderedDict[tuple, dict] = OrderedDict()
+        self.tokens = 0
+        self.frames = 0
+        self.lines = 0
+        self.bytes_written = 0
+        self.size_flushes = 0
+        self.timer_flushes = 0
+        self.closed = False
+        self.thread: Thread | None = None
+        if self.mode == "coalesce" and self.interval:
+            self.thread = Thread(target=self._flush_loop, name="output-writer", daemon=True)
+            self.thread.start()
+
+    @property
+    def coalescing(self) -> bool:
+        return self.mode == "coalesce"
+
+    def write(self, job, event: str, payload: dict) -> None:
+        with self.lock:
+            if self.closed or (job is not None and job.muted):
+                return
+            if event not in COALESCE_EVENTS:
+                self._flush_pending()
+                self._write_line(job, event, payload)
+                self.stream.flush()
+                return
+            self.tokens += 1
+            if not self.coalescing:
+                self.frames += 1
+                self._write_line(job, event, payload)
+                self.stream.flush()
+                return
+            key = (job.id if job is not None else None, event) + tuple(
+                payload.get(field) for field in COALESCE_EVENTS[event]
+            )
+            text = payload.get("text", "")
+            entry = self.pending.get(key)
+            if entry is None:
+                entry = {"job": job, "event": event, "payload": payload, "parts": [], "size": 0, "since": time.monotonic()}
+                self.pending[key] = entry
+                self.condition.notify()
+            entry["parts"].append(text)
+            entry["size"] += len(text.encode("utf-8"))
+            if entry["size"] >= self.max_bytes or not self.interval:
+                if self.interval:
+                    self.size_flushes += 1
+                del self.pending[key]
+                self._write_entry(entry)
+                self.stream.flush()
+
+    def flush(self) -> None:
+        with self.lock:
+            self._flush_pending()
+            self.stream.flush()
+
+    def close(self) -> None:
+        with self.lock:
+            self._flush_pending()
+            self.stream.flush()
+            self.closed = True
+            self.condition.notify()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "mode": self.mode,
+                "interval_ms": round(self.interval * 1000, 2),
+                "max_bytes": self.max_bytes,
+                "tokens": self.tokens,
+                "frames": self.frames,
+                "tokens_per_frame": round(self.tokens / self.frames, 2) if self.frames else 0.0,
+                "lines": self.lines,
+                "bytes": self.bytes_written,
+                "size_flushes": self.size_flushes,
+                "timer_flushes": self.timer_flushes,
+            }
+
+    def _flush_loop(self) -> None:
+        with self.condition:
+            while not self.closed:
+                if not self.pending:
+                    self.condition.wait()
+                    continue
+                now = time.monotonic()
+                oldest = min(entry["since"] for entry in self.pending.values())
+                remaining = oldest + self.interval - now
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+                self.timer_flushes += 1
+                self._flush_pending()
+                self.stream.flush()
+
+    def _flush_pending(self) -> None:
+        while self.pending:
+            _, entry = self.pending.popitem(last=False)
+            self._write_entry(entry)
+
+    def _write_entry(self, entry: dict) -> None:
+        job = entry["job"]
+        if job is not None and job.muted:
+            return
+        self.frames += 1
+        self._write_line(job, entry["event"], {**entry["payload"], "text": "".join(entry["parts"])})
+
+    def _write_line(self, job, event: str, payload: dict) -> None:
+        if job is not None:
+            payload = {"job_id": job.id, **payload}
+        line = json.dumps({"event": event, **payload}, ensure_ascii=False) + "\n"
+        self.stream.write(line)
+        self.lines += 1
+        self.bytes_written += len(line)
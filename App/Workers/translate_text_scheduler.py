@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import itertools
+import sys
+import time
+import traceback
+from queue import Empty, PriorityQueue
+from threading import Event, Lock, Thread
+
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 5
+PRIORITY_BULK = 10
+PRIORITY_NAMES = {
+    "interactive": PRIORITY_INTERACTIVE,
+    "normal": PRIORITY_NORMAL,
+    "bulk": PRIORITY_BULK,
+}
+
+
+def parse_priority(value, default: int = PRIORITY_INTERACTIVE) -> int:
+    if isinstance(value, bool) or value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return int(value)
+    return PRIORITY_NAMES.get(str(value).strip().lower(), default)
+
+
+def job_key(job_id: str, client=None) -> tuple:
+    return (client.id if client is not None else None, str(job_id))
+
+
+class Job:
+    def __init__(
+        self,
+        job_id: str,
+        lane: str,
+        kind: str,
+        target,
+        priority: int = PRIORITY_INTERACTIVE,
+        emitter=None,
+        interactive: bool = False,
+        client=None,
+    ) -> None:
+        self.id = job_id
+        self.lane = lane
+        self.kind = kind
+        self.target = target
+        self.priority = priority
+        self.emitter = emitter
+        self.interactive = interactive
+        self.client = client
+        self.cancel_event = Event()
+        self.cancel_reason: str | None = None
+        self.muted = False
+        self.enqueued_at = time.monotonic()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.queue_depth_at_start = 0
+        self.metrics = None
+        self.done = Event()
+
+    @property
+    def key(self) -> tuple:
+        return job_key(self.id, self.client)
+
+    def cancel(self, reason: str = "cancelled", mute: bool = False) -> None:
+        if self.cancel_reason is None:
+            self.cancel_reason = reason
+        if mute:
+            self.muted = True
+        self.cancel_event.set()
+
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def wait_ms(self) -> float:
+        started = self.started_at if self.started_at is not None else time.monotonic()
+        return round((started - self.enqueued_at) * 1000, 2)
+
+    def emit(self, event: str, **payload) -> None:
+        if self.emitter is not None:
+            self.emitter(self, event, payload)
+
+
+class Lane:
+    def __init__(self, name: str, workers: int, scheduler: "Scheduler") -> None:
+        self.name = name
+        self.scheduler = scheduler
+        self.queue: PriorityQueue[tuple[int, int, Job]] = PriorityQueue()
+        self.running: set[Job] = set()
+        self.threads = [
+            Thread(target=self._work, name=f"lane-{name}-{index}", daemon=True) for index in range(max(workers, 1))
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    @property
+    def workers(self) -> int:
+        return len(self.threads)
+
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def _work(self) -> None:
+        while not self.scheduler.closed.is_set():
+            try:
+                _, _, job = self.queue.get(timeout=0.2)
+            except Empty:
+                continue
+            if job.cancelled():
+                self.scheduler._forget(job)
+                continue
+            job.started_at = time.monotonic()
+            job.queue_depth_at_start = self.depth()
+            with self.scheduler.lock:
+                self.running.add(job)
+            try:
+                job.target(job)
+            except Exception as exc:
+                traceback.print_exc(file=sys.stderr)
+                job.emit("error", title="Job Error", message=str(exc))
+            finally:
+                job.finished_at = time.monotonic()
+                with self.scheduler.lock:
+                    self.running.discard(job)
+                self.scheduler._forget(job)
+
+
+class Scheduler:
+    def __init__(self, lanes: dict[str, int]) -> None:
+        self.lock = Lock()
+        self.closed = Event()
+        self.sequence = itertools.count()
+        self.jobs: dict[str, Job] = {}
+        self.lanes = {name: Lane(name, workers, self) for name, workers in lanes.items()}
+
+    def submit(self, job: Job) -> int:
+        lane = self.lanes[job.lane]
+        with self.lock:
+            self.jobs[job.key] = job
+        lane.queue.put((job.priority, next(self.sequence), job))
+        return lane.depth()
+
+    def get(self, job_id: str, client=None) -> Job | None:
+        with self.lock:
+            return self.jobs.get(job_key(job_id, client))
+
+    def cancel(self, job_id: str, reason: str = "cancelled", mute: bool = False, client=None) -> Job | None:
+        job = self.get(job_id, client)
+        if job is not None:
+            job.cancel(reason, mute)
+        return job
+
+    def cancel_where(self, predicate, reason: str = "cancelled", mute: bool = False) -> list[Job]:
+        with self.lock:
+            jobs = [job for job in self.jobs.values() if predicate(job)]
+        for job in jobs:
+            job.cancel(reason, mute)
+        return jobs
+
+    def count_where(self, predicate) -> int:
+        with self.lock:
+            return sum(1 for job in self.jobs.values() if predicate(job))
+
+    def _forget(self, job: Job) -> None:
+        job.done.set()
+        with self.lock:
+            if self.jobs.get(job.key) is job:
+                del self.jobs[job.key]
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                name: {
+                    "workers": lane.workers,
+                    "queued": lane.depth(),
+                    "running": sorted(job.id for job in lane.running),
+                }
+                for name, lane in self.lanes.items()
+            }
+
+    def shutdown(self) -> None:
+        self.cancel_where(lambda job: True, "shutdown")
+        self.closed.set()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import copy
+import math
+import re
+
+
+CJK_LANGUAGES = {"zh", "zh-Hant", "ja", "ko"}
+EXPANSION_RATIOS = {(True, False): 2.0, (False, True): 1.5}
+DEFAULT_EXPANSION_RATIO = 1.4
+MIN_TOKEN_BUDGET = 48
+DICTIONARY_TOKEN_BUDGET = 192
+DICTIONARY_LINES = 5
+LOOP_WINDOW = 480
+LOOP_MAX_PERIOD = 120
+LOOP_MIN_CHARS = 64
+LOOP_MIN_REPEATS = 4
+DEGENERATE_STOPS = {"max_tokens", "repetition"}
+
+
+def token_budget(input_tokens: int, source_code: str, target_code: str, safety: float, cap: int) -> int:
+    ratio = EXPANSION_RATIOS.get((source_code in CJK_LANGUAGES, target_code in CJK_LANGUAGES), DEFAULT_EXPANSION_RATIO)
+    return min(cap, max(MIN_TOKEN_BUDGET, math.ceil(input_tokens * ratio * safety) + MIN_TOKEN_BUDGET // 2))
+
+
+def repetitive_source(text: str) -> bool:
+    words = text.split()
+    return len(words) >= 16 and len(set(words)) * 4 <= len(words)
+
+
+def trailing_loop(text: str) -> tuple[str, int] | None:
+    tail = text[-LOOP_WINDOW:]
+    for period in range(1, min(LOOP_MAX_PERIOD, len(tail) // LOOP_MIN_REPEATS) + 1):
+        unit = tail[-period:]
+        repeats = max(LOOP_MIN_REPEATS, math.ceil(LOOP_MIN_CHARS / period))
+        if period * repeats > len(tail) or not tail.endswith(unit * repeats):
+            continue
+        if not any(char.isalpha() for char in unit):
+            continue
+        while text.endswith(unit * (repeats + 1)):
+            repeats += 1
+        return unit, repeats
+    return None
+
+
+class StopCriteria:
+    def __init__(self, max_tokens: int, line_limit: int | None = None, detect_loops: bool = True) -> None:
+        self.max_tokens = max_tokens
+        self.line_limit = line_limit
+        self.detect_loops = detect_loops
+        self.text = ""
+        self.reason: str | None = None
+        self.trim = 0
+
+    def feed(self, chunk: str) -> str:
+        if self.line_limit is not None:
+            chunk = self._limit_lines(chunk)
+        self.text += chunk
+        if self.reason is None and self.detect_loops:
+            loop = trailing_loop(self.text)
+            if loop is not None:
+                unit, repeats = loop
+                self.reason = "repetition"
+                self.trim = len(unit) * (repeats - 1)
+        return chunk
+
+    def finish(self, output: str, tokens: int, finish_reason: str | None = None) -> str:
+        if self.reason is None:
+            exhausted = finish_reason == "length" or (finish_reason != "stop" and tokens >= self.max_tokens)
+            self.reason = "max_tokens" if exhausted else "eos"
+        if self.trim:
+            output = output[: len(output) - self.trim].rstrip()
+        return output
+
+    def _limit_lines(self, chunk: str) -> str:
+        lines = 0
+        line_start = 0
+        combined = self.text + chunk
+        for index, char in enumerate(combined):
+            if char != "\n":
+                continue
+            if combined[line_start:index].strip():
+                lines += 1
+                if lines >= self.line_limit:
+                    self.reason = "line_limit"
+                    return combined[len(self.text) : index] if index > len(self.text) else ""
+            line_start = index + 1
+        return chunk
+
+
+def resolve_stop_tokens(tokenizer, markers: tuple[str, ...]) -> tuple[frozenset[int], tuple[str, ...]]:
+    token_ids = {token_id for token_id in getattr(tokenizer, "eos_token_ids", None) or [] if isinstance(token_id, int)}
+    eos_token_id = getattr(tokenizer, "eos_token_id", None)
+    if isinstance(eos_token_id, int):
+        token_ids.add(eos_token_id)
+    convert = getattr(tokenizer, "convert_tokens_to_ids", None)
+    unknown_id = getattr(tokenizer, "unk_token_id", None)
+    remaining = []
+    for marker in markers:
+        token_id = convert(marker) if convert is not None else None
+        if isinstance(token_id, int) and token_id != unknown_id:
+            token_ids.add(token_id)
+        else:
+            remaining.append(marker)
+    return frozenset(token_ids), tuple(remaining)
+
+
+def register_stop_tokens(tokenizer, token_ids: frozenset[int]) -> None:
+    current = getattr(tokenizer, "eos_token_ids", None)
+    add_eos_token = getattr(tokenizer, "add_eos_token", None)
+    for token_id in sorted(token_ids):
+        if current is not None and token_id in current:
+            continue
+        if add_eos_token is not None:
+            add_eos_token(str(token_id))
+        elif isinstance(current, set):
+            current.add(token_id)
+
+
+def new_detokenizer(tokenizer):
+    detokenizer = copy.copy(tokenizer.detokenizer)
+    detokenizer.reset()
+    return detokenizer
+
+
+class MarkerFilter:
+    def __init__(self, markers: tuple[str, ...]) -> None:
+        self.pattern = re.compile("|".join(re.escape(marker) for marker in markers))
+        self.prefixes = {marker[:length] for marker in markers for length in range(1, len(marker))}
+        self.starts = "".join(sorted({marker[0] for marker in markers}))
+        self.window = max(len(marker) for marker in markers) - 1
+        self.pending = ""
+        self.found = False
+
+    def feed(self, chunk: str) -> str:
+        if self.found:
+            return ""
+        if not self.pending:
+            if len(self.starts) == 1 and self.starts not in chunk:
+                return chunk
+            text = chunk
+        else:
+            text = self.pending + chunk
+        match = self.pattern.search(text)
+        if match is not None:
+            self.found = True
+            self.pending = ""
+            return text[: match.start()]
+        hold = self._partial(text)
+        self.pending = text[hold:]
+        return text[:hold]
+
+    def finish(self) -> str:
+        ready, self.pending = self.pending, ""
+        return "" if self.found else ready
+
+    def _partial(self, text: str) -> int:
+        for index in range(max(len(text) - self.window, 0), len(text)):
+            if text[index] in self.starts and text[index:] in self.prefixes:
+                return index
+        return len(text)
+
+
+class GenerationStream:
+    def __init__(
+        self,
+        criteria: StopCriteria,
+        on_text,
+        stop_ids: frozenset[int] = frozenset(),
+        stop_markers: tuple[str, ...] = (),
+        strip_markers: tuple[str, ...] = (),
+    ) -> None:
+        self.criteria = criteria
+        self.on_text = on_text
+        self.stop_ids = stop_ids
+        self.markers = MarkerFilter(stop_markers) if stop_markers else None
+        self.strip_markers = strip_markers
+        self.parts: list[str] = []
+        self.tokens = 0
+        self.finish_reason: str | None = None
+
+    def feed(self, text_chunk: str, token: int, finish_reason: str | None = None) -> bool:
+        self.tokens += 1
+        if token in self.stop_ids:
+            finish_reason = "stop"
+            for marker in self.strip_markers:
+                text_chunk = text_chunk.replace(marker, "")
+        if self.markers is not None:
+            text_chunk = self.markers.feed(text_chunk)
+            if self.markers.found:
+                finish_reason = "stop"
+        self.finish_reason = finish_reason
+        self._emit(text_chunk)
+        return finish_reason == "stop" or self.criteria.reason is not None
+
+    def finish(self) -> str:
+        if self.markers is not None and self.criteria.reason is None:
+            self._emit(self.markers.finish())
+        return self.criteria.finish("".join(self.parts), self.tokens, self.finish_reason)
+
+    def _emit(self, text_chunk: str) -> None:
+        if text_chunk:
+            text_chunk = self.criteria.feed(text_chunk)
+        if text_chunk:
+            self.on_text(text_chunk)
+            self.parts.append(text_chunk)
@@ -1,19 +1,106 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import argparse
+import codecs
+import gc
 import json
 import html
+import itertools
 import os
 import re
 import sys
 import time
 import traceback
-from threading import Event, Lock, Thread
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from threading import Lock, Thread
+
+from translate_text_classify import TextProfile, classify_text
+from translate_text_daemon import DEFAULT_SOCKET_PATH, DaemonServer, client_context, connect, current_client, proxy, spawn_daemon
+from translate_text_dedup import DedupIndex, Deduplicator
+from translate_text_cache import DEFAULT_CACHE_PATH, TranslationCache, cache_key, normalize_cache_text
+from translate_text_dictionary import DEFAULT_DICTIONARY_PATH, DictionaryStore
+from translate_text_files import FileCheckpoint, file_signature, iter_file_segments
+from translate_text_formats import STRUCTURED_FORMATS, Document, extract, format_for, normalize_format
+from translate_text_http import HttpTransport, backoff_delay, is_retryable
+from translate_text_masking import MaskedText, SentinelStream
+from translate_text_memory import DEFAULT_MEMORY_PATH, TranslationMemory
+from translate_text_metrics import JobMetrics, MetricsRegistry, TraceWriter
+from translate_text_models import LoadedModel, ModelRegistry, model_memory_bytes, parse_model_variants
+from translate_text_output import OutputWriter
+from translate_text_stopping import (
+    DEGENERATE_STOPS,
+    DICTIONARY_LINES,
+    DICTIONARY_TOKEN_BUDGET,
+    GenerationStream,
+    StopCriteria,
+    new_detokenizer,
+    register_stop_tokens,
+    repetitive_source,
+    resolve_stop_tokens,
+    token_budget,
+)
+from translate_text_scheduler import PRIORITY_BULK, PRIORITY_INTERACTIVE, PRIORITY_NORMAL, Job, Scheduler, parse_priority
 
 
 MODEL_PATH = os.environ.get("TRANSLATE_TEXT_MODEL", "").strip()
+MODELS_CONFIG = os.environ.get("TRANSLATE_TEXT_MODELS", "").strip()
+MODEL_MEMORY_BUDGET_GB = float(os.environ.get("TRANSLATE_TEXT_MODEL_MEMORY_GB", "0"))
 START_BACKEND = os.environ.get("TRANSLATE_TEXT_BACKEND", "gemma").strip().lower()
+SEGMENT_CHARS = int(os.environ.get("TRANSLATE_TEXT_SEGMENT_CHARS", "1200"))
+CLOUD_LANES = int(os.environ.get("TRANSLATE_TEXT_CLOUD_LANES", "4"))
+CLOUD_CONCURRENCY = int(os.environ.get("TRANSLATE_TEXT_CLOUD_CONCURRENCY", "4"))
+GOOGLE_ENDPOINT = os.environ.get("TRANSLATE_TEXT_GOOGLE_ENDPOINT", "").strip() or "https://translate.google.com/m"
+BING_ENDPOINT = os.environ.get("TRANSLATE_TEXT_BING_ENDPOINT", "").strip() or "https://www.bing.com/translator"
+GOOGLE_RATE_LIMIT = float(os.environ.get("TRANSLATE_TEXT_GOOGLE_RATE", "8"))
+BING_RATE_LIMIT = float(os.environ.get("TRANSLATE_TEXT_BING_RATE", "4"))
+BING_TOKEN_TTL = float(os.environ.get("TRANSLATE_TEXT_BING_TOKEN_TTL", "1800"))
+HTTP_POOL_SIZE = int(os.environ.get("TRANSLATE_TEXT_HTTP_POOL", "0")) or CLOUD_CONCURRENCY * CLOUD_LANES
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("TRANSLATE_TEXT_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.environ.get("TRANSLATE_TEXT_HTTP_READ_TIMEOUT", "30"))
+HTTP2_ENABLED = os.environ.get("TRANSLATE_TEXT_HTTP2", "0").strip() == "1"
+FILE_PROGRESS_SECONDS = 0.5
+FILE_CHECKPOINT_SECONDS = 2.0
+FILE_DEDUP_ENTRIES = int(os.environ.get("TRANSLATE_TEXT_FILE_DEDUP_ENTRIES", "4096"))
+PREFIX_CACHE_ENABLED = os.environ.get("TRANSLATE_TEXT_PREFIX_CACHE", "1").strip() != "0"
+PREFIX_CACHE_ENTRIES = int(os.environ.get("TRANSLATE_TEXT_PREFIX_CACHE_ENTRIES", "8"))
+PREFIX_CACHE_MIN_TOKENS = 8
+DRAFT_MODEL_PATH = os.environ.get("TRANSLATE_TEXT_DRAFT_MODEL", "").strip()
+NUM_DRAFT_TOKENS = int(os.environ.get("TRANSLATE_TEXT_DRAFT_TOKENS", "3"))
+PROMPT_SENTINEL = "\ue000"
+STOP_MARKERS = ("<end_of_turn>", "<eos>", "<bos>")
+TOKEN_OUTPUT_MODE = os.environ.get("TRANSLATE_TEXT_TOKEN_OUTPUT", "coalesce").strip().lower()
+TOKEN_FLUSH_MS = float(os.environ.get("TRANSLATE_TEXT_TOKEN_FLUSH_MS", "16"))
+TOKEN_FLUSH_BYTES = int(os.environ.get("TRANSLATE_TEXT_TOKEN_FLUSH_BYTES", "512"))
+WARMUP_ENABLED = os.environ.get("TRANSLATE_TEXT_WARMUP", "1").strip() != "0"
+WARMUP_TOKENS = int(os.environ.get("TRANSLATE_TEXT_WARMUP_TOKENS", "8"))
+METRICS_WINDOW = int(os.environ.get("TRANSLATE_TEXT_METRICS_WINDOW", "500"))
+TRACE_PATH = os.environ.get("TRANSLATE_TEXT_TRACE_PATH", "").strip()
+CACHE_ENABLED = os.environ.get("TRANSLATE_TEXT_CACHE", "1").strip() != "0"
+CACHE_PATH = os.environ.get("TRANSLATE_TEXT_CACHE_PATH", "").strip() or str(DEFAULT_CACHE_PATH)
+CACHE_MEMORY_ENTRIES = int(os.environ.get("TRANSLATE_TEXT_CACHE_MEMORY_ENTRIES", "512"))
+CACHE_DISK_ENTRIES = int(os.environ.get("TRANSLATE_TEXT_CACHE_DISK_ENTRIES", "50000"))
+CACHE_MAX_AGE_DAYS = float(os.environ.get("TRANSLATE_TEXT_CACHE_MAX_AGE_DAYS", "30"))
+DICTIONARY_ENABLED = os.environ.get("TRANSLATE_TEXT_DICTIONARY", "1").strip() != "0"
+DICTIONARY_PATH = os.environ.get("TRANSLATE_TEXT_DICTIONARY_PATH", "").strip() or str(DEFAULT_DICTIONARY_PATH)
+DICTIONARY_MMAP_MB = int(os.environ.get("TRANSLATE_TEXT_DICTIONARY_MMAP_MB", "64"))
+MEMORY_ENABLED = os.environ.get("TRANSLATE_TEXT_MEMORY", "1").strip() != "0"
+MEMORY_PATH = os.environ.get("TRANSLATE_TEXT_MEMORY_PATH", "").strip() or str(DEFAULT_MEMORY_PATH)
+MEMORY_SEGMENTS = int(os.environ.get("TRANSLATE_TEXT_MEMORY_SEGMENTS", "200000"))
+MEMORY_THRESHOLD = float(os.environ.get("TRANSLATE_TEXT_MEMORY_THRESHOLD", "0.7"))
+DAEMON_ENABLED = os.environ.get("TRANSLATE_TEXT_DAEMON", "0").strip() == "1"
+DAEMON_SOCKET = os.environ.get("TRANSLATE_TEXT_DAEMON_SOCKET", "").strip() or str(DEFAULT_SOCKET_PATH)
+DAEMON_MAX_PENDING = int(os.environ.get("TRANSLATE_TEXT_DAEMON_MAX_PENDING", "32"))
+DAEMON_BUFFER_LINES = int(os.environ.get("TRANSLATE_TEXT_DAEMON_BUFFER_LINES", "1024"))
+DAEMON_SEND_TIMEOUT = float(os.environ.get("TRANSLATE_TEXT_DAEMON_SEND_TIMEOUT", "5"))
+IDLE_UNLOAD_SECONDS = float(os.environ.get("TRANSLATE_TEXT_IDLE_UNLOAD", "600"))
+MASKING_ENABLED = os.environ.get("TRANSLATE_TEXT_MASKING", "1").strip() != "0"
+MAX_NEW_TOKENS = int(os.environ.get("TRANSLATE_TEXT_MAX_TOKENS", "2048"))
+TOKEN_BUDGET_SAFETY = float(os.environ.get("TRANSLATE_TEXT_TOKEN_SAFETY", "2.0"))
 
+STYLES = ("Default", "Academic", "Web Chat", "Casual", "Dictionary")
 LANG_MAP = {
     "简体中文": "zh",
     "繁體中文": "zh-Hant",
@@ -32,8 +119,27 @@ LANG_MAP = {
 }
 
 
+OUTPUT = OutputWriter(sys.stdout, TOKEN_OUTPUT_MODE, TOKEN_FLUSH_MS, TOKEN_FLUSH_BYTES)
+DAEMON: DaemonServer | None = None
+
+
+def write_event(job: Job | None, event: str, payload: dict) -> None:
+    if job is not None and job.metrics is not None:
+        if event == "error":
+            job.metrics.status = "error"
+        elif event in {"replace", "token", "item_token"}:
+            job.metrics.mark("first_text")
+    client = job.client if job is not None else current_client()
+    if client is not None:
+        client.output.write(job, event, payload)
+    elif DAEMON is not None:
+        DAEMON.broadcast(job, event, payload)
+    else:
+        OUTPUT.write(job, event, payload)
+
+
 def emit(event: str, **payload) -> None:
-    print(json.dumps({"event": event, **payload}, ensure_ascii=False), flush=True)
+    write_event(None, event, payload)
 
 
 def normalized_backend(value: str | None) -> str:
@@ -72,13 +178,41 @@ def target_for_bing(lang: str) -> str:
 
 
 def detect_source_lang(text: str) -> str:
-    if any("\u3040" <= char <= "\u30ff" for char in text):
-        return "ja"
-    if any("\u4e00" <= char <= "\u9fff" for char in text):
-        return "zh"
-    if any("\uac00" <= char <= "\ud7a3" for char in text):
-        return "ko"
-    return "en"
+    return classify_text(text).language
+
+
+SENTENCE_END = re.compile(r"[.!?;。！？；…]+[\"'”’)）\]」』]*\s*|\n")
+
+
+def split_sentences(text: str, max_chars: int) -> list[str]:
+    sentences: list[str] = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        if match.end() > start:
+            sentences.append(text[start : match.end()])
+            start = match.end()
+    if start < len(text):
+        sentences.append(text[start:])
+
+    pieces: list[str] = []
+    current = ""
+    for sentence in sentences:
+        if len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars) + 1 or max_chars
+                pieces.append(sentence[:cut])
+                sentence = sentence[cut:]
+            current = sentence
+        elif len(current) + len(sentence) > max_chars and current:
+            pieces.append(current)
+            current = sentence
+        else:
+            current += sentence
+    if current:
+        pieces.append(current)
+    return pieces
 
 
 def chunk_text(text: str, max_chars: int) -> list[str]:
@@ -92,7 +226,7 @@ def chunk_text(text: str, max_chars: int) -> list[str]:
             if current:
                 chunks.append(current)
                 current = ""
-            chunks.extend(part[index : index + max_chars] for index in range(0, len(part), max_chars))
+            chunks.extend(split_sentences(part, max_chars))
         elif len(current) + len(part) > max_chars and current:
             chunks.append(current)
             current = part
@@ -103,30 +237,160 @@ def chunk_text(text: str, max_chars: int) -> list[str]:
     return chunks
 
 
+def segment_text(text: str, max_chars: int) -> list[tuple[str, str]]:
+    segments: list[tuple[str, str]] = []
+    for index, part in enumerate(re.split(r"(\n\s*\n)", text)):
+        if index % 2:
+            body, separator = segments.pop() if segments else ("", "")
+            segments.append((body, separator + part))
+            continue
+        pieces = split_sentences(part, max_chars) if len(part) > max_chars else [part]
+        for piece in pieces:
+            body = piece.rstrip()
+            segments.append((body, piece[len(body) :]))
+    return [segment for segment in segments if segment[0] or segment[1]]
+
+
+def resolve_style(input_content: str, style: str, profile: TextProfile | None = None) -> tuple[str, str]:
+    warning_prefix = ""
+    if profile is None:
+        profile = classify_text(input_content)
+    clean_str = input_content.strip()
+    if clean_str:
+        edges = input_content[: input_content.index(clean_str[0])] + input_content[len(input_content.rstrip()) :]
+    else:
+        edges = input_content
+    if style == "Default":
+        space_count = profile.spaces - edges.count(" ")
+        if profile.cjk > 0:
+            is_likely_word = not profile.has_punctuation and len(clean_str) <= 6
+        else:
+            is_likely_word = not profile.has_punctuation and (space_count == 0 or len(clean_str) < 20)
+        if is_likely_word:
+            style = "Dictionary"
+
+    if style == "Dictionary":
+        has_inner_whitespace = profile.whitespace > len(edges)
+        is_sentence = has_inner_whitespace or profile.has_punctuation or len(input_content) > 20 or profile.cjk > 6
+        if is_sentence:
+            warning_prefix = "⚠️ [Mode Switch: Input detected as a phrase/sentence. Switching to Default style...]\n\n"
+            style = "Default"
+    return style, warning_prefix
+
+
+def dictionary_prompt(input_content: str, target_code: str) -> str:
+    return (
+        "You are a dictionary formatter.\n"
+        "Your task is to output EXACTLY 5 lines and NOTHING ELSE.\n"
+        "Any extra text, titles, labels, numbering, markdown, or explanations are STRICTLY FORBIDDEN.\n\n"
+        "FORMAT (STRICT):\n"
+        "Line 1: IPA pronunciation enclosed in slashes, and ONLY IPA. Example: /kæt/\n"
+        "Line 2: Part of speech ONLY. Example: noun, verb, adjective\n"
+        f"Line 3: Definition written in {target_code}. No labels.\n"
+        "Line 4: List one example sentence in the original language of WORD. No labels.\n"
+        f"Line 5: Translation of line 4 written in {target_code}. No labels.\n\n"
+        "NEGATIVE CONSTRAINTS (DO NOT DO THESE):\n"
+        "- Do NOT use words like Definition, Example, Translation\n"
+        "- Do NOT use headers, bullet points, numbers, or markdown\n"
+        "- Do NOT add explanations or notes\n"
+        "- Do NOT repeat the word\n\n"
+        "WORD: "
+        + input_content
+    )
+
+
+class RateLimiter:
+    def __init__(self, requests_per_second: float) -> None:
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def cloud_transport(name: str) -> HttpTransport:
+    return HttpTransport(name, HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP2_ENABLED)
+
+
 class BaseTranslator:
+    rate_limiter = RateLimiter(0)
+    transport: HttpTransport | None = None
+
     def translate(self, text: str, source_lang: str = "auto", target_lang: str = "zh") -> str:
         raise NotImplementedError
 
-    def translate_with_retry(self, text: str, source_lang: str, target_lang: str, attempts: int = 3) -> str:
+    def stats(self) -> dict:
+        return {"http": self.transport.stats()} if self.transport is not None else {}
+
+    def translate_with_retry(
+        self,
+        text: str,
+        source_lang: str,
+        target_lang: str,
+        attempts: int = 3,
+        metrics: JobMetrics | None = None,
+    ) -> str:
         if not text or not text.strip():
             return text
         last_exc = None
         for attempt in range(attempts):
+            started = time.perf_counter()
             try:
-                return self.translate(text, source_lang, target_lang)
+                self.rate_limiter.wait()
+                if metrics is not None:
+                    metrics.record("rate_limit", started, time.perf_counter())
+                    started = time.perf_counter()
+                output = self.translate(text, source_lang, target_lang)
+                if metrics is not None:
+                    metrics.record("http", started, time.perf_counter(), attempt=attempt, chars=len(text))
+                return output
             except Exception as exc:
                 last_exc = exc
-                if attempt < attempts - 1:
-                    time.sleep(min(2 ** attempt, 4))
+                if metrics is not None:
+                    metrics.record("http", started, time.perf_counter(), attempt=attempt, error=str(exc))
+                if attempt == attempts - 1 or not is_retryable(exc):
+                    break
+                if metrics is not None:
+                    metrics.add("retries")
+                delay = backoff_delay(attempt, getattr(exc, "retry_after", None))
+                if self.transport is not None:
+                    self.transport.record_backoff(delay)
+                backoff_started = time.perf_counter()
+                time.sleep(delay)
+                if metrics is not None:
+                    metrics.record("backoff", backoff_started, time.perf_counter())
         raise RuntimeError(f"translation failed after {attempts} attempts: {last_exc}")
 
+    def translate_masked(
+        self, text: str, source_lang: str, target_lang: str, metrics: JobMetrics | None = None
+    ) -> str:
+        masked = MaskedText(text) if MASKING_ENABLED else None
+        if masked is None or not masked.spans:
+            return self.translate_with_retry(text, source_lang, target_lang, metrics=metrics)
+        if metrics is not None:
+            metrics.add("masked_spans", len(masked.spans))
+            metrics.add("masked_chars", masked.saved_chars)
+        restored = masked.restore(self.translate_with_retry(masked.text, source_lang, target_lang, metrics=metrics))
+        if restored is not None:
+            return restored
+        if metrics is not None:
+            metrics.add("mask_retries")
+        return self.translate_with_retry(text, source_lang, target_lang, metrics=metrics)
+
 
 class GoogleMobileTranslator(BaseTranslator):
     def __init__(self) -> None:
-        import requests
-
-        self.session = requests.Session()
-        self.endpoint = "https://translate.google.com/m"
+        self.transport = cloud_transport("google")
+        self.endpoint = GOOGLE_ENDPOINT
+        self.rate_limiter = RateLimiter(GOOGLE_RATE_LIMIT)
         self.headers = {
             "User-Agent": (
                 "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
@@ -135,13 +399,13 @@ class GoogleMobileTranslator(BaseTranslator):
         }
 
     def translate(self, text: str, source_lang: str = "auto", target_lang: str = "zh") -> str:
-        response = self.session.get(
+        response = self.transport.request(
+            "GET",
             self.endpoint,
-            params={"tl": target_for_google(target_lang), "sl": source_lang or "auto", "q": text[:5000]},
+            params={"tl": target_for_google(target_lang), "sl": target_for_google(source_lang or "auto"), "q": text[:5000]},
             headers=self.headers,
-            timeout=30,
         )
-        response.raise_for_status()
+        self.transport.check(response)
         matches = re.findall(r'(?s)class="(?:t0|result-container)">(.*?)<', response.text)
         if not matches:
             raise RuntimeError("Google response did not contain a translation result")
@@ -150,284 +414,1908 @@ class GoogleMobileTranslator(BaseTranslator):
 
 class BingWebTranslator(BaseTranslator):
     def __init__(self) -> None:
-        import requests
-
-        self.session = requests.Session()
-        self.endpoint = "https://www.bing.com/translator"
+        self.transport = cloud_transport("bing")
+        self.endpoint = BING_ENDPOINT
+        self.rate_limiter = RateLimiter(BING_RATE_LIMIT)
         self.headers = {
             "User-Agent": (
                 "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
                 "(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36 Edg/131.0.0.0"
             )
         }
+        self.sid: tuple[str, str, str, str, str] | None = None
+        self.sid_expires_at = 0.0
+        self.sid_lock = Lock()
+        self.sid_hits = 0
+        self.sid_refreshes = 0
+        self.sid_invalidations = 0
 
     def find_sid(self):
-        response = self.session.get(self.endpoint, headers=self.headers, timeout=30)
-        response.raise_for_status()
-        url = response.url[:-10]
+        response = self.transport.request("GET", self.endpoint, headers=self.headers)
+        self.transport.check(response)
+        url = str(response.url)[:-10]
         ig_matches = re.findall(r'"ig":"(.*?)"', response.text)
         iid_matches = re.findall(r'data-iid="(.*?)"', response.text)
-        token_matches = re.findall(r"params_AbusePreventionHelper\s=\s\[(.*?),\"(.*?)\",", response.text)
+        token_matches = re.findall(r"params_AbusePreventionHelper\s=\s\[(.*?),\"(.*?)\",(\d*)", response.text)
         if not ig_matches or not iid_matches or not token_matches:
             raise RuntimeError("Bing response did not contain translation tokens")
-        key, token = token_matches[0]
-        return url, ig_matches[0], iid_matches[-1], key, token
+        key, token, expiry_ms = token_matches[0]
+        ttl = BING_TOKEN_TTL
+        if expiry_ms:
+            ttl = min(ttl, int(expiry_ms) / 1000 * 0.9)
+        return (url, ig_matches[0], iid_matches[-1], key, token), ttl
+
+    def get_sid(self) -> tuple[str, str, str, str, str]:
+        with self.sid_lock:
+            if self.sid is not None and time.monotonic() < self.sid_expires_at:
+                self.sid_hits += 1
+                return self.sid
+            sid, ttl = self.find_sid()
+            self.sid = sid
+            self.sid_expires_at = time.monotonic() + ttl
+            self.sid_refreshes += 1
+            return sid
+
+    def invalidate_sid(self, sid: tuple[str, str, str, str, str]) -> None:
+        with self.sid_lock:
+            if self.sid == sid:
+                self.sid = None
+                self.sid_invalidations += 1
 
     def translate(self, text: str, source_lang: str = "auto", target_lang: str = "zh") -> str:
-        url, ig, iid, key, token = self.find_sid()
-        from_lang = source_lang if source_lang and source_lang != "auto" else "en"
-        response = self.session.post(
-            f"{url}ttranslatev3?IG={ig}&IID={iid}",
-            data={
-                "fromLang": from_lang,
-                "to": target_for_bing(target_lang),
-                "text": text[:1000],
-                "token": token,
-                "key": key,
-            },
-            headers=self.headers,
-            timeout=30,
-        )
-        response.raise_for_status()
-        return response.json()[0]["translations"][0]["text"]
+        from_lang = target_for_bing(source_lang) if source_lang and source_lang != "auto" else "en"
+        for attempt in range(2):
+            sid = self.get_sid()
+            url, ig, iid, key, token = sid
+            response = self.transport.request(
+                "POST",
+                f"{url}ttranslatev3?IG={ig}&IID={iid}",
+                data={
+                    "fromLang": from_lang,
+                    "to": target_for_bing(target_lang),
+                    "text": text[:1000],
+                    "token": token,
+                    "key": key,
+                },
+                headers=self.headers,
+            )
+            rejected = response.status_code in {401, 403}
+            if not rejected:
+                self.transport.check(response)
+                result = response.json()
+                rejected = not isinstance(result, list)
+            if rejected:
+                self.invalidate_sid(sid)
+                if attempt == 0:
+                    continue
+                raise RuntimeError(f"Bing rejected the session token (HTTP {response.status_code})")
+            return result[0]["translations"][0]["text"]
+        raise RuntimeError("Bing translation failed")
+
+    def stats(self) -> dict:
+        with self.sid_lock:
+            return {
+                **super().stats(),
+                "sid_hits": self.sid_hits,
+                "sid_refreshes": self.sid_refreshes,
+                "sid_invalidations": self.sid_invalidations,
+            }
 
 
 class TranslateWorker:
     def __init__(self) -> None:
+        self.startup_started = time.perf_counter()
+        self.startup_phases: dict[str, float] = {}
         self.model = None
         self.tokenizer = None
+        self.stop_ids: frozenset[int] = frozenset()
+        self.stop_markers: tuple[str, ...] = ()
         self.stream_generate = None
-        self.stop_event = Event()
-        self.processing_thread: Thread | None = None
-        self.current_gen_id = 0
+        self.registry = ModelRegistry(
+            *parse_model_variants(MODELS_CONFIG, MODEL_PATH), int(MODEL_MEMORY_BUDGET_GB * 1024**3)
+        )
+        self.active_variant: str | None = None
+        self.draft_model = None
+        self.draft_error: str | None = None
+        self.scheduler = Scheduler({"gemma": 1, "cloud": CLOUD_LANES})
+        self.job_ids = itertools.count(1)
+        self.metrics = MetricsRegistry(METRICS_WINDOW)
+        self.trace = self._open_trace()
         self.cloud_translators: dict[str, BaseTranslator] = {}
+        self.cloud_lock = Lock()
         self.local_model_ready = False
         self.model_load_lock = Lock()
+        self.generation_lock = Lock()
+        self.prefix_cache_tools = None
+        self.prefix_caches: OrderedDict[tuple[str, str, str], tuple[list[int], list, int]] = OrderedDict()
+        self.result_cache = (
+            TranslationCache(CACHE_PATH, CACHE_MEMORY_ENTRIES, CACHE_DISK_ENTRIES, CACHE_MAX_AGE_DAYS)
+            if CACHE_ENABLED
+            else None
+        )
+        self.dictionary = DictionaryStore(DICTIONARY_PATH, DICTIONARY_MMAP_MB) if DICTIONARY_ENABLED else None
+        self.memory = TranslationMemory(MEMORY_PATH, MEMORY_SEGMENTS, MEMORY_THRESHOLD) if MEMORY_ENABLED else None
+        self.last_activity = time.monotonic()
+        self.idle_unloads = 0
+        self.startup_phases["init_ms"] = self.startup_elapsed_ms()
+
+    def startup_elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.startup_started) * 1000, 2)
 
     def load(self) -> None:
-        if normalized_backend(START_BACKEND) in {"google", "bing"}:
-            emit("status", text=f"Using {normalized_backend(START_BACKEND).title()} Translate...")
+        backend = normalized_backend(START_BACKEND)
+        if backend in {"google", "bing"}:
+            emit("status", text=f"Using {backend.title()} Translate...")
             emit("ready")
+            self.startup_phases["ready_at_ms"] = self.startup_elapsed_ms()
+        self.startup_phases["command_loop_at_ms"] = self.startup_elapsed_ms()
+        Thread(target=self._start_backend, args=(backend,), name="startup", daemon=True).start()
+
+    def _start_backend(self, backend: str) -> None:
+        try:
+            if backend == "gemma":
+                if self.load_model(emit_ready=False, activate=False):
+                    if WARMUP_ENABLED:
+                        lane = self.scheduler.snapshot()["gemma"]
+                        if lane["queued"] or lane["running"]:
+                            self.startup_phases["warmup_skipped"] = True
+                        else:
+                            self.warm_up()
+                    emit("ready")
+                    self.startup_phases.setdefault("ready_at_ms", self.startup_elapsed_ms())
+            else:
+                started = time.perf_counter()
+                self.get_cloud_translator(backend)
+                self.startup_phases["client_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+        self.startup_phases["total_ms"] = self.startup_elapsed_ms()
+        emit("startup_timing", backend=backend, **self.startup_phases)
+
+    def warm_up(self) -> None:
+        if os.environ.get("TRANSLATE_APPKIT_SKIP_MODEL") == "1":
             return
-        self.load_model(emit_ready=True)
+        started = time.perf_counter()
+        pieces: list[str] = []
+        try:
+            prompt = self.build_prompt("Hello.", "en", "zh", "Default")
+            self._stream_prompt(prompt, lambda: len(pieces) >= WARMUP_TOKENS, pieces.append)
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+        self.startup_phases["warmup_ms"] = round((time.perf_counter() - started) * 1000, 2)
 
-    def load_model(self, emit_ready: bool) -> bool:
+    def load_model(self, emit_ready: bool, variant: str | None = None, activate: bool = True) -> bool:
         with self.model_load_lock:
-            if self.local_model_ready:
-                if emit_ready:
-                    emit("ready")
-                return True
-            emit("status", text="Loading TranslateGemma...")
-            try:
-                if os.environ.get("TRANSLATE_APPKIT_SKIP_MODEL") == "1":
-                    self.local_model_ready = True
-                    if emit_ready:
-                        emit("ready")
-                    return True
-                from mlx_lm import load, stream_generate
-
-                self.stream_generate = stream_generate
-                self.model, self.tokenizer = load(MODEL_PATH, model_config={"trust_remote_code": True})
+            if os.environ.get("TRANSLATE_APPKIT_SKIP_MODEL") == "1":
                 self.local_model_ready = True
                 if emit_ready:
                     emit("ready")
+                    self.startup_phases.setdefault("ready_at_ms", self.startup_elapsed_ms())
                 return True
+            try:
+                selected = self.registry.variant(variant)
+                loaded = self.registry.get(selected.name)
+                if loaded is None:
+                    emit("status", text="Loading TranslateGemma...")
+                    loaded = self._load_variant(selected)
+                    loaded.uses += 1
             except Exception as exc:
                 traceback.print_exc(file=sys.stderr)
                 emit("error", title="Model Load Error", message=str(exc))
                 return False
+            if activate or self.active_variant is None:
+                self._activate(loaded)
+            if emit_ready:
+                emit("ready")
+                self.startup_phases.setdefault("ready_at_ms", self.startup_elapsed_ms())
+            return True
+
+    def _load_variant(self, variant) -> LoadedModel:
+        started = time.perf_counter()
+        from mlx_lm import load, stream_generate
+
+        imported = time.perf_counter()
+        self.stream_generate = stream_generate
+        if self.prefix_cache_tools is None:
+            self.prefix_cache_tools = self._load_prefix_cache_tools()
+        evicted = []
+        for name in self.registry.eviction_candidates(variant):
+            self._unload(name, "memory_budget")
+            self.registry.evictions += 1
+            evicted.append(name)
+        model, tokenizer = load(variant.path, model_config={"trust_remote_code": True})
+        load_ms = round((time.perf_counter() - imported) * 1000, 2)
+        loaded = LoadedModel(variant, model, tokenizer, load_ms, model_memory_bytes(model, variant.path))
+        loaded.stop_ids, loaded.stop_markers = resolve_stop_tokens(tokenizer, STOP_MARKERS)
+        register_stop_tokens(tokenizer, loaded.stop_ids)
+        self.registry.add(loaded)
+        if DRAFT_MODEL_PATH and self.draft_model is None and self.draft_error is None:
+            self.load_draft_model(load, tokenizer)
+        self.startup_phases.setdefault("model_import_ms", round((imported - started) * 1000, 2))
+        self.startup_phases.setdefault("model_load_ms", load_ms)
+        emit(
+            "model_loaded",
+            model=variant.name,
+            path=variant.path,
+            load_ms=load_ms,
+            memory_mb=round(loaded.memory_bytes / 1048576, 1),
+            loaded_mb=round(self.registry.loaded_bytes() / 1048576, 1),
+            evicted=evicted,
+        )
+        return loaded
+
+    def _activate(self, loaded: LoadedModel) -> None:
+        with self.generation_lock:
+            self.model = loaded.model
+            self.tokenizer = loaded.tokenizer
+            self.stop_ids = loaded.stop_ids
+            self.stop_markers = loaded.stop_markers
+            self.prefix_caches = loaded.prefix_caches
+            self.active_variant = loaded.variant.name
+            self.local_model_ready = True
+
+    def _unload(self, name: str, reason: str) -> bool:
+        loaded = self.registry.remove(name)
+        if loaded is None:
+            return False
+        with self.generation_lock:
+            if self.active_variant == name:
+                self.model = None
+                self.tokenizer = None
+                self.stop_ids = frozenset()
+                self.stop_markers = ()
+                self.prefix_caches = OrderedDict()
+                self.active_variant = None
+                self.local_model_ready = False
+        loaded.prefix_caches.clear()
+        freed_mb = round(loaded.memory_bytes / 1048576, 1)
+        del loaded
+        gc.collect()
+        try:
+            import mlx.core as mx
+
+            clear_cache = getattr(mx, "clear_cache", None) or getattr(getattr(mx, "metal", None), "clear_cache", None)
+            if clear_cache is not None:
+                clear_cache()
+        except ImportError:
+            pass
+        emit("model_unloaded", model=name, freed_mb=freed_mb, reason=reason)
+        return True
+
+    def model_variant_for(self, text: str, style: str, requested: str | None = None):
+        return self.registry.select(len(text), resolve_style(text, style)[0], requested)
+
+    def load_model_variant(self, name: str | None, job_id: str | None = None) -> None:
+        def run(job: Job) -> None:
+            if self.load_model(emit_ready=False, variant=name):
+                job.emit("model_ready", model=self.active_variant, **self.registry.snapshot()["variants"][self.active_variant])
+
+        self.submit(self.new_job("model", "gemma", run, job_id, PRIORITY_NORMAL, interactive=False))
+
+    def unload_model_variant(self, name: str | None, job_id: str | None = None) -> None:
+        def run(job: Job) -> None:
+            with self.model_load_lock:
+                target = name or self.active_variant
+                if target is None or not self._unload(target, "requested"):
+                    job.emit("model_unloaded", model=target, freed_mb=0, reason="not_loaded")
+
+        self.submit(self.new_job("model", "gemma", run, job_id, PRIORITY_NORMAL, interactive=False))
+
+    def model_stats(self) -> None:
+        emit("model_stats", active=self.active_variant, **self.registry.snapshot())
+
+    def load_draft_model(self, load, tokenizer) -> None:
+        self.draft_model = None
+        self.draft_error = None
+        if not DRAFT_MODEL_PATH:
+            return
+        started = time.perf_counter()
+        try:
+            draft_model, draft_tokenizer = load(DRAFT_MODEL_PATH, model_config={"trust_remote_code": True})
+            main_vocab = getattr(tokenizer, "vocab_size", None)
+            draft_vocab = getattr(draft_tokenizer, "vocab_size", None)
+            if main_vocab is not None and draft_vocab is not None and main_vocab != draft_vocab:
+                raise ValueError(f"draft vocabulary size {draft_vocab} does not match {main_vocab}")
+            self.draft_model = draft_model
+            self.startup_phases.setdefault("draft_model_load_ms", round((time.perf_counter() - started) * 1000, 2))
+        except Exception as exc:
+            traceback.print_exc(file=sys.stderr)
+            self.disable_draft_model(str(exc))
+
+    def disable_draft_model(self, reason: str) -> None:
+        self.draft_model = None
+        self.draft_error = reason
+        for loaded in self.registry.loaded.values():
+            loaded.prefix_caches.clear()
+        emit("status", text="Draft model unavailable, using standard decoding.")
+        emit("draft_model_disabled", path=DRAFT_MODEL_PATH, message=reason)
+
+    def _load_prefix_cache_tools(self):
+        if not PREFIX_CACHE_ENABLED:
+            return None
+        try:
+            import mlx.core as mx
+            from mlx_lm.generate import generate_step
+            from mlx_lm.models.cache import can_trim_prompt_cache, make_prompt_cache, trim_prompt_cache
+        except ImportError:
+            return None
+        return mx, generate_step, make_prompt_cache, can_trim_prompt_cache, trim_prompt_cache
+
+    def new_job(
+        self,
+        kind: str,
+        backend: str,
+        target,
+        job_id: str | None = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        interactive: bool = True,
+    ) -> Job:
+        lane = "gemma" if backend == "gemma" else "cloud"
+        job_id = str(job_id) if job_id is not None else f"{kind}-{next(self.job_ids)}"
+
+        def run(job: Job) -> None:
+            self.last_activity = time.monotonic()
+            with client_context(job.client):
+                try:
+                    target(job)
+                finally:
+                    self.finish_metrics(job)
+                    self.last_activity = time.monotonic()
+
+        job = Job(job_id, lane, kind, run, priority, write_event, interactive, current_client())
+        job.metrics = JobMetrics(job_id, kind, backend, self.trace)
+        return job
+
+    def finish_metrics(self, job: Job) -> None:
+        metrics = job.metrics
+        if job.cancelled():
+            metrics.status = job.cancel_reason or "cancelled"
+        summary = {"queue_wait_ms": job.wait_ms, **metrics.summary()}
+        metrics.finish()
+        self.metrics.record(summary)
+        if job.kind != "prepare":
+            job.emit("metrics", **summary)
+
+    def _open_trace(self) -> TraceWriter | None:
+        if not TRACE_PATH:
+            return None
+        try:
+            return TraceWriter(TRACE_PATH)
+        except OSError:
+            traceback.print_exc(file=sys.stderr)
+            return None
+
+    def submit(self, job: Job) -> None:
+        client = job.client
+        if client is not None:
+            pending = self.scheduler.count_where(lambda other: other.client is client and not other.cancelled())
+            if pending >= DAEMON_MAX_PENDING:
+                client.rejected += 1
+                job.emit(
+                    "error",
+                    title="Worker Busy",
+                    message=f"{pending} requests are already pending for this client.",
+                    busy=True,
+                    pending=pending,
+                )
+                return
+        if job.interactive:
+            self.scheduler.cancel_where(
+                lambda other: other.interactive and other.client is client, "superseded", mute=True
+            )
+        queue_depth = self.scheduler.submit(job)
+        job.emit("queued", lane=job.lane, priority=job.priority, queue_depth=queue_depth)
+
+    def queue_info(self, job: Job) -> dict:
+        return {"lane": job.lane, "queue_wait_ms": job.wait_ms, "queue_depth": job.queue_depth_at_start}
 
     def stop(self) -> None:
-        self.stop_event.set()
+        client = current_client()
+        self.scheduler.cancel_where(lambda job: job.interactive and job.client is client, "stopped")
         emit("stopped")
 
+    def cancel(self, job_id) -> None:
+        job = self.scheduler.cancel(str(job_id), client=current_client())
+        if job is None:
+            emit("cancelled", job_id=str(job_id), found=False)
+        else:
+            emit("cancelled", job_id=job.id, found=True, running=job.started_at is not None)
+
+    def memory_scope(self, backend: str, style: str = "", variant=None) -> tuple[str, str]:
+        if backend == "gemma":
+            return f"gemma:{(variant or self.registry.variant(None)).path}", style
+        return backend, ""
+
+    def remember(
+        self, source_text: str, output: str, source_code: str, target_code: str, origin: str, scope: tuple[str, str]
+    ) -> None:
+        if self.memory is not None and output:
+            self.memory.add(source_text, output, source_code, target_code, origin, *scope)
+
+    def memory_prefill(self, job: Job, text: str, source_code: str, target_code: str) -> None:
+        with job.metrics.span("memory_lookup"):
+            matches = self.memory.fuzzy(text, source_code, target_code) if self.memory is not None else []
+        if matches:
+            job.metrics.add("memory_fuzzy_hits")
+            match = matches[0]
+            job.emit("memory_match", score=match["score"], source=match["source"], origin=match["origin"])
+            job.emit("replace", text=match["target"])
+
+    def memory_lookup(
+        self,
+        text: str,
+        target_language: str,
+        source: str | None = None,
+        limit: int = 5,
+        style: str = "Default",
+        backend: str | None = None,
+        model: str | None = None,
+    ) -> None:
+        if self.memory is None:
+            emit("memory_matches", enabled=False, matches=[])
+            return
+        source_code = source or detect_source_lang(text)
+        target_code = LANG_MAP.get(target_language, target_language)
+        selected_backend = normalized_backend(backend)
+        try:
+            variant = self.model_variant_for(text, style, model) if selected_backend == "gemma" else None
+        except KeyError as exc:
+            emit("error", title="Model Error", message=str(exc.args[0]))
+            return
+        effective_style = resolve_style(text, style)[0] if selected_backend == "gemma" else style
+        exact = self.memory.exact(
+            text, source_code, target_code, *self.memory_scope(selected_backend, effective_style, variant)
+        )
+        emit(
+            "memory_matches",
+            enabled=True,
+            source=source_code,
+            target=target_code,
+            exact=exact,
+            matches=self.memory.fuzzy(text, source_code, target_code, limit=max(int(limit), 1)),
+        )
+
+    def memory_transfer(self, action: str, path: str, source: str | None, target: str | None, job_id: str | None) -> None:
+        def run(job: Job) -> None:
+            if self.memory is None:
+                job.emit("error", title="Translation Memory Error", message="The translation memory is disabled.")
+                return
+            started = time.perf_counter()
+            try:
+                if action == "import":
+                    counts = self.memory.import_tmx(path)
+                else:
+                    counts = {
+                        "segments": self.memory.export_tmx(
+                            path, source, LANG_MAP.get(target, target) if target else None
+                        )
+                    }
+            except Exception as exc:
+                traceback.print_exc(file=sys.stderr)
+                job.emit("error", title="Translation Memory Error", message=str(exc), path=path)
+                return
+            job.emit(f"memory_{action}ed", path=path, elapsed_s=round(time.perf_counter() - started, 2), **counts)
+
+        self.submit(self.new_job("memory", "memory", run, job_id, PRIORITY_BULK, interactive=False))
+
+    def memory_stats(self) -> None:
+        if self.memory is None:
+            emit("memory_stats", enabled=False)
+            return
+        emit("memory_stats", enabled=True, **self.memory.stats())
+
+    def dictionary_stats(self) -> None:
+        if self.dictionary is None:
+            emit("dictionary_stats", enabled=False)
+            return
+        emit("dictionary_stats", enabled=True, **self.dictionary.stats())
+
+    def output_stats(self) -> None:
+        client = current_client()
+        emit("output_stats", **(client.output if client is not None else OUTPUT).stats())
+
+    def stats(self) -> None:
+        emit("stats", **self.metrics.stats())
+
+    def queue_stats(self) -> None:
+        emit("queue_stats", lanes=self.scheduler.snapshot())
+
     def prepare_backend(self, backend: str | None) -> None:
-        self.stop_event.set()
-        self.current_gen_id += 1
-        gen_id = self.current_gen_id
-        old_thread = self.processing_thread
         selected_backend = normalized_backend(backend)
 
-        def run() -> None:
-            if old_thread and old_thread.is_alive():
-                old_thread.join()
-            self.stop_event.clear()
+        def run(job: Job) -> None:
             try:
                 if selected_backend == "gemma":
-                    if self.load_model(emit_ready=False) and gen_id == self.current_gen_id:
-                        emit("backend_ready", backend=selected_backend)
+                    if self.load_model(emit_ready=False) and not job.cancelled():
+                        job.emit("backend_ready", backend=selected_backend)
                 else:
                     self.get_cloud_translator(selected_backend)
-                    if gen_id == self.current_gen_id:
-                        emit("backend_ready", backend=selected_backend)
+                    if not job.cancelled():
+                        job.emit("backend_ready", backend=selected_backend)
             except Exception as exc:
                 traceback.print_exc(file=sys.stderr)
-                emit("error", title="Backend Error", message=str(exc))
+                job.emit("error", title="Backend Error", message=str(exc))
 
-        self.processing_thread = Thread(target=run, daemon=True)
-        self.processing_thread.start()
+        self.submit(self.new_job("prepare", selected_backend, run))
 
-    def translate(self, text: str, target_language: str, style: str, backend: str | None = None) -> None:
-        self.stop_event.set()
-        self.current_gen_id += 1
-        gen_id = self.current_gen_id
-        old_thread = self.processing_thread
+    def translate(
+        self,
+        text: str,
+        target_language: str,
+        style: str,
+        backend: str | None = None,
+        use_cache: bool = True,
+        concurrency: int | None = None,
+        job_id: str | None = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        supersede: bool = True,
+        model: str | None = None,
+        document_format: str | None = None,
+        columns: list[str] | None = None,
+    ) -> None:
         selected_backend = normalized_backend(backend)
+        kind = normalize_format(document_format)
 
-        def run() -> None:
-            if old_thread and old_thread.is_alive():
-                old_thread.join()
-            self.stop_event.clear()
+        def run(job: Job) -> None:
             clean_text = text.strip().strip('"').strip("'")
+            variant = None
+            if selected_backend == "gemma":
+                try:
+                    variant = self.model_variant_for(clean_text, style, model)
+                except KeyError as exc:
+                    job.emit("error", title="Model Error", message=str(exc.args[0]))
+                    return
+            if kind in STRUCTURED_FORMATS:
+                self._translate_text_document(
+                    job, text, kind, columns, target_language, style, selected_backend, variant, use_cache
+                )
+                return
+            key = (
+                self.result_cache_key(clean_text, target_language, style, selected_backend, variant)
+                if use_cache
+                else None
+            )
+            if key is not None:
+                with job.metrics.span("cache_lookup"):
+                    cached = self.result_cache.get(key)
+                job.metrics.add("cache_hits" if cached is not None else "cache_misses")
+                if cached is not None:
+                    job.emit("replace", text=cached)
+                    job.emit("complete", cached=True, **self.queue_info(job))
+                    return
             if selected_backend in {"google", "bing"}:
-                self._translate_cloud(clean_text, target_language, selected_backend, gen_id)
+                output = self._translate_cloud(
+                    clean_text, target_language, selected_backend, job, concurrency, use_cache
+                )
             else:
-                self._generate(clean_text, target_language, style, gen_id)
+                output = self._generate(clean_text, target_language, style, job, variant, use_cache)
+            if key is not None and output is not None:
+                self.result_cache.put(key, output)
+
+        self.submit(self.new_job("translate", selected_backend, run, job_id, priority, supersede))
+
+    def _translate_text_document(
+        self,
+        job: Job,
+        text: str,
+        kind: str,
+        columns: list[str] | None,
+        target_language: str,
+        style: str,
+        backend: str,
+        variant=None,
+        use_cache: bool = True,
+    ) -> None:
+        try:
+            with job.metrics.span("extract"):
+                document = extract(kind, text, columns)
+        except ValueError as exc:
+            job.emit("error", title="Format Error", message=f"Could not read the {kind} document: {exc}")
+            return
+        job.emit("started", **self.queue_info(job))
+        job.emit("document_started", **document.stats())
+
+        def on_progress(done: int, translations: list[str | None]) -> None:
+            job.emit("replace", text=document.render(translations))
+            job.emit("document_progress", segments_done=done, segments_total=len(document.units))
+
+        try:
+            translations = self._translate_document(
+                job,
+                document,
+                target_language,
+                "Default" if style == "Dictionary" else style,
+                backend,
+                variant,
+                on_progress,
+                use_cache,
+            )
+        except Exception as exc:
+            traceback.print_exc(file=sys.stderr)
+            job.emit("error", title="Translation Error", message=str(exc))
+            return
+        if translations is None:
+            job.emit("stopped")
+            return
+        job.emit("replace", text=document.render(translations))
+        job.emit("complete", **document.stats())
+
+    def _translate_document(
+        self,
+        job: Job,
+        document: Document,
+        target_language: str,
+        style: str,
+        backend: str,
+        variant=None,
+        on_progress=None,
+        use_cache: bool = True,
+    ) -> list[str | None] | None:
+        dedup = document.dedup
+        translations: list[str | None] = [None] * len(document.segments)
+        job.metrics.add("dedup_segments", len(document.segments))
+        if not document.segments:
+            return translations
+        translate_segment = self._segment_translator(job, target_language, style, backend, variant, use_cache)
+
+        def translate_index(index: int) -> tuple[int, str | None]:
+            if job.cancelled():
+                return index, None
+            return index, translate_segment(document.segments[index].text)
+
+        workers = max(1, min(CLOUD_CONCURRENCY, len(dedup.units))) if backend in {"google", "bing"} else 1
+        pending = list(dedup.units)
+        calls = 0
+        last_report = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while pending and not job.cancelled():
+                retry: list[int] = []
+                for index, translated in pool.map(translate_index, pending):
+                    translations[index] = translated
+                    calls += 1
+                    if translated is not None and dedup.is_unit(index):
+                        for member in dedup.members[dedup.group_of[index]]:
+                            if member != index:
+                                translations[member] = dedup.adapt(member, translated)
+                                if translations[member] is None:
+                                    retry.append(member)
+                    now = time.monotonic()
+                    if on_progress is not None and now - last_report >= FILE_PROGRESS_SECONDS and not job.cancelled():
+                        last_report = now
+                        on_progress(min(calls, len(dedup.units)), translations)
+                pending = retry
+        job.metrics.add("dedup_hits", len(document.segments) - calls)
+        return None if job.cancelled() else translations
 
-        self.processing_thread = Thread(target=run, daemon=True)
-        self.processing_thread.start()
+    def result_cache_key(
+        self, text: str, target_language: str, style: str, backend: str, variant=None, auto_style: bool = True
+    ) -> str | None:
+        if self.result_cache is None or not text or os.environ.get("TRANSLATE_APPKIT_SKIP_MODEL") == "1":
+            return None
+        target_code = LANG_MAP.get(target_language, "en")
+        profile = classify_text(text)
+        if backend == "gemma":
+            backend_id = f"gemma:{(variant or self.registry.variant(None)).path}"
+            effective_style = resolve_style(text, style, profile)[0] if auto_style else style
+        else:
+            backend_id = backend
+            effective_style = ""
+        return cache_key(backend_id, profile.language, target_code, effective_style, normalize_cache_text(text))
+
+    def cache_stats(self) -> None:
+        if self.result_cache is None:
+            emit("cache_stats", enabled=False)
+            return
+        emit("cache_stats", enabled=True, **self.result_cache.stats())
+
+    def cloud_stats(self) -> None:
+        emit(
+            "cloud_stats",
+            backends={name: translator.stats() for name, translator in self.cloud_translators.items()},
+        )
 
     def get_cloud_translator(self, backend: str) -> BaseTranslator:
-        if backend not in self.cloud_translators:
-            if backend == "google":
-                self.cloud_translators[backend] = GoogleMobileTranslator()
-            elif backend == "bing":
-                self.cloud_translators[backend] = BingWebTranslator()
-            else:
-                raise ValueError(f"Unsupported cloud backend: {backend}")
-        return self.cloud_translators[backend]
+        with self.cloud_lock:
+            if backend not in self.cloud_translators:
+                if backend == "google":
+                    self.cloud_translators[backend] = GoogleMobileTranslator()
+                elif backend == "bing":
+                    self.cloud_translators[backend] = BingWebTranslator()
+                else:
+                    raise ValueError(f"Unsupported cloud backend: {backend}")
+            return self.cloud_translators[backend]
 
-    def _translate_cloud(self, input_content: str, target_language: str, backend: str, gen_id: int) -> None:
+    def _translate_cloud(
+        self,
+        input_content: str,
+        target_language: str,
+        backend: str,
+        job: Job,
+        concurrency: int | None = None,
+        use_cache: bool = True,
+    ) -> str | None:
         try:
             target_code = LANG_MAP.get(target_language, "en")
-            source_code = detect_source_lang(input_content)
-            emit("started")
-            translator = self.get_cloud_translator(backend)
+            with job.metrics.span("detect"):
+                source_code = detect_source_lang(input_content)
+            scope = self.memory_scope(backend)
+            use_memory = use_cache and self.memory is not None
+            if use_memory:
+                with job.metrics.span("memory_lookup"):
+                    remembered = self.memory.exact(input_content, source_code, target_code, *scope)
+                if remembered is not None:
+                    job.metrics.add("memory_hits")
+                    job.emit("replace", text=remembered)
+                    job.emit("complete", memory="exact", **self.queue_info(job))
+                    return remembered
+            job.emit("started", **self.queue_info(job))
+            if use_memory:
+                self.memory_prefill(job, input_content, source_code, target_code)
+            with job.metrics.span("client_setup"):
+                translator = self.get_cloud_translator(backend)
             max_chars = 4500 if backend == "google" else 900
-            translated_parts: list[str] = []
-            for chunk in chunk_text(input_content, max_chars):
-                if self.stop_event.is_set() or gen_id != self.current_gen_id:
-                    emit("stopped")
-                    return
-                translated_parts.append(translator.translate_with_retry(chunk, source_code, target_code))
-            if self.stop_event.is_set() or gen_id != self.current_gen_id:
-                emit("stopped")
-                return
-            emit("replace", text="".join(translated_parts))
-            emit("complete")
+            with job.metrics.span("chunk"):
+                chunks = chunk_text(input_content, max_chars)
+            job.metrics.add("chunks", len(chunks))
+            if len(chunks) == 1:
+                output = translator.translate_masked(chunks[0], source_code, target_code, metrics=job.metrics)
+                if job.cancelled():
+                    job.emit("stopped")
+                    return None
+                if use_cache:
+                    self.remember(chunks[0], output, source_code, target_code, backend, scope)
+                job.emit("replace", text=output)
+                job.emit("complete")
+                return output
+            translated_parts = self._translate_chunks(
+                translator, chunks, source_code, target_code, job, int(concurrency or CLOUD_CONCURRENCY)
+            )
+            if translated_parts is None:
+                job.emit("stopped")
+                return None
+            if use_cache:
+                for chunk, translated in zip(chunks, translated_parts):
+                    self.remember(chunk, translated, source_code, target_code, backend, scope)
+            job.emit("complete", chunks=len(chunks))
+            return "".join(translated_parts)
         except Exception as exc:
             traceback.print_exc(file=sys.stderr)
-            emit("error", title="Translation Error", message=str(exc))
+            job.emit("error", title="Translation Error", message=str(exc))
+            return None
+
+    def _translate_chunks(
+        self,
+        translator: BaseTranslator,
+        chunks: list[str],
+        source_code: str,
+        target_code: str,
+        job: Job,
+        concurrency: int,
+    ) -> list[str] | None:
+        def translate_chunk(chunk: str) -> str | None:
+            if job.cancelled():
+                return None
+            return translator.translate_masked(chunk, source_code, target_code, metrics=job.metrics)
+
+        dedup = Deduplicator(chunks)
+        job.metrics.add("dedup_segments", len(chunks))
+        results: dict[int, str] = {}
+        next_index = 0
+        pool = ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(dedup.units))))
+        try:
+            pending = {pool.submit(translate_chunk, chunks[index]): index for index in dedup.units}
+            while pending:
+                done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                if job.cancelled():
+                    return None
+                for future in done:
+                    index = pending.pop(future)
+                    results[index] = future.result()
+                    if results[index] is None or not dedup.is_unit(index):
+                        continue
+                    for member in dedup.members[dedup.group_of[index]]:
+                        if member == index:
+                            continue
+                        adapted = dedup.adapt(member, results[index])
+                        if adapted is None:
+                            pending[pool.submit(translate_chunk, chunks[member])] = member
+                        else:
+                            job.metrics.add("dedup_hits")
+                            results[member] = adapted
+                with job.metrics.span("reassemble"):
+                    ready: list[str] = []
+                    while next_index in results:
+                        ready.append(results[next_index])
+                        next_index += 1
+                    if ready:
+                        job.emit("replace" if next_index == len(ready) else "token", text="".join(ready))
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        return [results[index] for index in range(len(chunks))]
 
-    def _generate(self, input_content: str, target_language: str, style: str, gen_id: int) -> None:
+    def build_prompt(self, text: str, source_code: str, target_code: str, style: str) -> str:
+        processed_text = text
+        if style == "Dictionary":
+            processed_text = dictionary_prompt(text, target_code)
+        elif style == "Academic":
+            processed_text = f"(Translate the following text into {target_code} using a formal, academic, and scientific tone):\n{text}"
+        elif style == "Web Chat":
+            processed_text = f"(Translate the following text into {target_code} using an casual tone suitable for online messaging. You can use common abbreviations, slang like a real person would):\n{text}"
+        elif style == "Casual":
+            processed_text = f"(Translate the following text into {target_code} using a natural, casual, and conversational tone):\n{text}"
+
+        payload = {
+            "type": "text",
+            "source_lang_code": source_code,
+            "target_lang_code": target_code,
+            "text": processed_text,
+            "image": None,
+        }
+        messages = [{"role": "user", "content": [payload]}]
+        if hasattr(self.tokenizer, "apply_chat_template"):
+            return self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        return f"Translate from {source_code} to {target_code}:\n{processed_text}"
+
+    def encode_prompt(self, prompt: str) -> list[int]:
+        bos_token = getattr(self.tokenizer, "bos_token", None)
+        add_special_tokens = bos_token is None or not prompt.startswith(bos_token)
+        return list(self.tokenizer.encode(prompt, add_special_tokens=add_special_tokens))
+
+    def _acquire_prefix_cache(self, prompt_tokens: list[int], source_code: str, target_code: str, style: str, stats: dict):
+        if self.prefix_cache_tools is None:
+            stats["prefix_cache"] = "off"
+            return None
+        mx, generate_step, make_prompt_cache, _, _ = self.prefix_cache_tools
+        key = (source_code, target_code, style)
+        entry = self.prefix_caches.pop(key, None)
+        if entry is not None:
+            prefix_tokens = entry[0]
+            if prompt_tokens[: len(prefix_tokens)] == prefix_tokens and len(prompt_tokens) > len(prefix_tokens):
+                stats["prefix_cache"] = "hit"
+                stats["cached_prefix_tokens"] = len(prefix_tokens)
+                return key, entry
+            self.prefix_caches[key] = entry
+            stats["prefix_cache"] = "mismatch"
+            return None
+
+        prefix = self.build_prompt(PROMPT_SENTINEL, source_code, target_code, style).split(PROMPT_SENTINEL, 1)[0]
+        prefix_tokens = self.encode_prompt(prefix)[:-1]
+        if len(prefix_tokens) < PREFIX_CACHE_MIN_TOKENS or prompt_tokens[: len(prefix_tokens)] != prefix_tokens:
+            stats["prefix_cache"] = "mismatch"
+            return None
+        started = time.perf_counter()
+        cache = make_prompt_cache(self.model)
+        main_layers = len(cache)
+        for _ in generate_step(mx.array(prefix_tokens), self.model, max_tokens=0, prompt_cache=cache):
+            pass
+        if self.draft_model is not None:
+            draft_cache = make_prompt_cache(self.draft_model)
+            for _ in generate_step(mx.array(prefix_tokens), self.draft_model, max_tokens=0, prompt_cache=draft_cache):
+                pass
+            cache = cache + draft_cache
+        stats["prefix_cache"] = "miss"
+        stats["cached_prefix_tokens"] = len(prefix_tokens)
+        stats["prefix_build_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return key, (prefix_tokens, cache, main_layers)
+
+    def _release_prefix_cache(self, key: tuple[str, str, str], entry: tuple[list[int], list, int]) -> None:
+        _, _, _, can_trim_prompt_cache, trim_prompt_cache = self.prefix_cache_tools
+        prefix_tokens, cache, main_layers = entry
+        for group in (cache[:main_layers], cache[main_layers:]):
+            if not group:
+                continue
+            extra_tokens = getattr(group[0], "offset", len(prefix_tokens)) - len(prefix_tokens)
+            if extra_tokens > 0:
+                if not can_trim_prompt_cache(group):
+                    return
+                trim_prompt_cache(group, extra_tokens)
+        self.prefix_caches[key] = entry
+        while len(self.prefix_caches) > PREFIX_CACHE_ENTRIES:
+            self.prefix_caches.popitem(last=False)
+
+    def _stream_prompt(
+        self,
+        prompt: str,
+        is_cancelled,
+        on_text,
+        prefix_key: tuple[str, str, str] | None = None,
+        stats: dict | None = None,
+        metrics: JobMetrics | None = None,
+        criteria: StopCriteria | None = None,
+    ) -> str | None:
+        stats = {} if stats is None else stats
+        waited = time.perf_counter()
+        with self.generation_lock:
+            if metrics is not None:
+                metrics.record("generation_lock", waited, time.perf_counter())
+            try:
+                return self._stream_prompt_locked(prompt, is_cancelled, on_text, prefix_key, stats, metrics, criteria)
+            except Exception as exc:
+                if self.draft_model is None or stats.get("tokens"):
+                    raise
+                traceback.print_exc(file=sys.stderr)
+                self.disable_draft_model(f"speculative decoding failed: {exc}")
+                return self._stream_prompt_locked(prompt, is_cancelled, on_text, prefix_key, stats, metrics, criteria)
+
+    def _stream_prompt_locked(
+        self,
+        prompt: str,
+        is_cancelled,
+        on_text,
+        prefix_key,
+        stats: dict,
+        metrics: JobMetrics | None = None,
+        criteria: StopCriteria | None = None,
+    ) -> str | None:
+        criteria = criteria or StopCriteria(MAX_NEW_TOKENS, detect_loops=False)
+        started = time.perf_counter()
+        prompt_input: str | list[int] = prompt
+        generate_kwargs = {}
+        acquired = None
+        if prefix_key is not None and self.prefix_cache_tools is not None:
+            prompt_tokens = self.encode_prompt(prompt)
+            acquired = self._acquire_prefix_cache(prompt_tokens, *prefix_key, stats)
+            if acquired is not None:
+                prompt_input = prompt_tokens[len(acquired[1][0]) :]
+                generate_kwargs["prompt_cache"] = acquired[1][1]
+            stats["prompt_tokens"] = len(prompt_tokens)
+            stats["prefill_tokens"] = len(prompt_input) if acquired is not None else len(prompt_tokens)
+        else:
+            stats.setdefault("prefix_cache", "off")
+        if self.draft_model is not None:
+            generate_kwargs["draft_model"] = self.draft_model
+            generate_kwargs["num_draft_tokens"] = NUM_DRAFT_TOKENS
+        if metrics is not None:
+            metrics.record("prefix_cache", started, time.perf_counter())
+        stream = GenerationStream(criteria, on_text, self.stop_ids, self.stop_markers, STOP_MARKERS)
+        prefill_started = time.perf_counter()
+        first_token_at = None
+        tokens = 0
+        draft_accepted = 0
+        try:
+            for response in self.stream_generate(
+                self.model, self.tokenizer, prompt_input, max_tokens=criteria.max_tokens, **generate_kwargs
+            ):
+                if is_cancelled():
+                    return None
+                tokens += 1
+                stats["tokens"] = stats.get("tokens", 0) + 1
+                if getattr(response, "from_draft", False):
+                    draft_accepted += 1
+                    stats["draft_accepted"] = stats.get("draft_accepted", 0) + 1
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    stats["ttft_ms"] = round((first_token_at - started) * 1000, 2)
+                if stream.feed(response.text, response.token, getattr(response, "finish_reason", None)):
+                    break
+            output = stream.finish()
+        finally:
+            if acquired is not None:
+                self._release_prefix_cache(*acquired)
+            if metrics is not None:
+                finished = time.perf_counter()
+                metrics.record("prefill", prefill_started, first_token_at or finished, tokens=stats.get("prefill_tokens"))
+                if first_token_at is not None:
+                    metrics.record("decode", first_token_at, finished, tokens=tokens)
+                metrics.add("tokens", tokens)
+                if "draft_model" in generate_kwargs:
+                    metrics.add("draft_accepted", draft_accepted)
+        stats["stop_reason"] = criteria.reason
+        stats["max_tokens"] = criteria.max_tokens
+        if criteria.trim:
+            stats["trimmed"] = True
+        if metrics is not None and criteria.reason != "eos":
+            metrics.add(f"stop_{criteria.reason}")
+        return output
+
+    def _generate(
+        self, input_content: str, target_language: str, style: str, job: Job, variant=None, use_cache: bool = True
+    ) -> str | None:
         if os.environ.get("TRANSLATE_APPKIT_SKIP_MODEL") == "1":
-            emit("started")
-            emit("replace", text=f"[Preview mode]\nTarget: {target_language}\nStyle: {style}\n\n{input_content}")
-            emit("complete")
-            return
-        if not self.model or not self.tokenizer or not self.stream_generate:
-            if not self.load_model(emit_ready=False):
-                return
+            job.emit("started", **self.queue_info(job))
+            job.emit("replace", text=f"[Preview mode]\nTarget: {target_language}\nStyle: {style}\n\n{input_content}")
+            job.emit("complete")
+            return None
+        variant = variant or self.registry.variant(None)
+        target_code = LANG_MAP.get(target_language, "en")
+        with job.metrics.span("detect"):
+            profile = classify_text(input_content)
+            source_code = profile.language
+            style, warning_prefix = resolve_style(input_content, style, profile)
+        scope = self.memory_scope("gemma", style, variant)
+        use_memory = use_cache and style != "Dictionary" and self.memory is not None
+        if use_cache and style == "Dictionary" and self.dictionary is not None:
+            with job.metrics.span("dictionary_lookup"):
+                entry = self.dictionary.get(input_content, source_code, target_code)
+            job.metrics.add("dictionary_hits" if entry is not None else "dictionary_misses")
+            if entry is not None:
+                job.emit("started", **self.queue_info(job))
+                job.emit("replace", text=entry)
+                job.emit("complete", dictionary=True)
+                return entry
+        if use_memory:
+            with job.metrics.span("memory_lookup"):
+                remembered = self.memory.exact(input_content, source_code, target_code, *scope)
+            if remembered is not None:
+                job.metrics.add("memory_hits")
+                job.emit("replace", text=warning_prefix + remembered)
+                job.emit("complete", memory="exact", **self.queue_info(job))
+                return warning_prefix + remembered
+        with job.metrics.span("model_load"):
+            if not self.load_model(emit_ready=False, variant=variant.name):
+                return None
 
         try:
-            target_code = LANG_MAP.get(target_language, "en")
-            source_code = detect_source_lang(input_content)
-            processed_text = input_content
-            warning_prefix = ""
-
-            if style == "Default":
-                clean_str = input_content.strip()
-                has_punctuation = any(char in "，。！？；：,.!?;:" for char in clean_str)
-                space_count = clean_str.count(" ")
-                cjk_count = sum(
-                    1
-                    for char in clean_str
-                    if "\u4e00" <= char <= "\u9fff" or "\u3040" <= char <= "\u30ff"
-                )
-                if cjk_count > 0:
-                    is_likely_word = not has_punctuation and len(clean_str) <= 6
+            with job.metrics.span("segment"):
+                if style == "Dictionary":
+                    segments = [(input_content, "")]
                 else:
-                    is_likely_word = not has_punctuation and (space_count == 0 or len(clean_str) < 20)
-                if is_likely_word:
-                    style = "Dictionary"
-
-            if style == "Dictionary":
-                cjk_count = sum(
-                    1
-                    for char in input_content
-                    if "\u4e00" <= char <= "\u9fff" or "\u3040" <= char <= "\u30ff"
+                    segments = segment_text(input_content, SEGMENT_CHARS)
+
+            job.emit("started", **self.queue_info(job))
+            if use_memory:
+                self.memory_prefill(job, input_content, source_code, target_code)
+            output_parts = [warning_prefix]
+            first_token = True
+
+            def on_text(text_chunk: str) -> None:
+                nonlocal first_token
+                if first_token:
+                    job.emit("replace", text=warning_prefix)
+                    first_token = False
+                job.emit("token", text=text_chunk)
+
+            reused_segments = 0
+            stop_reasons: list[str] = []
+            generation_stats: dict = {}
+            draft_totals = [0, 0]
+            dedup = DedupIndex()
+            for body, separator in segments:
+                if body and len(segments) > 1:
+                    job.metrics.add("dedup_segments")
+                    translated = dedup.get(body)
+                    if translated is not None:
+                        job.metrics.add("dedup_hits")
+                        reused_segments += 1
+                        on_text(translated)
+                        output_parts.append(translated)
+                        body = ""
+                if body:
+                    key = None
+                    if use_cache and self.result_cache is not None and len(segments) > 1:
+                        key = cache_key(
+                            "segment", f"gemma:{variant.path}", source_code, target_code, style, normalize_cache_text(body)
+                        )
+                    translated = self.result_cache.get(key) if key is not None else None
+                    if key is not None:
+                        job.metrics.add("cache_hits" if translated is not None else "cache_misses")
+                    if translated is None and use_memory and len(segments) > 1:
+                        translated = self.memory.exact(body, source_code, target_code, *scope)
+                        if translated is not None:
+                            job.metrics.add("memory_hits")
+                    if translated is not None:
+                        reused_segments += 1
+                        on_text(translated)
+                        dedup.put(body, translated)
+                    else:
+                        segment_stats: dict = {}
+                        translated = self._generate_segment(
+                            job, body, source_code, target_code, style, on_text, segment_stats
+                        )
+                        retried = segment_stats.pop("mask_retried", False)
+                        if (segment_stats.pop("trimmed", False) or retried) and translated is not None:
+                            first_token = False
+                            job.emit("replace", text="".join(output_parts) + translated)
+                        stop_reasons.append(segment_stats.get("stop_reason", "eos"))
+                        draft_totals[0] += segment_stats.get("tokens", 0)
+                        draft_totals[1] += segment_stats.get("draft_accepted", 0)
+                        if not generation_stats:
+                            generation_stats.update(segment_stats)
+                        if translated is None:
+                            job.emit("token", text="\n[Stopped]")
+                            return None
+                        if stop_reasons[-1] not in DEGENERATE_STOPS:
+                            if key is not None:
+                                self.result_cache.put(key, translated)
+                            if use_memory:
+                                origin = f"gemma:{variant.name}"
+                                self.remember(body, translated, source_code, target_code, origin, scope)
+                            dedup.put(body, translated)
+                    output_parts.append(translated)
+                if separator:
+                    on_text(separator)
+                    output_parts.append(separator)
+            if len(segments) > 1:
+                generation_stats.update(segments=len(segments), reused_segments=reused_segments)
+            generation_stats.pop("tokens", None)
+            generation_stats.pop("draft_accepted", None)
+            generation_stats.pop("trimmed", None)
+            generation_stats["stop_reason"] = next(
+                (reason for reason in stop_reasons if reason != "eos"), "eos" if stop_reasons else "reused"
+            )
+            if self.draft_model is not None and draft_totals[0]:
+                generation_stats.update(
+                    draft_tokens=draft_totals[0],
+                    draft_accepted=draft_totals[1],
+                    draft_acceptance=round(draft_totals[1] / draft_totals[0], 4),
+                )
+            output = "".join(output_parts)
+            degenerate = generation_stats["stop_reason"] in DEGENERATE_STOPS
+            if use_cache and style == "Dictionary" and self.dictionary is not None and not degenerate:
+                generation_stats["dictionary_stored"] = self.dictionary.put(
+                    input_content, source_code, target_code, output, variant.name
                 )
-                has_punctuation = any(char in "，。！？；：,.!?;:" for char in input_content)
-                is_sentence = len(input_content.split()) > 1 or has_punctuation or len(input_content) > 20 or cjk_count > 6
-                if is_sentence:
-                    warning_prefix = "⚠️ [Mode Switch: Input detected as a phrase/sentence. Switching to Default style...]\n\n"
-                    style = "Default"
+            job.emit("complete", model=variant.name, **generation_stats)
+            return None if degenerate else output
+        except Exception as exc:
+            traceback.print_exc(file=sys.stderr)
+            job.emit("error", title="Translation Error", message=str(exc))
+            return None
+
+    def _generate_segment(
+        self,
+        job: Job,
+        text: str,
+        source_code: str,
+        target_code: str,
+        style: str,
+        on_text,
+        stats: dict | None = None,
+        masking: bool = True,
+    ) -> str | None:
+        prefix_key = (source_code, target_code, style)
+        prompt, criteria, masked = self._segment_prompt(job, text, source_code, target_code, style, masking)
+        if masked is None:
+            return self._stream_prompt(prompt, job.cancelled, on_text, prefix_key, stats, job.metrics, criteria)
+        stream = SentinelStream(masked)
+
+        def on_masked_text(text_chunk: str) -> None:
+            restored_chunk = stream.feed(text_chunk)
+            if restored_chunk:
+                on_text(restored_chunk)
+
+        translated = self._stream_prompt(prompt, job.cancelled, on_masked_text, prefix_key, stats, job.metrics, criteria)
+        if translated is None:
+            return None
+        tail = stream.finish()
+        if tail:
+            on_text(tail)
+        restored = self._unmask(job, masked, translated, stats)
+        if restored is not None:
+            return restored
+        return self._generate_segment(job, text, source_code, target_code, style, lambda _: None, stats, masking=False)
+
+    def _segment_prompt(
+        self, job: Job, text: str, source_code: str, target_code: str, style: str, masking: bool = True
+    ) -> tuple[str, StopCriteria, MaskedText | None]:
+        masked = MaskedText(text) if masking and MASKING_ENABLED and style != "Dictionary" else None
+        if masked is not None and not masked.spans:
+            masked = None
+        if masked is not None:
+            job.metrics.add("masked_spans", len(masked.spans))
+            job.metrics.add("masked_chars", masked.saved_chars)
+            text = masked.text
+        with job.metrics.span("prompt_build"):
+            prompt = self.build_prompt(text, source_code, target_code, style)
+        return prompt, self.stop_criteria(text, source_code, target_code, style), masked
+
+    def _unmask(self, job: Job, masked: MaskedText, translated: str, stats: dict | None = None) -> str | None:
+        restored = masked.restore(translated)
+        if restored is None:
+            job.metrics.add("mask_retries")
+            if stats is not None:
+                stats["mask_retried"] = True
+        return restored
+
+    def stop_criteria(self, text: str, source_code: str, target_code: str, style: str) -> StopCriteria:
+        if style == "Dictionary":
+            return StopCriteria(min(DICTIONARY_TOKEN_BUDGET, MAX_NEW_TOKENS), DICTIONARY_LINES)
+        input_tokens = len(self.tokenizer.encode(text, add_special_tokens=False))
+        return StopCriteria(
+            token_budget(input_tokens, source_code, target_code, TOKEN_BUDGET_SAFETY, MAX_NEW_TOKENS),
+            detect_loops=not repetitive_source(text),
+        )
+
+    def translate_batch(
+        self,
+        items: list,
+        target_language: str,
+        style: str,
+        backend: str | None = None,
+        use_cache: bool = True,
+        batch_id: str | None = None,
+        priority: int = PRIORITY_BULK,
+        model: str | None = None,
+        auto_style: bool = True,
+    ) -> None:
+        selected_backend = normalized_backend(backend)
+
+        def run(job: Job) -> None:
+            batch_id = job.id
+            started = time.perf_counter()
+            entries = [
+                (item.get("id", index), str(item.get("text", "")).strip())
+                if isinstance(item, dict)
+                else (index, str(item).strip())
+                for index, item in enumerate(items)
+            ]
+            variant = None
+            if selected_backend == "gemma":
+                try:
+                    variant = self.registry.select(max((len(text) for _, text in entries), default=0), style, model)
+                except KeyError as exc:
+                    job.emit("error", title="Model Error", message=str(exc.args[0]), batch_id=batch_id)
+                    return
+            dedup = Deduplicator([text for _, text in entries])
+            job.metrics.add("dedup_segments", len(entries))
+            job.metrics.add("dedup_hits", len(entries) - len(dedup.units))
+            job.emit(
+                "batch_started",
+                batch_id=batch_id,
+                count=len(items),
+                unique=len(dedup.units),
+                backend=selected_backend,
+                **self.queue_info(job),
+            )
+
+            def cache_key_for(text: str) -> str | None:
+                if not use_cache:
+                    return None
+                return self.result_cache_key(text, target_language, style, selected_backend, variant, auto_style)
+
+            pending: list[dict] = []
+            units: list[dict] = []
+            cached_count = 0
+            for unit, index in enumerate(dedup.units):
+                item_id, clean_text = entries[index]
+                item = {
+                    "id": item_id,
+                    "text": clean_text,
+                    "key": cache_key_for(clean_text),
+                    "cache": use_cache,
+                    "duplicates": [
+                        {
+                            "id": entries[member][0],
+                            "text": entries[member][1],
+                            "adapt": lambda output, member=member: dedup.adapt(member, output),
+                        }
+                        for member in dedup.members[unit]
+                        if member != index
+                    ],
+                }
+                units.append(item)
+                cached = self.result_cache.get(item["key"]) if item["key"] is not None else None
+                if cached is not None:
+                    cached_count += 1
+                    job.emit("item_token", batch_id=batch_id, id=item_id, text=cached)
+                    job.emit("item_complete", batch_id=batch_id, id=item_id, text=cached, cached=True)
+                    self._complete_batch_duplicates(job, item, cached)
+                elif not clean_text:
+                    job.emit("item_complete", batch_id=batch_id, id=item_id, text="")
+                    self._complete_batch_duplicates(job, item, "")
                 else:
-                    processed_text = (
-                        "You are a dictionary formatter.\n"
-                        "Your task is to output EXACTLY 5 lines and NOTHING ELSE.\n"
-                        "Any extra text, titles, labels, numbering, markdown, or explanations are STRICTLY FORBIDDEN.\n\n"
-                        "FORMAT (STRICT):\n"
-                        "Line 1: IPA pronunciation enclosed in slashes, and ONLY IPA. Example: /kæt/\n"
-                        "Line 2: Part of speech ONLY. Example: noun, verb, adjective\n"
-                        f"Line 3: Definition written in {target_code}. No labels.\n"
-                        "Line 4: List one example sentence in the original language of WORD. No labels.\n"
-                        f"Line 5: Translation of line 4 written in {target_code}. No labels.\n\n"
-                        "NEGATIVE CONSTRAINTS (DO NOT DO THESE):\n"
-                        "- Do NOT use words like Definition, Example, Translation\n"
-                        "- Do NOT use headers, bullet points, numbers, or markdown\n"
-                        "- Do NOT add explanations or notes\n"
-                        "- Do NOT repeat the word\n\n"
-                        "WORD: "
-                        + input_content
+                    pending.append(item)
+            try:
+                while not job.cancelled():
+                    if pending and selected_backend in {"google", "bing"}:
+                        self._translate_batch_cloud(job, pending, target_language, selected_backend)
+                    elif pending:
+                        self._translate_batch_local(job, pending, target_language, style, variant, auto_style)
+                    pending = [
+                        {
+                            "id": duplicate["id"],
+                            "text": duplicate["text"],
+                            "key": cache_key_for(duplicate["text"]),
+                            "cache": use_cache,
+                        }
+                        for item in units
+                        for duplicate in item.pop("retry", [])
+                    ]
+                    if not pending:
+                        break
+                    job.metrics.add("dedup_hits", -len(pending))
+                    units = pending
+            except Exception as exc:
+                traceback.print_exc(file=sys.stderr)
+                job.emit("error", title="Batch Translation Error", message=str(exc), batch_id=batch_id)
+            job.emit(
+                "batch_complete",
+                batch_id=batch_id,
+                count=len(items),
+                cached=cached_count,
+                stopped=job.cancelled(),
+                elapsed_ms=round((time.perf_counter() - started) * 1000, 2),
+            )
+
+        self.submit(self.new_job("batch", selected_backend, run, batch_id, priority, interactive=False))
+
+    def _finish_batch_item(self, job: Job, item: dict, output: str, stop_reason: str | None = None) -> None:
+        if stop_reason not in DEGENERATE_STOPS:
+            self._store_batch_item(item, output)
+        extra = {"stop_reason": stop_reason} if stop_reason is not None else {}
+        job.emit("item_complete", batch_id=job.id, id=item["id"], text=output, **extra)
+        self._complete_batch_duplicates(job, item, output)
+
+    def _store_batch_item(self, item: dict, output: str) -> None:
+        if item["key"] is not None:
+            self.result_cache.put(item["key"], output)
+        if not item.get("cache", True) or self.active_variant is None or "prefix_key" not in item:
+            return
+        source_code, target_code, _ = item["prefix_key"]
+        if item.get("style") == "Dictionary" and self.dictionary is not None:
+            if not self.dictionary.contains(item["text"], source_code, target_code):
+                self.dictionary.put(item["text"], source_code, target_code, output, self.active_variant)
+        elif item.get("style") != "Dictionary":
+            self.remember(
+                item["text"],
+                output[len(item["prefix"]) :],
+                source_code,
+                target_code,
+                f"gemma:{self.active_variant}",
+                self.memory_scope("gemma", item["style"], self.registry.variant(self.active_variant)),
+            )
+
+    def _complete_batch_duplicates(self, job: Job, item: dict, output: str) -> None:
+        for duplicate in item.get("duplicates", ()):
+            adapted = duplicate["adapt"](output)
+            if adapted is None:
+                item.setdefault("retry", []).append(duplicate)
+                continue
+            job.emit("item_token", batch_id=job.id, id=duplicate["id"], text=adapted)
+            job.emit("item_complete", batch_id=job.id, id=duplicate["id"], text=adapted, deduplicated=True)
+
+    def _translate_batch_cloud(self, job: Job, pending: list[dict], target_language: str, backend: str) -> None:
+        translator = self.get_cloud_translator(backend)
+        target_code = LANG_MAP.get(target_language, "en")
+        max_chars = 4500 if backend == "google" else 900
+
+        def translate_item(item: dict) -> None:
+            if job.cancelled():
+                return
+            source_code = detect_source_lang(item["text"])
+            try:
+                output = "".join(
+                    translator.translate_masked(chunk, source_code, target_code, metrics=job.metrics)
+                    for chunk in chunk_text(item["text"], max_chars)
+                )
+            except Exception as exc:
+                for failed in [item, *item.get("duplicates", ())]:
+                    job.emit("item_error", batch_id=job.id, id=failed["id"], message=str(exc))
+                return
+            if item.get("cache", True):
+                self.remember(item["text"], output, source_code, target_code, backend, self.memory_scope(backend))
+            job.emit("item_token", batch_id=job.id, id=item["id"], text=output)
+            self._finish_batch_item(job, item, output)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(CLOUD_CONCURRENCY, len(pending)))) as pool:
+            list(pool.map(translate_item, pending))
+
+    def _translate_batch_local(
+        self, job: Job, pending: list[dict], target_language: str, style: str, variant=None, auto_style: bool = True
+    ) -> None:
+        if os.environ.get("TRANSLATE_APPKIT_SKIP_MODEL") == "1":
+            for item in pending:
+                output = f"[Preview mode]\nTarget: {target_language}\nStyle: {style}\n\n{item['text']}"
+                job.emit("item_token", batch_id=job.id, id=item["id"], text=output)
+                job.emit("item_complete", batch_id=job.id, id=item["id"], text=output)
+                self._complete_batch_duplicates(job, item, output)
+            return
+        target_code = LANG_MAP.get(target_language, "en")
+        remaining: list[dict] = []
+        for item in pending:
+            profile = classify_text(item["text"])
+            source_code = profile.language
+            item["style"], item["prefix"] = resolve_style(item["text"], style, profile) if auto_style else (style, "")
+            item["prefix_key"] = (source_code, target_code, item["style"])
+            if item["style"] == "Dictionary" and self.dictionary is not None:
+                entry = self.dictionary.get(item["text"], source_code, target_code)
+                job.metrics.add("dictionary_hits" if entry is not None else "dictionary_misses")
+                if entry is not None:
+                    job.emit("item_token", batch_id=job.id, id=item["id"], text=entry)
+                    self._finish_batch_item(job, item, entry)
+                    continue
+            remaining.append(item)
+        pending = remaining
+        if not pending:
+            return
+        if not self.load_model(emit_ready=False, variant=variant.name if variant else None):
+            return
+
+        try:
+            from mlx_lm.generate import BatchGenerator
+        except ImportError:
+            BatchGenerator = None
+        if BatchGenerator is None or len(pending) == 1:
+            self._translate_batch_items(job, pending)
+            return
+
+        states = [self._batch_stream(job, item) for item in pending]
+        retries: list[dict] = []
+        waited = time.perf_counter()
+        with self.generation_lock:
+            job.metrics.record("generation_lock", waited, time.perf_counter())
+            generator = BatchGenerator(self.model, max_tokens=MAX_NEW_TOKENS, stop_tokens=set(self.stop_ids))
+            decode_started = None
+            try:
+                with job.metrics.span("prefill", items=len(states)):
+                    uids = generator.insert(
+                        [self.encode_prompt(state["prompt"]) for state in states],
+                        [state["stream"].criteria.max_tokens for state in states],
                     )
+                decode_started = time.perf_counter()
+                active = dict(zip(uids, states))
+                for state in states:
+                    if state["item"]["prefix"]:
+                        job.emit("item_token", batch_id=job.id, id=state["item"]["id"], text=state["item"]["prefix"])
+                while active and not job.cancelled():
+                    responses = generator.next()
+                    if not responses:
+                        break
+                    job.metrics.add("tokens", len(responses))
+                    stopped = []
+                    for response in responses:
+                        state = active.get(response.uid)
+                        if state is None:
+                            continue
+                        detokenizer = state["detokenizer"]
+                        if response.finish_reason != "stop":
+                            detokenizer.add_token(response.token)
+                        if response.finish_reason is not None:
+                            detokenizer.finalize()
+                        done = state["stream"].feed(detokenizer.last_segment, response.token, response.finish_reason)
+                        if not done and response.finish_reason is None:
+                            continue
+                        del active[response.uid]
+                        if response.finish_reason is None:
+                            stopped.append(response.uid)
+                        if not self._finish_batch_stream(job, state):
+                            retries.append(state["item"])
+                    if stopped and active:
+                        generator.remove(stopped)
+            finally:
+                if decode_started is not None:
+                    job.metrics.record("decode", decode_started, time.perf_counter())
+                close = getattr(generator, "close", None)
+                if close is not None:
+                    close()
+        if not job.cancelled():
+            self._translate_batch_items(job, retries, retry=True)
 
-            if style == "Academic":
-                processed_text = f"(Translate the following text into {target_code} using a formal, academic, and scientific tone):\n{input_content}"
-            elif style == "Web Chat":
-                processed_text = f"(Translate the following text into {target_code} using an casual tone suitable for online messaging. You can use common abbreviations, slang like a real person would):\n{input_content}"
-            elif style == "Casual":
-                processed_text = f"(Translate the following text into {target_code} using a natural, casual, and conversational tone):\n{input_content}"
-
-            payload = {
-                "type": "text",
-                "source_lang_code": source_code,
-                "target_lang_code": target_code,
-                "text": processed_text,
-                "image": None,
-            }
-            messages = [{"role": "user", "content": [payload]}]
-            if hasattr(self.tokenizer, "apply_chat_template"):
-                prompt = self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    def _translate_batch_items(self, job: Job, items: list[dict], retry: bool = False) -> None:
+        for item in items:
+            if job.cancelled():
+                return
+
+            def on_text(text_chunk: str, item_id=item["id"]) -> None:
+                job.emit("item_token", batch_id=job.id, id=item_id, text=text_chunk)
+
+            if item["prefix"] and not retry:
+                on_text(item["prefix"])
+            item_stats: dict = {}
+            output = self._generate_segment(
+                job, item["text"], *item["prefix_key"], (lambda _: None) if retry else on_text, item_stats, not retry
+            )
+            if output is None:
+                return
+            self._finish_batch_item(job, item, item["prefix"] + output, item_stats.get("stop_reason"))
+
+    def _batch_stream(self, job: Job, item: dict) -> dict:
+        prompt, criteria, masked = self._segment_prompt(job, item["text"], *item["prefix_key"])
+        sentinels = SentinelStream(masked) if masked is not None else None
+
+        def on_text(text_chunk: str) -> None:
+            if sentinels is not None:
+                text_chunk = sentinels.feed(text_chunk)
+            if text_chunk:
+                job.emit("item_token", batch_id=job.id, id=item["id"], text=text_chunk)
+
+        return {
+            "item": item,
+            "prompt": prompt,
+            "masked": masked,
+            "sentinels": sentinels,
+            "detokenizer": new_detokenizer(self.tokenizer),
+            "stream": GenerationStream(criteria, on_text, self.stop_ids, self.stop_markers, STOP_MARKERS),
+        }
+
+    def _finish_batch_stream(self, job: Job, state: dict) -> bool:
+        item = state["item"]
+        output = state["stream"].finish()
+        stop_reason = state["stream"].criteria.reason
+        if stop_reason != "eos":
+            job.metrics.add(f"stop_{stop_reason}")
+        if state["masked"] is not None:
+            tail = state["sentinels"].finish()
+            if tail:
+                job.emit("item_token", batch_id=job.id, id=item["id"], text=tail)
+            output = self._unmask(job, state["masked"], output)
+            if output is None:
+                return False
+        self._finish_batch_item(job, item, item["prefix"] + output, stop_reason)
+        return True
+
+    def prebuild_dictionary(
+        self,
+        words: list[str],
+        words_path: str | None,
+        target_language: str,
+        job_id: str | None = None,
+        model: str | None = None,
+    ) -> None:
+        def run(job: Job) -> None:
+            if self.dictionary is None:
+                job.emit("error", title="Dictionary Error", message="The dictionary store is disabled.")
+                return
+            try:
+                variant = self.registry.variant(model)
+                entries = [str(word) for word in words]
+                if words_path:
+                    with Path(words_path).expanduser().open(encoding="utf-8") as handle:
+                        entries.extend(line.strip() for line in handle)
+                self._prebuild_dictionary(job, [word for word in dict.fromkeys(entries) if word.strip()], target_language, variant)
+            except Exception as exc:
+                traceback.print_exc(file=sys.stderr)
+                job.emit("error", title="Dictionary Error", message=str(exc))
+
+        self.submit(self.new_job("dictionary", "gemma", run, job_id, PRIORITY_BULK, interactive=False))
+
+    def _prebuild_dictionary(self, job: Job, words: list[str], target_language: str, variant) -> None:
+        target_code = LANG_MAP.get(target_language, "en")
+        started = time.perf_counter()
+        counts = {"added": 0, "skipped": 0, "rejected": 0}
+        job.emit("dictionary_started", total=len(words), target=target_code, model=variant.name, **self.queue_info(job))
+        last_progress = 0.0
+        for done, word in enumerate(words, 1):
+            if job.cancelled():
+                job.emit("dictionary_stopped", done=done - 1, total=len(words), **counts)
+                return
+            source_code = detect_source_lang(word)
+            if self.dictionary.contains(word, source_code, target_code):
+                counts["skipped"] += 1
+            elif os.environ.get("TRANSLATE_APPKIT_SKIP_MODEL") == "1":
+                counts["rejected"] += 1
             else:
-                prompt = f"Translate from {source_code} to {target_code}:\n{processed_text}"
+                if not self.load_model(emit_ready=False, variant=variant.name):
+                    raise RuntimeError("TranslateGemma could not be loaded")
+                prompt = self.build_prompt(word, source_code, target_code, "Dictionary")
+                output = self._stream_prompt(
+                    prompt,
+                    job.cancelled,
+                    lambda _: None,
+                    (source_code, target_code, "Dictionary"),
+                    metrics=job.metrics,
+                    criteria=self.stop_criteria(word, source_code, target_code, "Dictionary"),
+                )
+                if output is None:
+                    continue
+                stored = self.dictionary.put(word, source_code, target_code, output, variant.name, "prebuilt")
+                counts["added" if stored else "rejected"] += 1
+            now = time.perf_counter()
+            if now - last_progress >= FILE_PROGRESS_SECONDS or done == len(words):
+                last_progress = now
+                job.emit("dictionary_progress", done=done, total=len(words), elapsed_s=round(now - started, 2), **counts)
+        job.emit("dictionary_complete", total=len(words), elapsed_s=round(time.perf_counter() - started, 2), **counts)
 
-            emit("started")
-            first_token = True
-            for response in self.stream_generate(self.model, self.tokenizer, prompt, max_tokens=1024):
-                if self.stop_event.is_set() or gen_id != self.current_gen_id:
-                    emit("token", text="\n[Stopped]")
+    def translate_file(
+        self,
+        input_path: str,
+        output_path: str,
+        target_language: str,
+        style: str = "Default",
+        backend: str | None = None,
+        resume: bool = True,
+        job_id: str | None = None,
+        priority: int = PRIORITY_BULK,
+        model: str | None = None,
+        document_format: str | None = None,
+        columns: list[str] | None = None,
+    ) -> None:
+        selected_backend = normalized_backend(backend)
+        file_style = "Default" if style == "Dictionary" else style
+        kind = normalize_format(document_format) or format_for(input_path)
+
+        def run(job: Job) -> None:
+            try:
+                if kind in STRUCTURED_FORMATS:
+                    self._translate_structured_file(
+                        job,
+                        Path(input_path).expanduser(),
+                        Path(output_path).expanduser(),
+                        kind,
+                        columns,
+                        target_language,
+                        file_style,
+                        selected_backend,
+                        model,
+                    )
                     return
+                self._translate_file(
+                    job,
+                    Path(input_path).expanduser(),
+                    Path(output_path).expanduser(),
+                    target_language,
+                    file_style,
+                    selected_backend,
+                    resume,
+                    model,
+                )
+            except Exception as exc:
+                traceback.print_exc(file=sys.stderr)
+                job.emit("error", title="File Translation Error", message=str(exc), input=input_path)
+
+        self.submit(self.new_job("file", selected_backend, run, job_id, priority, interactive=False))
+
+    def _segment_translator(
+        self, job: Job, target_language: str, style: str, backend: str, variant=None, use_cache: bool = True
+    ):
+        target_code = LANG_MAP.get(target_language, "en")
+        scope = self.memory_scope(backend, style, variant)
+        use_memory = use_cache and self.memory is not None
+        if backend in {"google", "bing"}:
+            translator = self.get_cloud_translator(backend)
+            max_chars = 4500 if backend == "google" else 900
+
+            def translate_cloud_segment(text: str) -> str | None:
+                source_code = detect_source_lang(text)
+                parts = []
+                for chunk in chunk_text(text, max_chars):
+                    if job.cancelled():
+                        return None
+                    parts.append(translator.translate_masked(chunk, source_code, target_code, metrics=job.metrics))
+                if use_memory:
+                    self.remember(text, "".join(parts), source_code, target_code, backend, scope)
+                return "".join(parts)
 
-                text_chunk = response.text
-                should_stop = False
-                for token in ["<end_of_turn>", "<eos>", "<bos>"]:
-                    if token in text_chunk:
-                        should_stop = True
-                        text_chunk = text_chunk.replace(token, "")
+            return translate_cloud_segment
 
-                if text_chunk:
-                    if first_token:
-                        emit("replace", text=warning_prefix)
-                        first_token = False
-                    emit("token", text=text_chunk)
+        if os.environ.get("TRANSLATE_APPKIT_SKIP_MODEL") != "1":
+            if not self.load_model(emit_ready=False, variant=variant.name if variant else None):
+                raise RuntimeError("TranslateGemma could not be loaded")
 
-                if should_stop:
+        def translate_local_segment(text: str) -> str | None:
+            if os.environ.get("TRANSLATE_APPKIT_SKIP_MODEL") == "1":
+                return text
+            source_code = detect_source_lang(text)
+            key = None
+            if use_cache and self.result_cache is not None:
+                key = cache_key("segment", scope[0], source_code, target_code, style, normalize_cache_text(text))
+                cached = self.result_cache.get(key)
+                if cached is not None:
+                    return cached
+            if use_memory:
+                remembered = self.memory.exact(text, source_code, target_code, *scope)
+                if remembered is not None:
+                    job.metrics.add("memory_hits")
+                    return remembered
+            segment_stats: dict = {}
+            translated = self._generate_segment(job, text, source_code, target_code, style, lambda _: None, segment_stats)
+            if translated is None or segment_stats.get("stop_reason") in DEGENERATE_STOPS:
+                return translated
+            if key is not None:
+                self.result_cache.put(key, translated)
+            if use_memory:
+                origin = f"gemma:{(variant or self.registry.variant(None)).name}"
+                self.remember(text, translated, source_code, target_code, origin, scope)
+            return translated
+
+        return translate_local_segment
+
+    def _translate_file(
+        self,
+        job: Job,
+        input_path: Path,
+        output_path: Path,
+        target_language: str,
+        style: str,
+        backend: str,
+        resume: bool,
+        model: str | None = None,
+    ) -> None:
+        variant = self.registry.select(input_path.stat().st_size, style, model) if backend == "gemma" else None
+        signature = file_signature(
+            input_path, target=target_language, style=style, backend=backend, model=variant.path if variant else None
+        )
+        checkpoint = FileCheckpoint(output_path, signature)
+        resumed = resume and output_path.exists() and checkpoint.load()
+        bytes_total = signature["size"]
+        translate_segment = self._segment_translator(job, target_language, style, backend, variant)
+        job.emit(
+            "file_started",
+            input=str(input_path),
+            output=str(output_path),
+            bytes_total=bytes_total,
+            resumed_from=checkpoint.input_offset if resumed else 0,
+            **self.queue_info(job),
+        )
+
+        started = time.perf_counter()
+        start_offset = checkpoint.input_offset if resumed else 0
+        segments_done = checkpoint.segments_done if resumed else 0
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with input_path.open("rb") as source, output_path.open("r+b" if resumed else "wb") as destination:
+            if resumed:
+                destination.truncate(checkpoint.output_offset)
+                destination.seek(checkpoint.output_offset)
+                source.seek(start_offset)
+            last_report = 0.0
+            last_checkpoint = time.monotonic()
+            done_offset = start_offset
+            dedup = DedupIndex(FILE_DEDUP_ENTRIES)
+            for body, separator, input_offset in iter_file_segments(source, SEGMENT_CHARS):
+                if job.cancelled():
                     break
-            emit("complete")
-        except Exception as exc:
-            traceback.print_exc(file=sys.stderr)
-            emit("error", title="Translation Error", message=str(exc))
+                translated = body
+                if body.strip():
+                    job.metrics.add("dedup_segments")
+                    translated = dedup.get(body)
+                    if translated is not None:
+                        job.metrics.add("dedup_hits")
+                    else:
+                        translated = translate_segment(body)
+                        if translated is not None:
+                            dedup.put(body, translated)
+                if translated is None:
+                    break
+                destination.write((translated + separator).encode("utf-8"))
+                segments_done += 1
+                done_offset = input_offset
+                now = time.monotonic()
+                if now - last_checkpoint >= FILE_CHECKPOINT_SECONDS:
+                    destination.flush()
+                    os.fsync(destination.fileno())
+                    checkpoint.save(done_offset, destination.tell(), segments_done)
+                    last_checkpoint = now
+                if now - last_report >= FILE_PROGRESS_SECONDS:
+                    last_report = now
+                    elapsed = time.perf_counter() - started
+                    processed = done_offset - start_offset
+                    remaining = bytes_total - done_offset
+                    job.emit(
+                        "progress",
+                        bytes_done=done_offset,
+                        bytes_total=bytes_total,
+                        segments_done=segments_done,
+                        elapsed_s=round(elapsed, 2),
+                        eta_s=round(elapsed / processed * remaining, 1) if processed else None,
+                    )
+            destination.flush()
+            os.fsync(destination.fileno())
+            if job.cancelled():
+                checkpoint.save(done_offset, destination.tell(), segments_done)
+                job.emit("file_stopped", output=str(output_path), bytes_done=done_offset, segments_done=segments_done)
+                return
+        checkpoint.remove()
+        job.emit(
+            "file_complete",
+            output=str(output_path),
+            bytes_total=bytes_total,
+            segments_done=segments_done,
+            elapsed_s=round(time.perf_counter() - started, 2),
+        )
+
+    def _translate_structured_file(
+        self,
+        job: Job,
+        input_path: Path,
+        output_path: Path,
+        kind: str,
+        columns: list[str] | None,
+        target_language: str,
+        style: str,
+        backend: str,
+        model: str | None = None,
+    ) -> None:
+        raw = input_path.read_bytes()
+        bom = codecs.BOM_UTF8 if raw.startswith(codecs.BOM_UTF8) else b""
+        with job.metrics.span("extract"):
+            document = extract(kind, raw[len(bom) :].decode("utf-8"), columns)
+        variant = self.registry.select(max((len(unit) for unit in document.units), default=0), style, model) if backend == "gemma" else None
+        job.emit(
+            "file_started",
+            input=str(input_path),
+            output=str(output_path),
+            bytes_total=len(raw),
+            resumed_from=0,
+            **document.stats(),
+            **self.queue_info(job),
+        )
+        started = time.perf_counter()
+
+        def on_progress(done: int, _translations: list[str | None]) -> None:
+            elapsed = time.perf_counter() - started
+            job.emit(
+                "progress",
+                bytes_done=int(len(raw) * done / len(document.units)),
+                bytes_total=len(raw),
+                segments_done=done,
+                segments_total=len(document.units),
+                elapsed_s=round(elapsed, 2),
+                eta_s=round(elapsed / done * (len(document.units) - done), 1),
+            )
+
+        translations = self._translate_document(job, document, target_language, style, backend, variant, on_progress)
+        if translations is None:
+            job.emit("file_stopped", output=str(output_path), bytes_done=0, segments_done=0)
+            return
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = output_path.with_name(output_path.name + ".part")
+        temporary.write_bytes(bom + document.render(translations).encode("utf-8"))
+        os.replace(temporary, output_path)
+        job.emit(
+            "file_complete",
+            output=str(output_path),
+            bytes_total=len(raw),
+            segments_done=len(document.units),
+            elapsed_s=round(time.perf_counter() - started, 2),
+            **document.stats(),
+        )
+
+    def serve(self, path: str, idle_unload: float) -> None:
+        global DAEMON
+        server = DaemonServer(
+            path,
+            self.handle,
+            self.client_connected,
+            self.client_disconnected,
+            (TOKEN_OUTPUT_MODE, TOKEN_FLUSH_MS, TOKEN_FLUSH_BYTES),
+            DAEMON_BUFFER_LINES,
+            DAEMON_SEND_TIMEOUT,
+            DAEMON_MAX_PENDING,
+        )
+        server.bind()
+        DAEMON = server
+        if idle_unload > 0:
+            Thread(target=self._idle_unload_loop, args=(idle_unload,), name="idle-unload", daemon=True).start()
+        self.load()
+        try:
+            server.serve_forever()
+        finally:
+            self.scheduler.shutdown()
+
+    def client_connected(self, client) -> None:
+        emit(
+            "connected",
+            client_id=client.id,
+            pid=os.getpid(),
+            model=self.active_variant,
+            loaded=sorted(self.registry.loaded),
+        )
+        if "ready_at_ms" in self.startup_phases:
+            emit("ready")
+
+    def client_disconnected(self, client) -> None:
+        self.scheduler.cancel_where(lambda job: job.client is client, "disconnected", mute=True)
+
+    def daemon_stats(self) -> None:
+        if DAEMON is None:
+            emit("daemon_stats", enabled=False)
+            return
+        emit(
+            "daemon_stats",
+            enabled=True,
+            pid=os.getpid(),
+            idle_s=round(time.monotonic() - self.last_activity, 1),
+            idle_unloads=self.idle_unloads,
+            loaded=sorted(self.registry.loaded),
+            **DAEMON.stats(),
+        )
+
+    def _idle_unload_loop(self, idle_unload: float) -> None:
+        interval = min(max(idle_unload / 4, 0.5), 30.0)
+        while not self.scheduler.closed.wait(interval):
+            if not self.registry.loaded or time.monotonic() - self.last_activity < idle_unload:
+                continue
+            lane = self.scheduler.snapshot()["gemma"]
+            if lane["queued"] or lane["running"]:
+                continue
+            with self.model_load_lock:
+                if time.monotonic() - self.last_activity < idle_unload:
+                    continue
+                unloaded = [name for name in list(self.registry.loaded) if self._unload(name, "idle")]
+                if unloaded:
+                    self.draft_model = None
+                    self.idle_unloads += 1
+                    gc.collect()
 
     def run(self) -> None:
         self.load()
@@ -436,22 +2324,145 @@ class TranslateWorker:
                 command = json.loads(line)
             except json.JSONDecodeError:
                 continue
-            action = command.get("action")
-            if action == "translate":
-                self.translate(
-                    command.get("text", ""),
-                    command.get("target", "English"),
-                    command.get("style", "Default"),
-                    command.get("backend"),
-                )
-            elif action == "prepare_backend":
-                self.prepare_backend(command.get("backend"))
-            elif action == "stop":
-                self.stop()
-            elif action == "quit":
-                self.stop()
+            if not self.handle(command):
                 break
+        OUTPUT.flush()
 
+    def handle(self, command: dict) -> bool:
+        action = command.get("action")
+        if action == "translate":
+            self.translate(
+                command.get("text", ""),
+                command.get("target", "English"),
+                command.get("style", "Default"),
+                command.get("backend"),
+                command.get("cache", True) is not False,
+                command.get("concurrency"),
+                command.get("id"),
+                parse_priority(command.get("priority"), PRIORITY_INTERACTIVE),
+                command.get("supersede", True) is not False,
+                command.get("model"),
+                command.get("format"),
+                command.get("columns"),
+            )
+        elif action == "translate_batch":
+            self.translate_batch(
+                command.get("items") or [],
+                command.get("target", "English"),
+                command.get("style", "Default"),
+                command.get("backend"),
+                command.get("cache", True) is not False,
+                command.get("batch_id") or command.get("id"),
+                parse_priority(command.get("priority"), PRIORITY_BULK),
+                command.get("model"),
+                command.get("auto_style", True) is not False,
+            )
+        elif action == "translate_file":
+            self.translate_file(
+                command.get("input", ""),
+                command.get("output", ""),
+                command.get("target", "English"),
+                command.get("style", "Default"),
+                command.get("backend"),
+                command.get("resume", True) is not False,
+                command.get("id"),
+                parse_priority(command.get("priority"), PRIORITY_BULK),
+                command.get("model"),
+                command.get("format"),
+                command.get("columns"),
+            )
+        elif action == "cancel":
+            self.cancel(command.get("id"))
+        elif action == "stop_batch":
+            self.cancel(command.get("batch_id"))
+        elif action == "stats":
+            self.stats()
+        elif action == "queue_stats":
+            self.queue_stats()
+        elif action == "cache_stats":
+            self.cache_stats()
+        elif action == "cloud_stats":
+            self.cloud_stats()
+        elif action == "output_stats":
+            self.output_stats()
+        elif action == "prebuild_dictionary":
+            self.prebuild_dictionary(
+                command.get("words") or [],
+                command.get("path"),
+                command.get("target", "English"),
+                command.get("id"),
+                command.get("model"),
+            )
+        elif action in {"memory_import", "memory_export"}:
+            self.memory_transfer(
+                action.split("_", 1)[1],
+                command.get("path", ""),
+                command.get("source"),
+                command.get("target"),
+                command.get("id"),
+            )
+        elif action == "memory_lookup":
+            self.memory_lookup(
+                command.get("text", ""),
+                command.get("target", "English"),
+                command.get("source"),
+                command.get("limit", 5),
+                command.get("style", "Default"),
+                command.get("backend"),
+                command.get("model"),
+            )
+        elif action == "memory_stats":
+            self.memory_stats()
+        elif action == "dictionary_stats":
+            self.dictionary_stats()
+        elif action == "model_stats":
+            self.model_stats()
+        elif action == "load_model":
+            self.load_model_variant(command.get("model"), command.get("id"))
+        elif action == "unload_model":
+            self.unload_model_variant(command.get("model"), command.get("id"))
+        elif action == "prepare_backend":
+            self.prepare_backend(command.get("backend"))
+        elif action == "stop":
+            self.stop()
+        elif action == "daemon_stats":
+            self.daemon_stats()
+        elif action == "quit":
+            self.stop()
+            if DAEMON is None:
+                self.scheduler.shutdown()
+            return False
+        elif action == "shutdown":
+            self.scheduler.shutdown()
+            if DAEMON is not None:
+                DAEMON.close()
+            return False
+        return True
 
-if __name__ == "__main__":
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TranslateGemma worker speaking JSON lines on stdin or a local socket.")
+    parser.add_argument("--daemon", action="store_true", help="serve clients on a Unix domain socket")
+    parser.add_argument("--socket", default=DAEMON_SOCKET, help="socket path for --daemon and the stdin proxy")
+    parser.add_argument("--idle-unload", type=float, default=IDLE_UNLOAD_SECONDS, help="seconds idle before the daemon unloads models, 0 keeps them")
+    args, _ = parser.parse_known_args()
+    if args.daemon:
+        try:
+            TranslateWorker().serve(args.socket, args.idle_unload)
+        except RuntimeError as exc:
+            print(str(exc), file=sys.stderr)
+            sys.exit(1)
+        return
+    if DAEMON_ENABLED:
+        connection = connect(args.socket) or spawn_daemon(
+            args.socket, [sys.executable, str(Path(__file__).resolve()), "--daemon", "--socket", args.socket]
+        )
+        if connection is not None:
+            proxy(connection)
+            return
+        print(f"worker daemon unavailable at {args.socket}, running in process", file=sys.stderr)
     TranslateWorker().run()
+
+
+if __name__ == "__main__":
+    main()
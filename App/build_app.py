@@ -11,7 +11,7 @@ from pathlib import Path
 ROOT = Path(__file__).resolve().parents[1]
 APP_ROOT = ROOT / "App"
 SOURCE = APP_ROOT / "Sources" / "TranslateText.swift"
-WORKER = APP_ROOT / "Workers" / "translate_text_worker.py"
+WORKERS_DIR = APP_ROOT / "Workers"
 TRANSLATEKIT_LICENSE = APP_ROOT / "TRANSLATEKIT_LICENSE.txt"
 BUILD_DIR = APP_ROOT / "build"
 OUTPUTS = ROOT / "outputs"
@@ -49,7 +49,8 @@ def main() -> None:
     resources_dir.mkdir(parents=True)
 
     shutil.copy2(binary, macos_dir / EXECUTABLE_NAME)
-    shutil.copy2(WORKER, resources_dir / "translate_text_worker.py")
+    for worker_module in sorted(WORKERS_DIR.glob("*.py")):
+        shutil.copy2(worker_module, resources_dir / worker_module.name)
     shutil.copy2(TRANSLATEKIT_LICENSE, resources_dir / "TRANSLATEKIT_LICENSE.txt")
     if ICON_SOURCE.exists():
         shutil.copy2(ICON_SOURCE, resources_dir / "translator.icns")